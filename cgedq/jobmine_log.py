@@ -4,7 +4,8 @@ from logging import info
 from datetime import datetime
 import os
 import sys
-from cgedq.mine import filterByTimeOnInt, mineByTime, mineJobStatesByRange
+from cgedq.mine import filterByTimeOnInt, mineByTime, mineJobStatesByRange, \
+        mineJobStatesBySweep
 from pm.pmmodels.pnformatter import exportNetToScaledImage
 from pm.ssnap.ssnap import sslogFromCSV, minePLPN, reportLogStats
 
@@ -95,10 +96,9 @@ def mag():
     # noise = 0.001
     # noise = 0.001 
     # noise = 0.002 
-    #for noise in [0.001, 0.002, 0.005]:
-    for noise in [0.002]:
-        #mineJobStatesByRange('var',tag,noise,years=[10,15,20,25])
-        mineJobStatesByRange('var',tag,noise,years=[15])
+    # mineJobStatesBySweep('var',tag,noises=[0.001, 0.002, 0.005],
+    #                      years=[10,15,20,25])
+    mineJobStatesBySweep('var',tag,noises=[0.002],years=[15])
 
 
 def maggrad():
@@ -8,12 +8,10 @@ import os.path
 
 from cgedq.mine import filterByTimeOnInt
 from pm.logs.statesnaplog import noiseReduceByVariant, sslogFromCSV, \
-        sslogWithRanges
+        sslogWithRanges, VariantIndex
 from pm.loggen.wpn_loggen import generate_log
-from pm.metrics.relevance import relevance_uniform_roleset, \
-        relevance_zero_order, show_model_cost
-from pm.metrics.earthmovers import unit_earthmovers
-from pm.pmmodels.tracefreq import RoleTraceFrequency
+from pm.metrics.batch import BatchMetrics, RELEVANCE_UNIFORM_ROLESET, \
+        RELEVANCE_ZERO_ORDER, UNIT_EARTHMOVERS
 from pm.ssnap.ssnap import mine
 
 logger = logging.getLogger(__name__)
@@ -24,6 +22,7 @@ logging.basicConfig(level=logging.INFO, format="%(message)s")
 
 
 vard = 'var'
+CACHE_DIR = os.path.join(vard,'sslogcache')
 
 
 def formatFrozen(fset):
@@ -110,21 +109,19 @@ def sslog_to_summary(sslog):
     return result
 
 
-def metrics(rep1,rep2,desc):
-    tf1 = RoleTraceFrequency(rep1)
-    tf2 = RoleTraceFrequency(rep2)
-    # info(tf1)
-    # info(tf2)
-    ru = relevance_uniform_roleset(tf1,tf2)
-    rz = relevance_zero_order(tf1,tf2)
-    uem = unit_earthmovers(tf1,tf2)
-    #info(f"    Entropic model cost")
-    #show_model_cost(tf1,"tf1")
-    #show_model_cost(tf2,"tf2")
+def metrics(batch,log,model,desc):
+    result = batch.metrics(log,model)
+    report_metrics(result,desc)
+
+
+def report_metrics(result: dict, desc):
     info(f"{desc}: ... :: " )
-    info(f"        Entropic relevance (uniform roleset bg): {ru:>7.3f}")
-    info(f"        Entropic relevance (zero order bg)     : {rz:>7.3f}")
-    info(f"        Unit earth movers                      : {uem:>7.3f}")
+    info(f"        Entropic relevance (uniform roleset bg): "
+         f"{result[RELEVANCE_UNIFORM_ROLESET]:>7.3f}")
+    info(f"        Entropic relevance (zero order bg)     : "
+         f"{result[RELEVANCE_ZERO_ORDER]:>7.3f}")
+    info(f"        Unit earth movers                      : "
+         f"{result[UNIT_EARTHMOVERS]:>7.3f}")
 
 
 def clip(rep1):
@@ -151,13 +148,16 @@ def magprob():
                          caseIdCol='person_id',activityCol='synjob_eng',
                          timeColStart='start_year',timeColEnd='end_year',
                          types = {'start_year':float,'end_year':float  },
-                         keepSuccDupes=False)
+                         keepSuccDupes=False, cacheDir=CACHE_DIR)
     # llog = sslog_to_summary(sslogeng)
     maglog = filterByTimeOnInt(sslogeng, years=15)
     llog = sslog_to_summary(maglog)
-    nlog = sslog_to_summary( noiseReduceByVariant(maglog,noise) )
+    maglogVariants = VariantIndex(maglog)
+    nlog = sslog_to_summary( noiseReduceByVariant(maglog,noise,
+                                                  maglogVariants) )
     info(f"Discovering ... {tag}")
-    model = mine(maglog,label=tag,noiseThreshold=noise,final=True)
+    model = mine(maglog,label=tag,noiseThreshold=noise,final=True,
+                 variantIndex=maglogVariants)
     info(f"Calculating probabilities ... ")
     mlang = generate_log(model,size=gensize)
     info(f"  Model probabilities ... ")
@@ -176,12 +176,15 @@ def magprob():
                          caseIdCol='person_id',activityCol='synjob_eng',
                          timeColStart='start_year',timeColEnd='end_year',
                          types = {'start_year':float,'end_year':float  },
-                         keepSuccDupes=False)   
+                         keepSuccDupes=False, cacheDir=CACHE_DIR)   
     maggradlog = filterByTimeOnInt(ssgradlogeng, years=15)   
     lglog = sslog_to_summary(maggradlog)
-    nglog = sslog_to_summary( noiseReduceByVariant(maggradlog,noise) )
+    maggradlogVariants = VariantIndex(maggradlog)
+    nglog = sslog_to_summary( noiseReduceByVariant(maggradlog,noise,
+                                                  maggradlogVariants) )
     info(f"Discovering ... {gradtag}")
-    gmodel = mine(maggradlog,label=gradtag,noiseThreshold=noise,final=True)
+    gmodel = mine(maggradlog,label=gradtag,noiseThreshold=noise,final=True,
+                 variantIndex=maggradlogVariants)
     info(f"Calculating probabilities ... ")
     mgradlang = generate_log(gmodel,size=gensize)
     info(f"  Model probabilities ... ")
@@ -192,16 +195,26 @@ def magprob():
     checklog(nglog)
     #
     info("Metrics ...")
-    mclip = clip(mlang)
-    mgradclip = clip(mgradlang)
-    metrics(llog,lglog,"    magistrate all vs palace, noise, log vs log")
-    metrics(llog,mclip,"    magistrate all, noise, log vs model")
-    metrics(lglog,mgradclip,"    magistrate palace grads, noise, log vs model")
-    metrics(nlog,nglog,"    magistrate all vs palace, de-noise, log vs log")
-    metrics(nlog,mclip,"    magistrate all, de-noise, log vs model")
-    metrics(nglog,mgradclip,"    magistrate palace grads, de-noise, log vs model")
-    metrics(mclip,mgradclip,"    magistrate all vs palace, model vs model")
-    metrics(mgradclip,mclip,"    magistrate palace vs all, model vs model")
+    batch = BatchMetrics( { 'llog': llog, 'lglog': lglog,
+                            'nlog': nlog, 'nglog': nglog,
+                            'mclip': clip(mlang),
+                            'mgradclip': clip(mgradlang) } )
+    comparisons = [
+        ('llog','lglog',"    magistrate all vs palace, noise, log vs log"),
+        ('llog','mclip',"    magistrate all, noise, log vs model"),
+        ('lglog','mgradclip',
+                "    magistrate palace grads, noise, log vs model"),
+        ('nlog','nglog',"    magistrate all vs palace, de-noise, log vs log"),
+        ('nlog','mclip',"    magistrate all, de-noise, log vs model"),
+        ('nglog','mgradclip',
+                "    magistrate palace grads, de-noise, log vs model"),
+        ('mclip','mgradclip',"    magistrate all vs palace, model vs model"),
+        ('mgradclip','mclip',"    magistrate palace vs all, model vs model") ]
+    values = batch.compare_pairs( [ (log,model) 
+                                        for log, model, desc in comparisons ],
+                                  parallel=True )
+    for log, model, desc in comparisons:
+        report_metrics(values[(log,model)],desc)
 
 
 def magsectrace():
@@ -214,7 +227,7 @@ def magsectrace():
                          caseIdCol='person_id',activityCol='synjob_eng',
                          timeColStart='start_year',timeColEnd='end_year',
                          types = {'start_year':float,'end_year':float  },
-                         keepSuccDupes=False)   
+                         keepSuccDupes=False, cacheDir=CACHE_DIR)   
     maggradlog = filterByTimeOnInt(ssgradlogeng, years=15)   
     lglog = sslog_to_summary(maggradlog)
     listsecmag(lglog)
@@ -9,9 +9,11 @@ import os
 
 logger = logging.getLogger( __name__ )
 
+CACHE_DIR = os.path.join('var','sslogcache')
+
 from cgedq.logutil import *
-from pm.ssnap.ssnap import (sslogWithRanges, sslogToCSV, filter_by_role, 
-                            keep_top_roles, take_tails)
+from pm.logs.roleindex import RoleIndex
+from pm.ssnap.ssnap import (sslogWithRanges, sslogToCSV, keep_top_roles)
 
 def magcount(logfile):
     info(f"Loading ... {logfile}" )
@@ -19,7 +21,7 @@ def magcount(logfile):
                          caseIdCol='person_id',activityCol='synjob',
                          timeColStart='start_year',timeColEnd='end_year',
                          types = {'start_year':float,'end_year':float  },
-                         keepSuccDupes=False)
+                         keepSuccDupes=False, cacheDir=CACHE_DIR)
     info(len(sslog))
 
 
@@ -29,8 +31,8 @@ def magtails(role,logfile,newlogpath):
                          caseIdCol='person_id',activityCol='synjob',
                          timeColStart='start_year',timeColEnd='end_year',
                          types = {'start_year':float,'end_year':float  },
-                         keepSuccDupes=False)
-    tailslog = take_tails(sslog,role,2)
+                         keepSuccDupes=False, cacheDir=CACHE_DIR)
+    tailslog = RoleIndex(sslog).take_tails(role,2)
     sslogToCSV(tailslog,newlogpath,caseIdCol='person_id',activityCol='synjob',
                timeCol='year')
     info(f"Output written to ... {newlogpath}")
@@ -42,9 +44,10 @@ def magintendanttails(logfile,newlogpath):
                          caseIdCol='person_id',activityCol='synjob',
                          timeColStart='start_year',timeColEnd='end_year',
                          types = {'start_year':float,'end_year':float  },
-                         keepSuccDupes=False)
-    tailslog = take_tails(sslog,'知縣',2)
-    tailslog = filter_by_role(tailslog,'分巡')
+                         keepSuccDupes=False, cacheDir=CACHE_DIR)
+    roleIndex = RoleIndex(sslog)
+    tailslog = roleIndex.take_tails('知縣',2)
+    tailslog = roleIndex.filter_by_role('分巡',view=tailslog)
     sslogToCSV(tailslog,newlogpath,caseIdCol='person_id',activityCol='synjob',
                timeCol='year')
     info(f"Output written to ... {newlogpath}")
@@ -56,9 +59,10 @@ def magintendanttailstop(logfile,newlogpath):
                          caseIdCol='person_id',activityCol='synjob',
                          timeColStart='start_year',timeColEnd='end_year',
                          types = {'start_year':float,'end_year':float  },
-                         keepSuccDupes=False)
-    tailslog = take_tails(sslog,'知縣',2)
-    tailslog = filter_by_role(tailslog,'分巡')
+                         keepSuccDupes=False, cacheDir=CACHE_DIR)
+    roleIndex = RoleIndex(sslog)
+    tailslog = roleIndex.take_tails('知縣',2)
+    tailslog = roleIndex.filter_by_role('分巡',view=tailslog)
     tailslog = keep_top_roles(tailslog, 7, drop=True) 
     sslogToCSV(tailslog,newlogpath,caseIdCol='person_id',activityCol='synjob',
                timeCol='year')
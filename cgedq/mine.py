@@ -23,6 +23,9 @@ from pm.pmmodels.pnformatter \
 import pm.pmmodels.pm4pyviz
 from pm.ssnap.ssnap import mine, minePLPN, \
     sslogFromCSV, sslogWithRanges, reportLogStats
+from pm.logs.rolestats import RoleStatistics
+from pm.logs.windows import LogView, TimeIndex
+from pm.ssnap.sweep import mineRoleStateNetSweep
 
 
 setLogLevel(logging.INFO)
@@ -106,41 +109,32 @@ def mineJobs(vard,fid):
     print("done")
 
 
-def filterByTimeOnInt(sslog:set, years: int ) -> set:
-    # Not a model of efficiency
-    result = {}
-    for caseId in sslog:
-        trace = sslog[caseId]
-        ntrace = []
-        head = trace[0]
-        for ss in trace:
-            if ss.time > head.time + years:
-                break
-            ntrace.append(ss)
-        result[caseId] = ntrace
-    return result
+def filterByTimeOnInt(sslog:set, years: int, timeIndex: TimeIndex = None) \
+        -> LogView:
+    '''
+    View of each trace up to years after its first snapshot. Pass a
+    TimeIndex of sslog to reuse it across windows.
+    '''
+    if timeIndex is None:
+        timeIndex = TimeIndex(sslog)
+    return timeIndex.first_years(years)
 
 def filterByTimeOnDate(sslog:set, years: int ) -> set:
-    # Not a model of efficiency
     byCase = {}
     result = set()
     for ss in sslog:
         if ss.caseId in byCase:
-            byCase[ss.caseId] |= set([ss])
+            byCase[ss.caseId].append(ss)
         else:
-            byCase[ss.caseId] = set([ss])
+            byCase[ss.caseId] = [ss]
     for case in byCase:
         states = sorted( byCase[case], key = lambda ss: ss.time )
         head = states[0] 
-        # Note this only works because we know the day of month is always
-        # set to 1 in earlier code. Otherwise we would hit 29 Feb problems like 
-        # here 
-        # https://stackoverflow.com/questions/32799428/adding-years-in-python
-        cutoff = datetime.strptime(head.time,YMD)
-        cutoff = cutoff.replace(year=cutoff.year + years)
-        cuts = cutoff.strftime(YMD)
-        states = [ ss for ss in states if ss.time <= cuts  ]
-        result |= set(states)
+        # YMD strings lead with the year, so the cutoff is the head time with
+        # years added to its year. Like the earlier strptime version, this 
+        # relies on day of month always being 1.
+        cuts = f'{int(head.time[:4]) + years:04d}{head.time[4:]}'
+        result.update( [ ss for ss in states if ss.time <= cuts ] )
     return result
 
 
@@ -148,8 +142,9 @@ def exportNetToImage(vard,oname,pn):
     dotStr = convert_net_to_dot(pn)
     export_DOT_to_image(vard,oname,dotStr)
 
-def mineByTime(vard,fname,sslog:set,years:int,noise=0.0,font=None,final=True):
-    sslogn = filterByTimeOnInt(sslog, years)
+def mineByTime(vard,fname,sslog:set,years:int,noise=0.0,font=None,final=True,
+               timeIndex:TimeIndex=None):
+    sslogn = filterByTimeOnInt(sslog, years, timeIndex)
     reportLogStats(sslogn, fname+ "_y" + str(years))
     rsn = mine(sslogn,label=fname,noiseThreshold=noise,final=final)
     exportRoleStateNetToImage(vard,
@@ -157,8 +152,8 @@ def mineByTime(vard,fname,sslog:set,years:int,noise=0.0,font=None,final=True):
                               sslog, font)
 
 def minePLPNByTime(vard,fname,sslog:set,years:int,noise=0.0,font=None,
-                   final=True):
-    sslogn = filterByTimeOnInt(sslog, years)
+                   final=True, timeIndex:TimeIndex=None):
+    sslogn = filterByTimeOnInt(sslog, years, timeIndex)
     reportLogStats(sslogn, fname+ "_y" + str(years))
     plpn = minePLPN(sslogn,label=fname,noiseThreshold=noise,final=False)
     exportNetToScaledImage(vard,
@@ -178,11 +173,36 @@ def mineJobStatesByRange(vard:str,fid:str,noise:float,years:list,final=True):
     reportLogStats(sslog,fname+'_ss')
     sslogeng = sslog_extract_eng(vard,fid)
     info("Mining states ..." )
+    timeIndex = TimeIndex(sslog)
+    timeIndexEng = TimeIndex(sslogeng)
     for year in years:
-        mineByTime(vard,fname,sslog,year,noise,final=final)
-        mineByTime(vard,fnameeng,sslogeng,year,noise,font=ENGFONT,final=final)
+        mineByTime(vard,fname,sslog,year,noise,final=final,
+                   timeIndex=timeIndex)
+        mineByTime(vard,fnameeng,sslogeng,year,noise,font=ENGFONT,final=final,
+                   timeIndex=timeIndexEng)
  
 
+def mineJobStatesBySweep(vard:str,fid:str,noises:list,years:list,final=True):
+    '''
+    As mineJobStatesByRange over every noise threshold, sharing filtering
+    and transition counts between grid points.
+    '''
+    fname = f'{trange}-{fid}'
+    fnameeng = fname_eng(fid)
+    sslog = sslog_extract_cn(vard,fid)
+    reportLogStats(sslog,fname+'_ss')
+    sslogeng = sslog_extract_eng(vard,fid)
+    info("Mining states ..." )
+    for name, log, font in [(fname,sslog,None),(fnameeng,sslogeng,ENGFONT)]:
+        roleStats = RoleStatistics.from_log(log)
+        for result in mineRoleStateNetSweep(log,noises,years,label=name,
+                                            final=final):
+            exportRoleStateNetToImage(vard,
+                f"{name}_n{10000*result.noiseThreshold:04.0f}"
+                f"_ss{str(result.years).zfill(3)}y_rsn",
+                result.net, log, font, roleStats=roleStats)
+
+
 def sslog_extract(vard,fid,activityCol):
     fname = f'{trange}-{fid}'
     info("Loading ..." + fname )
@@ -192,7 +212,8 @@ def sslog_extract(vard,fid,activityCol):
                          caseIdCol='person_id',activityCol=activityCol,
                          timeColStart='start_year',timeColEnd='end_year',
                          types = {'start_year':float,'end_year':float  },
-                         keepSuccDupes=False)
+                         keepSuccDupes=False, vectorised=True,
+                         cacheDir=os.path.join(vard,'sslogcache'))
     return sslog
 
 
@@ -9,8 +9,11 @@ import os
 
 logger = logging.getLogger( __name__ )
 
+CACHE_DIR = os.path.join('var','sslogcache')
+
 from cgedq.logutil import *
-from pm.ssnap.ssnap import (sslogWithRanges, sslogToCSV, filter_by_roleset) 
+from pm.logs.roleindex import RoleIndex
+from pm.ssnap.ssnap import (sslogWithRanges, sslogToCSV) 
 
 
 def rsearch(logfile,newlogpath):
@@ -19,8 +22,8 @@ def rsearch(logfile,newlogpath):
                          caseIdCol='person_id',activityCol='synjob',
                          timeColStart='start_year',timeColEnd='end_year',
                          types = {'start_year':float,'end_year':float  },
-                         keepSuccDupes=False)
-    slog = filter_by_roleset(sslog,['知縣','知州'])
+                         keepSuccDupes=False, cacheDir=CACHE_DIR)
+    slog = RoleIndex(sslog).filter_by_roleset(['知縣','知州'])
     sslogToCSV(slog,newlogpath,caseIdCol='person_id',activityCol='synjob',
                timeCol='year')
     info(f"Output written to ... {newlogpath}")
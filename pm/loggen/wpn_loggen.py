@@ -10,7 +10,8 @@ import math
 
 from pm.ssnap.ssnap import StateSnapshot
 from pm.pmmodels.plpn import *
-from pm.pmmodels.rsnet import RoleStateNet, RoleStateNetSemantics
+from pm.pmmodels.rsnet import RoleStateNet, RoleStateNetSemantics, \
+        with_unobserved_finals
 
 
 '''
@@ -50,13 +51,20 @@ def export_simple_log_to_csv(log: LightStateLog, csvfilename,
 
 
 class WeightedTokenGameStateLogGenerator:
+    '''
+    Divides a trace budget between enabled transitions in proportion to
+    their weights, from the initial marking until no transition is enabled
+    or traces reach max_trace_length.
+
+    Generation uses an explicit stack, so trace length is not limited by
+    the interpreter stack. Each distinct (marking, budget, depth) is expanded
+    once, giving a graph of shared generation steps, and traces are only
+    built as tuples when counted into the result.
+    '''
     def __init__(self, semantics: PetriNetSemantics, log_size: int, 
                        max_trace_length: int = 100, warnings=True):
         self.semantics = semantics
         self.log_size = log_size
-        # self.stack = []
-        # Java implementation uses a local state stack to avoid 
-        # blowing the Java call stack recursion limit
         self.max_trace_length = max_trace_length
         self.warnings = warnings
 
@@ -72,21 +80,61 @@ class WeightedTokenGameStateLogGenerator:
     def generate_from_mark(self,ct_mark: Marking,budget:int,
                            parent_trace: tuple) -> dict:
         debug( f"gen_from_mark( {ct_mark.mark}, {budget}, {parent_trace} ) " )
+        if not hasattr(self,'have_warned'):
+            self.have_warned = not self.warnings
+        start_mark = self.semantics.mark
+        steps = self.expand(ct_mark,budget,len(parent_trace))
+        self.semantics.mark = start_mark
+        return self.count_traces(steps,parent_trace)
+
+    def expand(self, ct_mark: Marking, budget: int, depth: int) -> list:
+        '''
+        Generation steps reachable from ct_mark, as a list indexed by step 
+        id, with the step for ct_mark first. Each step is a list of 
+        [state snapshot, budget, child step ids], where child step ids is 
+        None for steps that end a trace.
+        '''
+        steps = []
+        memo = {}
+        pending = []
+
+        def step_id(mark: Marking, budget: int, depth: int) -> int:
+            key = (frozen_mark(mark.mark), budget, depth)
+            if key in memo:
+                return memo[key]
+            sid = len(steps)
+            memo[key] = sid
+            steps.append( [self.state_snap_from_marking(mark), budget, None] )
+            pending.append( (sid, mark, depth) )
+            return sid
+
+        step_id(ct_mark,budget,depth)
+        while pending:
+            sid, mark, depth = pending.pop()
+            snap, budget, children = steps[sid]
+            self.semantics.mark = mark
+            enabled = self.semantics.enabled()
+            if not enabled:
+                continue
+            if depth + 1 >= self.max_trace_length:
+                if not self.have_warned:
+                    self.have_warned = True
+                    warning( f"Log generation max trace length "
+                             f"{self.max_trace_length} exceeded" )
+                continue
+            tow = self.allocate(enabled,budget)
+            children = steps[sid][2] = []
+            for tran in enabled:
+                if tow[tran] > 0:
+                    new_mark = self.semantics.remark(tran)
+                    children.append( step_id(new_mark,tow[tran],depth+1) )
+                    self.semantics.mark = mark
+        return steps
+
+    def allocate(self, enabled: set, budget: int) -> dict:
         total_weight = 0
         allocated = 0
         tow = {}
-        result = {}
-        new_trace = parent_trace + (self.state_snap_from_marking(ct_mark),)
-        enabled = self.semantics.enabled()
-        if enabled == set():
-            # debug( f"  termination  return {new_trace}:{budget} " )
-            return { new_trace: budget }
-        if len(new_trace) >= self.max_trace_length:
-            if not self.have_warned:
-                self.have_warned = True
-                warning( f"Log generation max trace length "
-                         f"{self.max_trace_length} exceeded" )
-            return { new_trace: budget }
         for tran in enabled:
             total_weight += tran.weight
         for tran in enabled:
@@ -96,13 +144,28 @@ class WeightedTokenGameStateLogGenerator:
         leftover = budget - allocated
         if leftover:
             self.allocate_leftover(tow,leftover)
-        for tran in enabled:
-            if tow[tran] > 0:
-                new_mark = self.semantics.remark(tran)
-                sublog = self.generate_from_mark(new_mark,tow[tran],new_trace)
-                self.semantics.mark = ct_mark
-                result = bag_union( result, sublog)
-        # debug( f"  continuation return {result} " )
+        return tow
+
+    def count_traces(self, steps: list, parent_trace: tuple) -> dict:
+        '''
+        Walks every path of steps from the first, counting the budget of 
+        each final step against its trace.
+        '''
+        result = {}
+        path = list(parent_trace)
+        base = len(path)
+        stack = [(0,base)]
+        while stack:
+            sid, depth = stack.pop()
+            snap, budget, children = steps[sid]
+            del path[depth:]
+            path.append(snap)
+            if children is not None:
+                for child in children:
+                    stack.append( (child,depth+1) )
+            else:
+                trace = tuple(path)
+                result[trace] = result.get(trace,0) + budget
         return result
 
     def state_snap_from_marking(self,mark: Marking) -> set:
@@ -139,6 +202,7 @@ def bag_union( dict1: dict, dict2: dict ):
 Generate log from a marking with a single initial place named by initial_place.
 '''
 def generate_log(rsn:RoleStateNet,size:int=1000,initial_place:str='I'):
+    rsn = with_unobserved_finals(rsn)
     init = findPlace(rsn,initial_place)
     imark = singleton_marking(rsn, [init])
     sem = RoleStateNetSemantics(imark)
@@ -0,0 +1,238 @@
+'''
+Columnar state snapshot logs. Traces are stored in compressed sparse row
+(CSR) layout: per case offsets into flat arrays of times and role set ids,
+with role sets interned in a RoleSetTable.
+'''
+
+from collections.abc import Mapping
+
+import numpy as np
+
+from pm.logs.rolestats import RoleStatistics
+from pm.logs.statesnaplog import InternedStateSnapshot, RoleSetTable
+
+
+class StateSnapshotLog(Mapping):
+    '''
+    Read-only mapping from case id to trace, backed by NumPy arrays. Traces
+    are materialised as lists of InternedStateSnapshot on access, so code
+    written against dict[caseId, list[StateSnapshot]] keeps working, while
+    the filter methods work on whole arrays and return new logs.
+    '''
+
+    def __init__(self, caseIds: list, offsets: np.ndarray, times: np.ndarray,
+                 rsids: np.ndarray, table: RoleSetTable):
+        self._caseIds = list(caseIds)
+        self._caseIndex = { caseId: i for i, caseId in enumerate(caseIds) }
+        self._offsets = np.asarray(offsets,dtype=np.int64)
+        self._times = np.asarray(times)
+        self._rsids = np.asarray(rsids,dtype=np.int32)
+        self._table = table
+
+    @classmethod
+    def from_dict(cls, sslog: dict, table: RoleSetTable = None) \
+            -> 'StateSnapshotLog':
+        if table is None:
+            table = RoleSetTable()
+        caseIds = []
+        offsets = [0]
+        times = []
+        rsids = []
+        for caseId in sslog:
+            caseIds.append(caseId)
+            for ss in sslog[caseId]:
+                times.append(ss.time)
+                if isinstance(ss,InternedStateSnapshot) and ss.table is table:
+                    rsids.append(ss.rsid)
+                else:
+                    rsids.append(table.intern(ss.activities))
+            offsets.append(len(times))
+        return cls(caseIds,np.array(offsets),np.array(times),
+                   np.array(rsids,dtype=np.int32),table)
+
+    def to_dict(self) -> dict:
+        return { caseId: self[caseId] for caseId in self._caseIds }
+
+    @property
+    def table(self) -> RoleSetTable:
+        return self._table
+
+    @property
+    def offsets(self) -> np.ndarray:
+        ''' Treat as read-only. '''
+        return self._offsets
+
+    @property
+    def times(self) -> np.ndarray:
+        ''' Treat as read-only. '''
+        return self._times
+
+    @property
+    def rsids(self) -> np.ndarray:
+        ''' Treat as read-only. '''
+        return self._rsids
+
+    def case_ids(self) -> list:
+        ''' Treat as read-only. '''
+        return self._caseIds
+
+    def __getitem__(self, caseId) -> list:
+        i = self._caseIndex[caseId]
+        start, stop = self._offsets[i], self._offsets[i+1]
+        return [InternedStateSnapshot.from_rsid(caseId,time,rsid,self._table)
+                    for time, rsid in
+                        zip(self._times[start:stop].tolist(),
+                            self._rsids[start:stop].tolist()) ]
+
+    def __iter__(self):
+        return iter(self._caseIds)
+
+    def __len__(self):
+        return len(self._caseIds)
+
+    def __contains__(self, caseId):
+        return caseId in self._caseIndex
+
+    def __repr__(self):
+        return f'StateSnapshotLog: {len(self)} cases, ' \
+               f'{self.snapshot_count()} snapshots, ' \
+               f'{len(self._table)} role sets'
+
+    def snapshot_count(self) -> int:
+        return len(self._rsids)
+
+    def trace_lengths(self) -> np.ndarray:
+        return np.diff(self._offsets)
+
+    def entry_cases(self) -> np.ndarray:
+        ''' Case index of each snapshot entry. '''
+        return np.repeat( np.arange(len(self._caseIds)), self.trace_lengths() )
+
+    def slice_entries(self, cases: np.ndarray, starts: np.ndarray,
+                      stops: np.ndarray) -> 'StateSnapshotLog':
+        '''
+        New log of the given case indexes, each trace cut to the absolute
+        entry range [start, stop).
+        '''
+        cases = np.asarray(cases,dtype=np.int64)
+        starts = np.asarray(starts,dtype=np.int64)
+        lengths = np.asarray(stops,dtype=np.int64) - starts
+        offsets = np.zeros(len(cases)+1,dtype=np.int64)
+        np.cumsum(lengths,out=offsets[1:])
+        entries = np.repeat(starts - offsets[:-1],lengths) \
+                    + np.arange(offsets[-1])
+        return StateSnapshotLog( [self._caseIds[i] for i in cases.tolist()],
+                                 offsets, self._times[entries],
+                                 self._rsids[entries], self._table )
+
+    def select_cases(self, cases) -> 'StateSnapshotLog':
+        '''
+        New log with the cases given by an index array, or a boolean mask
+        over cases, in log order.
+        '''
+        cases = np.asarray(cases)
+        if cases.dtype == bool:
+            cases = np.flatnonzero(cases)
+        cases = cases.astype(np.int64)
+        return self.slice_entries( cases, self._offsets[:-1][cases],
+                                   self._offsets[1:][cases] )
+
+    def cases(self, sl: slice) -> 'StateSnapshotLog':
+        ''' New log with a Python slice of the cases, in log order. '''
+        return self.select_cases( np.arange(len(self._caseIds))[sl] )
+
+    def entry_flags(self, roles) -> np.ndarray:
+        ''' Boolean array over entries, True where all roles are present. '''
+        return self._table.containing(roles)[self._rsids]
+
+    def filter_by_role(self, role) -> 'StateSnapshotLog':
+        ''' Keep only traces with role. '''
+        return self.filter_by_roleset([role])
+
+    def filter_by_roleset(self, roles: list) -> 'StateSnapshotLog':
+        ''' Keep only traces with an entry with all roles. '''
+        flags = self.entry_flags(roles)
+        return self.select_cases( np.unique( self.entry_cases()[flags] ) )
+
+    def take_tails(self, role, min_length:int=1) -> 'StateSnapshotLog':
+        '''
+        Truncates each trace before the first occurrence of role.
+        '''
+        positions = np.flatnonzero( self.entry_flags([role]) )
+        cases, first = np.unique( self.entry_cases()[positions],
+                                  return_index=True )
+        starts = np.array(self._offsets[1:])
+        starts[cases] = positions[first]
+        stops = self._offsets[1:]
+        keep = np.flatnonzero( stops - starts >= min_length )
+        return self.slice_entries( keep, starts[keep], stops[keep] )
+
+    def role_frequencies(self) -> dict:
+        ''' Occurrences of each role over all snapshots. '''
+        rsCounts = np.bincount(self._rsids, minlength=len(self._table))
+        rolefreq = {}
+        for rsid in np.flatnonzero(rsCounts).tolist():
+            for role in self._table.roleset(rsid):
+                rolefreq[role] = rolefreq.get(role,0) + int(rsCounts[rsid])
+        return rolefreq
+
+    def remap_roles(self, mapping: dict, table: RoleSetTable = None) \
+            -> 'StateSnapshotLog':
+        '''
+        New log with each role replaced by mapping[role], or dropped if
+        mapped to None. Roles absent from mapping are kept. Role sets are
+        remapped once per distinct set, then by array lookup.
+        '''
+        if table is None:
+            table = RoleSetTable()
+        remap = np.zeros(len(self._table),dtype=np.int32)
+        for rsid in range(len(self._table)):
+            roles = [mapping.get(role,role)
+                        for role in self._table.roleset(rsid)]
+            remap[rsid] = table.intern(
+                                [role for role in roles if role is not None] )
+        return StateSnapshotLog( self._caseIds, self._offsets, self._times,
+                                 remap[self._rsids], table )
+
+    def keep_top_roles(self, keeptop:int, drop=False, conflaterole='other',
+                       roleStats: RoleStatistics = None) \
+            -> 'StateSnapshotLog':
+        '''
+        As statesnaplog.keep_top_roles.
+        '''
+        if roleStats is None:
+            roleStats = RoleStatistics.from_log(self)
+        return self.remap_roles(
+                    roleStats.replacement_map(keeptop,drop,conflaterole) )
+
+    def variant_keys(self) -> list:
+        ''' Tuple of role set ids for each case, in log order. '''
+        rsids = self._rsids.tolist()
+        offsets = self._offsets.tolist()
+        return [ tuple(rsids[offsets[i]:offsets[i+1]])
+                    for i in range(len(self._caseIds)) ]
+
+    def group_by_variant(self) -> dict:
+        ''' Map from variant key to array of case indexes. '''
+        groups = {}
+        for i, key in enumerate(self.variant_keys()):
+            if key in groups:
+                groups[key].append(i)
+            else:
+                groups[key] = [i]
+        return { key: np.array(cases) for key, cases in groups.items() }
+
+    def noise_reduce_by_variant(self, noiseThreshold) -> 'StateSnapshotLog':
+        '''
+        As statesnaplog.noiseReduceByVariant.
+        '''
+        if noiseThreshold <= 0:
+            return self
+        keys = self.variant_keys()
+        counts = {}
+        for key in keys:
+            counts[key] = counts.get(key,0) + 1
+        threshold = noiseThreshold * len(keys)
+        keep = np.array( [counts[key] >= threshold for key in keys],
+                         dtype=bool )
+        return self.select_cases(keep)
@@ -0,0 +1,147 @@
+'''
+Inverted index from roles to the snapshots of a state snapshot log that
+hold them.
+
+Built once per log, a RoleIndex answers role and role set filters, tail
+extraction and co-occurrence queries in time proportional to the postings
+of the roles queried. Results are LogViews over the indexed log, and can be
+passed back as the view of a later query to chain filters without copying
+or re-indexing.
+'''
+
+from bisect import bisect_left
+
+from pm.logs.windows import LogView
+
+
+class RoleIndex:
+    '''
+    For each role, the cases with a snapshot holding it and the positions
+    of those snapshots, in log order.
+    '''
+
+    def __init__(self, sslog: dict):
+        self.sslog = sslog
+        self._lengths = {}
+        self._postings = {}
+        for caseId, trace in sslog.items():
+            self._lengths[caseId] = len(trace)
+            for pos, ss in enumerate(trace):
+                for role in ss.activities:
+                    cases = self._postings.get(role)
+                    if cases is None:
+                        cases = self._postings[role] = {}
+                    if caseId in cases:
+                        cases[caseId].append(pos)
+                    else:
+                        cases[caseId] = [pos]
+
+    def roles(self):
+        return self._postings.keys()
+
+    def cases(self, role) -> list:
+        ''' Case ids with role, in log order. '''
+        return list( self._postings.get(role,{}) )
+
+    def positions(self, role, caseId) -> list:
+        ''' Positions in the trace for caseId with role. Treat as read-only. '''
+        return self._postings.get(role,{}).get(caseId,[])
+
+    def first_position(self, role, caseId) -> int:
+        ''' First position with role in the trace for caseId, or None. '''
+        positions = self.positions(role,caseId)
+        return positions[0] if positions else None
+
+    def snapshot_count(self, role) -> int:
+        return sum( [len(positions)
+                        for positions in self._postings.get(role,{}).values()] )
+
+    def entry_range(self, caseId, view: LogView=None) -> tuple:
+        if view is None:
+            return (0, self._lengths[caseId])
+        return view.entry_range(caseId)
+
+    def _matches(self, roles: list, view: LogView=None):
+        '''
+        (caseId, positions) for each case with a snapshot holding all
+        roles inside the view, with the matching positions. Every snapshot
+        holds no roles, so with roles empty each non-empty trace matches.
+        '''
+        if not roles:
+            for caseId in (view if view is not None else self._lengths):
+                start, stop = self.entry_range(caseId,view)
+                if stop > start:
+                    yield (caseId, list(range(start,stop)))
+            return
+        postings = [self._postings.get(role,{}) for role in roles]
+        if not all(postings):
+            return
+        postings.sort(key=len)
+        for caseId, positions in postings[0].items():
+            if view is not None and caseId not in view:
+                continue
+            start, stop = self.entry_range(caseId,view)
+            matched = positions[ bisect_left(positions,start):
+                                 bisect_left(positions,stop) ]
+            for other in postings[1:]:
+                if not matched:
+                    break
+                otherPositions = other.get(caseId)
+                if otherPositions is None:
+                    matched = []
+                    break
+                matched = [pos for pos in matched
+                                if contains(otherPositions,pos)]
+            if matched:
+                yield (caseId, matched)
+
+    def filter_by_role(self, role, view: LogView=None) -> LogView:
+        ''' Cases with role, as statesnaplog.filter_by_role. '''
+        return self.filter_by_roleset([role],view)
+
+    def filter_by_roleset(self, roles: list, view: LogView=None) -> LogView:
+        '''
+        Cases with a snapshot holding all roles, as
+        statesnaplog.filter_by_roleset.
+        '''
+        return LogView( self.sslog,
+                        { caseId: self.entry_range(caseId,view)
+                            for caseId, matched in self._matches(roles,view) })
+
+    def take_tails(self, role, min_length:int=1, view: LogView=None) \
+            -> LogView:
+        '''
+        Each trace from the first snapshot with role, as
+        statesnaplog.take_tails. Cases without role are left out, unless
+        min_length is zero, when they are kept with empty traces.
+        '''
+        ranges = {}
+        if min_length <= 0:
+            for caseId in (view if view is not None else self._lengths):
+                stop = self.entry_range(caseId,view)[1]
+                ranges[caseId] = (stop,stop)
+        for caseId, matched in self._matches([role],view):
+            stop = self.entry_range(caseId,view)[1]
+            if stop - matched[0] >= min_length:
+                ranges[caseId] = (matched[0],stop)
+        return LogView(self.sslog, ranges)
+
+    def co_occurring_roles(self, role) -> dict:
+        '''
+        For each other role, the number of snapshots holding it together
+        with role.
+        '''
+        result = {}
+        sslog = self.sslog
+        for caseId, positions in self._postings.get(role,{}).items():
+            trace = sslog[caseId]
+            for pos in positions:
+                for other in trace[pos].activities:
+                    if other != role:
+                        result[other] = result.get(other,0) + 1
+        return result
+
+
+def contains(positions: list, pos: int) -> bool:
+    i = bisect_left(positions,pos)
+    return i < len(positions) and positions[i] == pos
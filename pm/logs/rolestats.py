@@ -0,0 +1,80 @@
+'''
+Role occurrence statistics for state snapshot logs.
+
+A RoleStatistics is computed once per log, or built up trace by trace as a
+log is streamed, and shared by role conflation and net rendering.
+'''
+
+import heapq
+
+
+class RoleStatistics:
+    '''
+    Occurrences of each role over all snapshots of a log.
+    '''
+
+    def __init__(self, frequencies: dict = None):
+        self._freq = dict(frequencies) if frequencies else {}
+        self._total = sum( self._freq.values() )
+
+    @classmethod
+    def from_log(cls, sslog) -> 'RoleStatistics':
+        '''
+        Statistics for sslog. Logs with their own role_frequencies(), like
+        columnar logs, are counted by that.
+        '''
+        if hasattr(sslog,'role_frequencies'):
+            return cls( sslog.role_frequencies() )
+        stats = cls()
+        for caseId in sslog:
+            stats.add_trace(sslog[caseId])
+        return stats
+
+    def add_trace(self, trace: list):
+        freq = self._freq
+        for ss in trace:
+            for role in ss.activities:
+                freq[role] = freq.get(role,0) + 1
+            self._total += len(ss.activities)
+
+    def add_stream(self, traces):
+        '''
+        Count traces from an iterable of (caseId, trace) pairs, as from
+        sslogStreamFromCSV, yielding each pair on.
+        '''
+        for caseId, trace in traces:
+            self.add_trace(trace)
+            yield (caseId, trace)
+
+    def frequency(self, role) -> int:
+        return self._freq.get(role,0)
+
+    def frequencies(self) -> dict:
+        ''' Treat as read-only. '''
+        return self._freq
+
+    def total(self) -> int:
+        ''' Role occurrences over all snapshots. '''
+        return self._total
+
+    def roles(self):
+        return self._freq.keys()
+
+    def top_roles(self, k: int) -> list:
+        '''
+        The k most frequent roles, most frequent first, ties broken by role.
+        '''
+        return [role for value, role in
+                    heapq.nsmallest( k, [(-value,role) for role, value
+                                            in self._freq.items()] )]
+
+    def replacement_map(self, keeptop: int, drop=False,
+                        conflaterole='other') -> dict:
+        '''
+        Map from each role to itself if among the keeptop most frequent, or
+        else to conflaterole, or to None if drop.
+        '''
+        toproles = set( self.top_roles(keeptop) )
+        replacement = None if drop else conflaterole
+        return { role: (role if role in toproles else replacement)
+                    for role in self._freq }
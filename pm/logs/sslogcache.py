@@ -0,0 +1,201 @@
+'''
+Persistent binary cache for parsed state snapshot logs.
+
+Each cached log is a directory of .npy files named by a key built from the
+source file contents and the loader parameters. Arrays are read back
+memory-mapped, so repeated loads do not copy or parse the log.
+'''
+
+import hashlib
+import logging
+import os
+import os.path
+import shutil
+import tempfile
+import types
+
+import numpy as np
+
+from pm.logs.columnar import StateSnapshotLog
+from pm.logs.statesnaplog import RoleSetTable
+
+
+logger = logging.getLogger(__name__)
+debug, info = logger.debug, logger.info
+
+
+CACHE_FORMAT_VERSION = 1
+HASH_BLOCK_SIZE = 1 << 20
+
+MMAP_ARRAYS = ('offsets','times','rsids')
+
+
+def file_digest(fname: str) -> str:
+    digest = hashlib.sha256()
+    with open(fname,'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def code_repr(code: types.CodeType) -> str:
+    '''
+    Digest of a code object's bytecode, constants and names, with nested
+    code objects digested in turn, so it is the same in every process.
+    '''
+    consts = [code_repr(const) if isinstance(const,types.CodeType)
+                    else repr(const) for const in code.co_consts]
+    digest = hashlib.sha256(code.co_code)
+    digest.update(repr((consts,code.co_names)).encode())
+    return digest.hexdigest()
+
+
+def callable_repr(value) -> str:
+    '''
+    Python functions are identified by qualified name, code, closure and
+    defaults, so two lambdas or same-named local functions differ. Values
+    of globals they read are not included. Other callables, such as builtin
+    types, are identified by qualified name, and raise ValueError if they
+    have none.
+    '''
+    qualname = getattr(value,'__qualname__',None)
+    code = getattr(value,'__code__',None)
+    if code is None:
+        if qualname is None:
+            raise ValueError(f'No stable name for {value!r}')
+        return f'{value.__module__}.{qualname}'
+    closure = [ code_repr(cell.cell_contents.__code__)
+                    if hasattr(cell.cell_contents,'__code__')
+                    else param_repr(cell.cell_contents)
+                for cell in (value.__closure__ or ()) ]
+    return f'{value.__module__}.{qualname}:{code_repr(code)}' \
+           f':{closure}:{param_repr(value.__defaults__)}'
+
+
+def param_repr(value) -> str:
+    if callable(value):
+        return callable_repr(value)
+    if isinstance(value,dict):
+        return '{' + ','.join([f'{k!r}:{param_repr(value[k])}'
+                                for k in sorted(value)]) + '}'
+    if isinstance(value,(tuple,list)):
+        return repr(type(value)([param_repr(v) for v in value]))
+    return repr(value)
+
+
+def cache_key(csvfile: str, params: dict) -> str:
+    '''
+    Key from the source file contents and loader parameters. Type converters
+    in params are identified as in callable_repr. Raises ValueError if a
+    converter cannot be identified.
+    '''
+    digest = hashlib.sha256()
+    digest.update(f'v{CACHE_FORMAT_VERSION}'.encode())
+    digest.update(file_digest(csvfile).encode())
+    digest.update(param_repr(params).encode())
+    return digest.hexdigest()
+
+
+def save_array(path: str, values):
+    arr = np.asarray(values)
+    np.save(path, arr, allow_pickle=(arr.dtype == object))
+
+
+def store_log(cachedir: str, key: str, clog: StateSnapshotLog):
+    '''
+    Write clog under key. Written to a temporary directory first and then
+    renamed, so readers never see a partial entry.
+    '''
+    os.makedirs(cachedir,exist_ok=True)
+    table = clog.table
+    rsOffsets = [0]
+    rsRoles = []
+    for rsid in range(len(table)):
+        mask = table.rolemask(rsid)
+        rid = 0
+        while mask:
+            if mask & 1:
+                rsRoles.append(rid)
+            mask >>= 1
+            rid += 1
+        rsOffsets.append(len(rsRoles))
+    tmpdir = tempfile.mkdtemp(dir=cachedir)
+    try:
+        save_array(os.path.join(tmpdir,'caseids.npy'), clog.case_ids())
+        save_array(os.path.join(tmpdir,'offsets.npy'),
+                   clog.offsets.astype(np.int64))
+        save_array(os.path.join(tmpdir,'times.npy'), clog.times)
+        save_array(os.path.join(tmpdir,'rsids.npy'),
+                   clog.rsids.astype(np.int32))
+        save_array(os.path.join(tmpdir,'roles.npy'),
+                   [table.role(rid) for rid in range(table.role_count())])
+        save_array(os.path.join(tmpdir,'rsoffsets.npy'),
+                   np.array(rsOffsets,dtype=np.int64))
+        save_array(os.path.join(tmpdir,'rsroles.npy'),
+                   np.array(rsRoles,dtype=np.int64))
+        target = os.path.join(cachedir,key)
+        if os.path.exists(target):
+            shutil.rmtree(target)
+        os.replace(tmpdir,target)
+    finally:
+        if os.path.exists(tmpdir):
+            shutil.rmtree(tmpdir)
+
+
+def load_array(path: str, name: str):
+    fname = os.path.join(path,name+'.npy')
+    if name in MMAP_ARRAYS:
+        try:
+            return np.load(fname,mmap_mode='r')
+        except ValueError:
+            # object arrays cannot be memory-mapped
+            pass
+    return np.load(fname,allow_pickle=True)
+
+
+def load_log(cachedir: str, key: str) -> StateSnapshotLog:
+    '''
+    Returns the cached log for key, or None if absent.
+    '''
+    path = os.path.join(cachedir,key)
+    if not os.path.isdir(path):
+        return None
+    roles = load_array(path,'roles').tolist()
+    rsOffsets = load_array(path,'rsoffsets').tolist()
+    rsRoles = load_array(path,'rsroles').tolist()
+    table = RoleSetTable()
+    for role in roles:
+        table.role_id(role)
+    for rsid in range(len(rsOffsets)-1):
+        mask = 0
+        for rid in rsRoles[rsOffsets[rsid]:rsOffsets[rsid+1]]:
+            mask |= 1 << rid
+        table.intern_mask(mask)
+    return StateSnapshotLog( load_array(path,'caseids').tolist(),
+                             load_array(path,'offsets'),
+                             load_array(path,'times'),
+                             load_array(path,'rsids'),
+                             table )
+
+
+def cached_log(cachedir: str, csvfile: str, params: dict, loader) \
+        -> StateSnapshotLog:
+    '''
+    Returns the log for csvfile and params from cachedir, or calls loader()
+    to parse it and stores the result. If params cannot be keyed, the log is
+    parsed and not cached.
+    '''
+    try:
+        key = cache_key(csvfile,params)
+    except ValueError as err:
+        info(f'Not caching {csvfile}: {err}')
+        return StateSnapshotLog.from_dict( loader() )
+    clog = load_log(cachedir,key)
+    if clog is not None:
+        debug(f'Loaded {csvfile} from cache {key}')
+        return clog
+    clog = StateSnapshotLog.from_dict( loader() )
+    store_log(cachedir,key,clog)
+    debug(f'Stored {csvfile} in cache {key}')
+    return load_log(cachedir,key)
+
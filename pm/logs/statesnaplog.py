@@ -5,9 +5,19 @@ role sets.
 
 
 from collections import defaultdict
+from collections.abc import Mapping
 import csv
 from datetime import datetime
+import heapq
 import logging
+import pickle
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from pm.logs.roleindex import RoleIndex
+from pm.logs.rolestats import RoleStatistics
 
 
 logger = logging.getLogger(__name__)
@@ -17,6 +27,8 @@ info = logger.info
 
 
 class StateSnapshot:
+    __slots__ = ('_caseId','_time','_activities')
+
     def __init__(self,caseId,time,activities):
         self._caseId = caseId
         self._time = time
@@ -46,6 +58,176 @@ class StateSnapshot:
         return f"StateSnapshot: {self.caseId} @ {self.time} = {self.activities}"
 
 
+class RoleSetTable:
+    '''
+    Interning table for role sets. Roles are numbered in order of first
+    appearance, each distinct role set is stored once as a bitmask over role
+    numbers, and role sets are numbered in order of first appearance.
+    Interning a role set already seen as a frozenset is one dict lookup.
+    '''
+    def __init__(self):
+        self._roleIds = {}
+        self._roles = []
+        self._maskIds = {}
+        self._masks = []
+        self._rolesets = []
+        self._setIds = {}
+
+    def role_id(self,role) -> int:
+        if role in self._roleIds:
+            return self._roleIds[role]
+        rid = len(self._roles)
+        self._roleIds[role] = rid
+        self._roles.append(role)
+        return rid
+
+    def role(self,rid:int):
+        return self._roles[rid]
+
+    def mask(self,roles) -> int:
+        mask = 0
+        for role in roles:
+            mask |= 1 << self.role_id(role)
+        return mask
+
+    def roles_of_mask(self,mask:int) -> frozenset:
+        result = []
+        rid = 0
+        while mask:
+            if mask & 1:
+                result.append(self._roles[rid])
+            mask >>= 1
+            rid += 1
+        return frozenset(result)
+
+    def intern_mask(self,mask:int) -> int:
+        if mask in self._maskIds:
+            return self._maskIds[mask]
+        rsid = len(self._masks)
+        roleset = self.roles_of_mask(mask)
+        self._maskIds[mask] = rsid
+        self._masks.append(mask)
+        self._rolesets.append(roleset)
+        self._setIds[roleset] = rsid
+        return rsid
+
+    def intern(self,roles) -> int:
+        '''
+        Returns the role set id for roles, adding it if absent.
+        '''
+        if type(roles) is frozenset:
+            rsid = self._setIds.get(roles)
+            if rsid is not None:
+                return rsid
+        return self.intern_mask(self.mask(roles))
+
+    def roleset(self,rsid:int) -> frozenset:
+        '''
+        The shared frozenset for this role set id. Treat as read-only.
+        '''
+        return self._rolesets[rsid]
+
+    def rolesets(self) -> list:
+        ''' Role sets by role set id. Treat as read-only. '''
+        return self._rolesets
+
+    def rolemask(self,rsid:int) -> int:
+        return self._masks[rsid]
+
+    def role_count(self) -> int:
+        return len(self._roles)
+
+    def containing(self,roles) -> np.ndarray:
+        '''
+        Boolean array over role set ids, True where the role set contains all
+        of roles. Unknown roles match nothing and are not added.
+        '''
+        mask = 0
+        for role in roles:
+            if role not in self._roleIds:
+                return np.zeros(len(self._masks),dtype=bool)
+            mask |= 1 << self._roleIds[role]
+        return np.array([m & mask == mask for m in self._masks],dtype=bool)
+
+    def variant_key(self,sstrace) -> tuple:
+        '''
+        Role set ids in this table of the snapshots of sstrace. Snapshots
+        interned in another table, or not interned, are interned here by
+        their roles, so keys from one table always compare.
+        '''
+        return tuple([ss._rsid if type(ss) is InternedStateSnapshot
+                                    and ss._table is self
+                        else self.intern(ss.activities) for ss in sstrace])
+
+    def __len__(self):
+        return len(self._masks)
+
+
+default_roleset_table = RoleSetTable()
+
+
+class InternedStateSnapshot(StateSnapshot):
+    '''
+    State snapshot holding an id into a RoleSetTable instead of its own
+    frozenset. activities returns the table's shared frozenset. Equality
+    within a table compares role set ids only, and interned snapshots equal
+    plain StateSnapshots with the same case, time and roles.
+    '''
+    __slots__ = ('_rsid','_table')
+
+    def __init__(self,caseId,time,activities,
+                 table:RoleSetTable=default_roleset_table):
+        self._caseId = caseId
+        self._time = time
+        self._rsid = table.intern(activities)
+        self._table = table
+
+    @classmethod
+    def from_rsid(cls,caseId,time,rsid:int,
+                  table:RoleSetTable=default_roleset_table):
+        ss = cls.__new__(cls)
+        ss._caseId = caseId
+        ss._time = time
+        ss._rsid = rsid
+        ss._table = table
+        return ss
+
+    @property
+    def activities(self):
+        return self._table.roleset(self._rsid)
+
+    @property
+    def rsid(self):
+        return self._rsid
+
+    @property
+    def table(self):
+        return self._table
+
+    def __eq__(self,other):
+        if type(self) == type(other) and self._table is other._table:
+            return (self._caseId,self._time,self._rsid) \
+                    ==  (other._caseId,other._time,other._rsid)
+        if isinstance(other,StateSnapshot):
+            return (self._caseId,self._time,self.activities) \
+                    ==  (other.caseId,other.time,other.activities)
+        return NotImplemented
+
+    def __hash__(self):
+        return hash( (self._caseId, self._time, self.activities) )
+
+
+def intern_trace(trace:list,table:RoleSetTable=default_roleset_table) -> list:
+    return [InternedStateSnapshot(ss.caseId,ss.time,ss.activities,table) \
+                for ss in trace]
+
+def intern_log(sslog:dict,table:RoleSetTable=default_roleset_table) -> dict:
+    '''
+    Returns a copy of sslog with InternedStateSnapshot entries sharing table.
+    '''
+    return {caseId: intern_trace(sslog[caseId],table) for caseId in sslog}
+
+
 
 def getField(row,col,types):
     if types and col in types:
@@ -55,12 +237,33 @@ def getField(row,col,types):
 
 
 def sslogFromCSV(csvfile,caseIdCol,activityCol,timeCol,keepSuccDupes=True,
-                 types : dict = None, encoding='utf-8' ) -> set :
+                 types : dict = None, encoding='utf-8', stream=False,
+                 presorted=True, cacheDir=None ) -> Mapping :
     '''
     Load a state snapshot log from a CSV with a header.
 
     If keepSuccDupe is False, states that repeat over time are pruned.
+
+    If stream is True, returns a generator of (caseId, trace) pairs instead of
+    a dict. See sslogStreamFromCSV.
+
+    If cacheDir is set, the parsed log is cached there and returned as a
+    memory-mapped columnar StateSnapshotLog, a read-only Mapping rather than
+    a dict. Use its to_dict() for a log that can be changed in place. See
+    pm.logs.sslogcache.
     '''
+    if stream:
+        return sslogStreamFromCSV(csvfile,caseIdCol,activityCol,timeCol,
+                                  keepSuccDupes,types,encoding,presorted)
+    if cacheDir:
+        from pm.logs.sslogcache import cached_log
+        params = {'loader': 'sslogFromCSV', 'caseIdCol': caseIdCol,
+                  'activityCol': activityCol, 'timeCol': timeCol,
+                  'keepSuccDupes': keepSuccDupes, 'types': types,
+                  'encoding': encoding}
+        return cached_log(cacheDir,csvfile,params,
+            lambda: sslogFromCSV(csvfile,caseIdCol,activityCol,timeCol,
+                                 keepSuccDupes,types,encoding) )
     sslog = None
     with open(csvfile,encoding=encoding) as csvf:
         reader = csv.DictReader(csvf)
@@ -89,13 +292,35 @@ def sslogToCSV(sslog: dict, csvfile: str, caseIdCol,activityCol,timeCol,
 
 def sslogWithRanges(csvfile,caseIdCol,activityCol,timeColStart,timeColEnd,
                     timeInc=0.25, keepSuccDupes=True, types : dict = None,
-                    encoding='utf-8' ) -> dict :
+                    encoding='utf-8', vectorised=False,
+                    cacheDir=None ) -> Mapping :
     '''
     Load a state snapshot log from a CSV with a header. The file is expected
     to be normalised on the time dimension by using time ranges in columns
     timeColStart and timeColEnd instead of restated for each time period.
     Otherwise behaves as sslogFromCSV.
+
+    If vectorised is True, ranges are expanded in bulk by
+    sslogWithRangesVectorised.
+
+    If cacheDir is set, the log is cached and returned as by sslogFromCSV,
+    as a read-only columnar StateSnapshotLog.
     '''
+    if cacheDir:
+        from pm.logs.sslogcache import cached_log
+        params = {'loader': 'sslogWithRanges', 'caseIdCol': caseIdCol,
+                  'activityCol': activityCol, 'timeColStart': timeColStart,
+                  'timeColEnd': timeColEnd, 'timeInc': timeInc,
+                  'keepSuccDupes': keepSuccDupes, 'types': types,
+                  'encoding': encoding, 'vectorised': vectorised}
+        return cached_log(cacheDir,csvfile,params,
+            lambda: sslogWithRanges(csvfile,caseIdCol,activityCol,
+                                    timeColStart,timeColEnd,timeInc,
+                                    keepSuccDupes,types,encoding,vectorised) )
+    if vectorised:
+        return sslogWithRangesVectorised(csvfile,caseIdCol,activityCol,
+                                         timeColStart,timeColEnd,timeInc,
+                                         keepSuccDupes,types,encoding)
     sslogIn = []
     with open(csvfile,encoding=encoding) as csvf:
         reader = csv.DictReader(csvf)
@@ -114,6 +339,66 @@ def sslogWithRanges(csvfile,caseIdCol,activityCol,timeColStart,timeColEnd,
                       types,encoding)
 
 
+def sslogWithRangesVectorised(csvfile,caseIdCol,activityCol,timeColStart,
+                              timeColEnd, timeInc=0.25, keepSuccDupes=True,
+                              types : dict = None, encoding='utf-8' ) -> dict :
+    '''
+    As sslogWithRanges, but the time grid for each row is computed
+    arithmetically as start + k*timeInc with NumPy, and roles are grouped per
+    (case, time) in bulk with pandas. Successive duplicate states are dropped
+    before any StateSnapshot is created when keepSuccDupes is False.
+
+    Time columns must be numeric once types are applied. Grid points are
+    computed by multiplication rather than repeated addition, so increments
+    that are not exact binary fractions may differ in the last bits from
+    sslogWithRanges.
+    '''
+    cols = [caseIdCol,activityCol,timeColStart,timeColEnd]
+    df = pd.read_csv(csvfile,usecols=cols,dtype=str,keep_default_na=False,
+                     encoding=encoding)
+    if types:
+        for col in cols:
+            if col in types:
+                df[col] = df[col].map(types[col])
+    starts = df[timeColStart].to_numpy(dtype=float)
+    ends = df[timeColEnd].to_numpy(dtype=float)
+    steps = np.floor( (ends - starts) / timeInc + 1e-9 ).astype(np.int64) + 1
+    steps = np.maximum(steps, 0)
+    rowIdx = np.repeat( np.arange(len(df)), steps )
+    offsets = np.repeat( np.cumsum(steps) - steps, steps )
+    ticks = np.arange(len(rowIdx)) - offsets
+    caseCodes, caseIds = pd.factorize( df[caseIdCol], sort=True )
+    roleCodes, roleNames = pd.factorize( df[activityCol] )
+    cases = caseCodes[rowIdx]
+    times = starts[rowIdx] + ticks * timeInc
+    roles = roleCodes[rowIdx]
+    order = np.lexsort( (roles, times, cases) )
+    cases, times, roles = cases[order], times[order], roles[order]
+    # one entry per distinct (case, time, role), then one group per state
+    keep = np.ones(len(cases), dtype=bool)
+    keep[1:] = (cases[1:] != cases[:-1]) | (times[1:] != times[:-1]) \
+                    | (roles[1:] != roles[:-1])
+    cases, times, roles = cases[keep], times[keep], roles[keep]
+    newState = np.ones(len(cases), dtype=bool)
+    newState[1:] = (cases[1:] != cases[:-1]) | (times[1:] != times[:-1])
+    bounds = np.append( np.flatnonzero(newState), len(cases) ).tolist()
+    roleList = roleNames.take(roles).tolist()
+    caseIdList = caseIds.take( cases[newState] ).tolist()
+    timeList = times[newState].tolist()
+    sslog = {}
+    prevCase = None
+    prevRoles = None
+    for i, caseId in enumerate(caseIdList):
+        stateRoles = frozenset( roleList[bounds[i]:bounds[i+1]] )
+        if caseId != prevCase:
+            trace = []
+            sslog[caseId] = trace
+        elif not keepSuccDupes and stateRoles == prevRoles:
+            continue
+        trace.append( StateSnapshot(caseId,timeList[i],stateRoles) )
+        prevCase, prevRoles = caseId, stateRoles
+    return sslog
+
 
 def sslogParse(rowData,caseIdCol,activityCol,timeCol,keepSuccDupes=True,
                 types : dict = None, encoding='utf-8' ) -> dict :
@@ -149,6 +434,113 @@ def ssDictToLog(ctToSS: dict,keepSuccDupes) -> dict :
     sslog[prevState.caseId] = ctTrace
     return sslog
 
+DEFAULT_SORT_CHUNK_SIZE = 500000
+
+def sslogStreamFromCSV(csvfile,caseIdCol,activityCol,timeCol,
+                       keepSuccDupes=True, types : dict = None,
+                       encoding='utf-8', presorted=True,
+                       chunkSize=DEFAULT_SORT_CHUNK_SIZE):
+    '''
+    Generator over (caseId, trace) pairs from a CSV with a header, one case at
+    a time, in case order.
+
+    If presorted is True, rows must be sorted by case then time, and a
+    ValueError is raised on the first row out of order. Otherwise rows are
+    first sorted externally in runs of chunkSize rows, so memory is bounded by
+    the chunk size and the largest case, not the whole log.
+    '''
+    with open(csvfile,encoding=encoding) as csvf:
+        reader = csv.DictReader(csvf)
+        entries = ssEntries(reader,caseIdCol,activityCol,timeCol,types)
+        if not presorted:
+            entries = externalSortEntries(entries,chunkSize)
+        yield from sstraceStream(entries,keepSuccDupes)
+
+
+def ssEntries(rowData,caseIdCol,activityCol,timeCol,types : dict = None):
+    '''
+    Generator over (caseId, time, activity) tuples from rows.
+    '''
+    for row in rowData:
+        yield ( getField(row,caseIdCol,types), getField(row,timeCol,types),
+                getField(row,activityCol,types) )
+
+
+def sstraceStream(entries,keepSuccDupes=True):
+    '''
+    Fold (caseId, time, activity) entries sorted by case and time into
+    (caseId, trace) pairs, yielding each trace once its case is finished.
+    Roles for the current snapshot are accumulated in a single mutable set.
+    '''
+    ctCase = None
+    ctTime = None
+    roles = None
+    trace = []
+    for (caseId,time,activity) in entries:
+        if roles is not None and caseId == ctCase and time == ctTime:
+            roles.add(activity)
+            continue
+        if roles is not None:
+            if (caseId,time) < (ctCase,ctTime):
+                raise ValueError(
+                    f"Log entry ({caseId},{time}) out of order after "
+                    f"({ctCase},{ctTime}). Use presorted=False.")
+            appendSnapshot(trace,ctCase,ctTime,roles,keepSuccDupes)
+            if caseId != ctCase:
+                yield (ctCase,trace)
+                trace = []
+        ctCase, ctTime, roles = caseId, time, set([activity])
+    if roles is not None:
+        appendSnapshot(trace,ctCase,ctTime,roles,keepSuccDupes)
+        yield (ctCase,trace)
+
+def appendSnapshot(trace:list,caseId,time,roles:set,keepSuccDupes):
+    '''
+    Side effect: mutates trace.
+    '''
+    activities = frozenset(roles)
+    if keepSuccDupes or not trace or trace[-1].activities != activities:
+        trace.append( StateSnapshot(caseId,time,activities) )
+
+
+def externalSortEntries(entries,chunkSize=DEFAULT_SORT_CHUNK_SIZE):
+    '''
+    Generator over entries in sorted order. Entries are sorted in memory in
+    runs of chunkSize, spilled to temporary files, and merged.
+    '''
+    runs = []
+    try:
+        chunk = []
+        for entry in entries:
+            chunk.append(entry)
+            if len(chunk) >= chunkSize:
+                runs.append( spillRun(chunk) )
+                chunk = []
+        if not runs:
+            yield from sorted(chunk)
+            return
+        if chunk:
+            runs.append( spillRun(chunk) )
+        yield from heapq.merge( *[readRun(run) for run in runs] )
+    finally:
+        for run in runs:
+            run.close()
+
+def spillRun(chunk:list):
+    run = tempfile.TemporaryFile()
+    for entry in sorted(chunk):
+        pickle.dump(entry,run)
+    run.seek(0)
+    return run
+
+def readRun(run):
+    while True:
+        try:
+            yield pickle.load(run)
+        except EOFError:
+            return
+
+
 def reportLogStats(sslog: dict,logname: str = None):
     result = ""
     if logname:
@@ -172,107 +564,187 @@ def sstrace_to_variant(sstrace) -> tuple:
     lresult = [ss.activities for ss in sstrace]
     return tuple(lresult)
 
-def noiseReduceByVariant(sslog: dict, noiseThreshold) -> dict:
+def sstrace_to_variant_key(sstrace, table:RoleSetTable=None) -> tuple:
+    '''
+    Hashable key identifying the variant of a trace. With a table, keys are
+    tuples of role set ids in that table, see RoleSetTable.variant_key.
+    Without, keys are tuples of role sets. Keys only compare with keys made
+    the same way.
+    '''
+    if table is not None:
+        return table.variant_key(sstrace)
+    return sstrace_to_variant(sstrace)
+
+class VariantIndex:
+    '''
+    Variant of each case of a log and the case count of each variant, built
+    in one pass. Noise reduction at any threshold is then a selection over
+    the counts, without computing variant keys again.
+
+    Variants are numbered by first appearance in the log. Variant keys use
+    role set ids of table, or of the log's own table for columnar logs, and
+    role sets otherwise.
+    '''
+
+    def __init__(self, sslog: dict, table: RoleSetTable=None):
+        self.sslog = sslog
+        if table is None:
+            table = getattr(sslog,'table',None)
+        self.table = table
+        self._caseIds = list(sslog.keys())
+        self._vids = {}
+        self._caseVariants = []
+        self._variantCases = []
+        for caseId in self._caseIds:
+            key = sstrace_to_variant_key(sslog[caseId],table)
+            vid = self._vids.get(key)
+            if vid is None:
+                vid = len(self._variantCases)
+                self._vids[key] = vid
+                self._variantCases.append([])
+            self._variantCases[vid].append(caseId)
+            self._caseVariants.append(vid)
+        self._counts = [len(cases) for cases in self._variantCases]
+
+    def case_total(self) -> int:
+        return len(self._caseIds)
+
+    def variant_count(self) -> int:
+        return len(self._counts)
+
+    def count(self, sstrace) -> int:
+        ''' Cases with the variant of sstrace. '''
+        vid = self._vids.get( sstrace_to_variant_key(sstrace,self.table) )
+        return 0 if vid is None else self._counts[vid]
+
+    def variant_counts(self) -> dict:
+        ''' Case count by variant key. '''
+        return { key: self._counts[vid] for key, vid in self._vids.items() }
+
+    def case_ids(self, sstrace) -> list:
+        '''
+        Case ids with the variant of sstrace, in log order. Treat as
+        read-only.
+        '''
+        vid = self._vids.get( sstrace_to_variant_key(sstrace,self.table) )
+        return [] if vid is None else self._variantCases[vid]
+
+    def kept_variants(self, noiseThreshold) -> int:
+        threshold = noiseThreshold * len(self._caseIds)
+        return sum( [1 for ct in self._counts if ct >= threshold] )
+
+    def noise_reduce(self, noiseThreshold) -> dict:
+        '''
+        Cases whose variant has proportional frequency at least
+        noiseThreshold, in log order.
+        '''
+        if noiseThreshold <= 0:
+            return self.sslog
+        threshold = noiseThreshold * len(self._caseIds)
+        keep = [ct >= threshold for ct in self._counts]
+        sslog = self.sslog
+        return { caseId: sslog[caseId]
+                    for caseId, vid in zip(self._caseIds,self._caseVariants)
+                    if keep[vid] }
+
+
+def noiseReduceByVariant(sslog: dict, noiseThreshold,
+                         variantIndex: VariantIndex = None) -> dict:
     '''
     Remove trace variants where proportional frequency is less than the noise
-    threshold.
+    threshold. Pass a VariantIndex of sslog to reuse it across thresholds.
+    Raises ValueError if variantIndex was built for another log.
     '''
+    if variantIndex is not None and variantIndex.sslog is not sslog:
+        raise ValueError('VariantIndex is not an index of sslog')
     if noiseThreshold <= 0:
         return sslog
-    variants = defaultdict(int)
-    total = 0
-    for ss in sslog:
-        variant = sstrace_to_variant(sslog[ss])
-        variants[variant] += 1
-        total += 1
-    threshold = noiseThreshold * total
-    result = {}
-    for ss in sslog:
-        variant = sstrace_to_variant(sslog[ss])
-        if variants[variant] >= threshold:
-            result[ss] = sslog[ss]
-    return result
+    if variantIndex is None:
+        variantIndex = VariantIndex(sslog)
+    return variantIndex.noise_reduce(noiseThreshold)
 
 
-def take_tails(sslog: dict, role, min_length:int=1) -> dict:
+def take_tails(sslog: dict, role, min_length:int=1,
+               roleIndex: RoleIndex=None) -> dict:
     '''
     Truncates each trace before the first occurrence of role. Returns sslog.
+    If roleIndex, an index of sslog, is given the result is a view found
+    from the index.
     '''
+    if roleIndex is not None:
+        return roleIndex.take_tails(role,min_length)
     result = {}
     for caseId in sslog:
         trace = sslog[caseId]
         newTrace = []
-        inTail = False
-        for ss in trace:
-            if inTail:
-                newTrace.append(ss)
+        for i, ss in enumerate(trace):
             if role in ss.activities:
-                inTail = True
-                newTrace.append(ss)
+                newTrace = trace[i:]
+                break
         if len(newTrace) >= min_length:
             result[caseId] = newTrace
     return result
 
 
-def filter_by_role(sslog: dict, role) -> dict:
+def filter_by_role(sslog: dict, role, roleIndex: RoleIndex=None) -> dict:
     '''
-    Keep only traces with role. Returns sslog.
+    Keep only traces with role. Returns sslog. If roleIndex, an index of
+    sslog, is given the result is a view found from the index.
     '''
+    if roleIndex is not None:
+        return roleIndex.filter_by_role(role)
     result = {}
     for caseId in sslog:
         trace = sslog[caseId]
-        inTail = False
         for ss in trace:
             if role in ss.activities:
                 result[caseId] = trace
-                continue
+                break
     return result
 
-def filter_by_roleset(sslog: dict, roles: list) -> dict:
+def filter_by_roleset(sslog: dict, roles: list,
+                      roleIndex: RoleIndex=None) -> dict:
     '''
-    Keep only traces with an entry with all roles. Returns sslog.
+    Keep only traces with an entry with all roles. Returns sslog. If 
+    roleIndex, an index of sslog, is given the result is a view found from
+    the index.
     '''
+    if roleIndex is not None:
+        return roleIndex.filter_by_roleset(roles)
     result = {}
     for caseId in sslog:
         trace = sslog[caseId]
-        inTail = False
         for ss in trace:
-            found = True
-            for role in roles:
-                if role not in ss.activities:
-                    found = False
-                    continue
-            if found:
+            if all( [role in ss.activities for role in roles] ):
                 result[caseId] = trace
+                break
     return result
 
 def keep_top_roles(sslog: dict, keeptop:int, drop=False,
-                   conflaterole='other') -> dict:
+                   conflaterole='other', roleStats: RoleStatistics=None) \
+        -> dict:
     '''
     Replace most frequent roles, as determined by keeptop. Conflate remaining
-    roles into single role with label conflaterole. Returns sslog.
+    roles into single role with label conflaterole. Returns sslog. Pass
+    roleStats for sslog to reuse role frequencies. Each distinct role set is
+    remapped once.
     '''
+    if roleStats is None:
+        roleStats = RoleStatistics.from_log(sslog)
+    mapping = roleStats.replacement_map(keeptop,drop,conflaterole)
+    remapped = {}
     result = {}
-    rolefreq = defaultdict(int)
-    for caseId in sslog:
-        trace = sslog[caseId]
-        for ss in trace:
-            for role in ss.activities:
-                rolefreq[role] += 1
-    toproles = sorted([(-value,role) for (role,value) in rolefreq.items()])
-    toproles = [role for (value,role) in toproles][:keeptop]
     for caseId in sslog:
         trace = sslog[caseId]
         newTrace = []
-        inTail = False
         for ss in trace:
-            if drop:
-                newact = [role for role in ss.activities if role in toproles]
-            else:
-                newact = [role if role in toproles else conflaterole \
-                            for role in ss.activities]
-            newss = StateSnapshot(ss.caseId,ss.time,frozenset(newact) )
-            newTrace.append(newss)
+            activities = ss.activities
+            newact = remapped.get(activities)
+            if newact is None:
+                newact = frozenset( [mapping[role] for role in activities
+                                        if mapping[role] is not None] )
+                remapped[activities] = newact
+            newTrace.append( StateSnapshot(ss.caseId,ss.time,newact) )
         result[caseId] = newTrace
     return result
 
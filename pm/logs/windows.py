@@ -0,0 +1,100 @@
+'''
+Time-windowed views of state snapshot logs.
+
+A TimeIndex holds the snapshot times of each case of a log, built once.
+Windows are found by binary search over those times and returned as
+LogViews, which keep an entry range per case and slice the parent log's
+traces on access. No snapshots are copied, so a sweep over many windows
+costs O(cases log n) per window.
+
+Traces must be in time order, as the log loaders produce them.
+'''
+
+from bisect import bisect_left, bisect_right
+from collections.abc import Mapping
+
+
+class LogView(Mapping):
+    '''
+    Read-only mapping from case id to a slice of the parent log's trace for
+    that case.
+    '''
+
+    def __init__(self, sslog: dict, ranges: dict):
+        self._sslog = sslog
+        self._ranges = ranges
+
+    def __getitem__(self, caseId) -> list:
+        start, stop = self._ranges[caseId]
+        return self._sslog[caseId][start:stop]
+
+    def __iter__(self):
+        return iter(self._ranges)
+
+    def __len__(self):
+        return len(self._ranges)
+
+    def __contains__(self, caseId):
+        return caseId in self._ranges
+
+    def __repr__(self):
+        return f'LogView: {len(self)} cases, ' \
+               f'{self.snapshot_count()} snapshots'
+
+    @property
+    def parent(self) -> dict:
+        return self._sslog
+
+    def entry_range(self, caseId) -> tuple:
+        ''' (start, stop) of the case's entries in the parent trace. '''
+        return self._ranges[caseId]
+
+    def snapshot_count(self) -> int:
+        return sum( [stop - start for start, stop in self._ranges.values()] )
+
+    def to_dict(self) -> dict:
+        return { caseId: self[caseId] for caseId in self._ranges }
+
+
+class TimeIndex:
+    '''
+    Snapshot times of each case of sslog, for finding windows by binary
+    search. Empty traces are left out of all views.
+    '''
+
+    def __init__(self, sslog: dict):
+        self.sslog = sslog
+        self._times = { caseId: [ss.time for ss in trace]
+                            for caseId, trace in sslog.items() if trace }
+
+    def first_years(self, years) -> LogView:
+        '''
+        Each trace up to the last snapshot at most years after its first,
+        as cgedq.mine.filterByTimeOnInt.
+        '''
+        return LogView( self.sslog,
+                        { caseId: (0, bisect_right(times, times[0] + years))
+                            for caseId, times in self._times.items() } )
+
+    def first_years_cuts(self, caseId, windows: list) -> list:
+        '''
+        Prefix length of the trace for caseId for each window of years in
+        windows, as first_years, where a window of None is the whole trace.
+        '''
+        times = self._times[caseId]
+        return [ len(times) if years is None
+                    else bisect_right(times, times[0] + years)
+                        for years in windows ]
+
+    def calendar(self, start, end) -> LogView:
+        '''
+        Snapshots with start <= time < end. Cases with no snapshots in the
+        window are left out.
+        '''
+        ranges = {}
+        for caseId, times in self._times.items():
+            lo = bisect_left(times, start)
+            hi = bisect_left(times, end, lo)
+            if hi > lo:
+                ranges[caseId] = (lo,hi)
+        return LogView(self.sslog, ranges)
@@ -0,0 +1,215 @@
+'''
+Batch comparison of many logs against many models.
+
+Each log or model is given once by name, as a dict of trace to frequency
+or a TraceFrequency. Its trace frequencies, background costs and zero order
+entry frequencies are computed once however many comparisons it takes part
+in, and traces of all of them are interned to a shared variant universe so
+each comparison is an array lookup and reduction.
+'''
+
+from concurrent.futures import ProcessPoolExecutor
+import logging
+import os
+
+import numpy as np
+
+from pm.metrics.relevance import ZeroOrderRelevanceCalculator, \
+        background_costs, uniform_role_background_cost
+from pm.metrics.variants import LogVariants, selector_cost_arrays, \
+        trace_compression_cost_arrays, unit_earthmovers_arrays
+from pm.pmmodels.tracefreq import TraceFrequency, RoleTraceFrequency
+
+
+logger = logging.getLogger(__name__)
+debug, info = logger.debug, logger.info
+
+
+RELEVANCE_UNIFORM_ROLESET = 'relevance_uniform_roleset'
+RELEVANCE_ZERO_ORDER = 'relevance_zero_order'
+UNIT_EARTHMOVERS = 'unit_earthmovers'
+
+METRICS = (RELEVANCE_UNIFORM_ROLESET, RELEVANCE_ZERO_ORDER, UNIT_EARTHMOVERS)
+
+
+class LogRow:
+    '''
+    Arrays for one log as the first argument of each metric: universe ids,
+    frequencies and background costs of its traces, and its zero order
+    prelude cost.
+    '''
+
+    def __init__(self, tf: TraceFrequency, universe: dict):
+        lv = LogVariants(tf)
+        zoc = ZeroOrderRelevanceCalculator(tf,None)
+        self.ids = np.fromiter( (universe[trace] for trace in lv.traces),
+                                dtype=np.int64, count=len(lv) )
+        self.freqs = lv.freqs
+        self.total = lv.total
+        self.roleBackground = background_costs(lv,
+                                            uniform_role_background_cost)
+        self.zeroBackground = lv.background_costs(zoc.background_cost)
+        self.zeroPrelude = zoc.prelude_cost(tf,None)
+
+
+def compare_row(row: LogRow, modelFreqs: np.ndarray,
+                modelTotals: np.ndarray) -> np.ndarray:
+    '''
+    Metrics of one log against each model, as an array of shape
+    (models, len(METRICS)). modelFreqs holds one universe frequency vector
+    per model.
+    '''
+    result = np.empty( (len(modelTotals),len(METRICS)) )
+    for j, modelTotal in enumerate(modelTotals):
+        mf = modelFreqs[j][row.ids]
+        sc = selector_cost_arrays(row.freqs, row.total, mf)
+        result[j,0] = sc + trace_compression_cost_arrays(row.freqs,
+                                row.total, mf, modelTotal, row.roleBackground)
+        result[j,1] = sc + trace_compression_cost_arrays(row.freqs,
+                                row.total, mf, modelTotal, row.zeroBackground)\
+                         + row.zeroPrelude
+        result[j,2] = unit_earthmovers_arrays(row.freqs, row.total,
+                                              mf, modelTotal)
+    return result
+
+
+class MetricMatrix:
+    '''
+    Metric values for each (log, model) pair, by name.
+    '''
+
+    def __init__(self, logNames: list, modelNames: list, values: np.ndarray):
+        self.logNames = list(logNames)
+        self.modelNames = list(modelNames)
+        self.values = values
+        self._logIndex = { name: i for i, name in enumerate(self.logNames) }
+        self._modelIndex = { name: j for j, name in enumerate(self.modelNames)}
+
+    def value(self, metric: str, log, model) -> float:
+        return float( self.values[ self._logIndex[log],
+                                   self._modelIndex[model],
+                                   METRICS.index(metric) ] )
+
+    def metrics(self, log, model) -> dict:
+        cell = self.values[ self._logIndex[log], self._modelIndex[model] ]
+        return { metric: float(cell[k]) for k, metric in enumerate(METRICS) }
+
+    def matrix(self, metric: str) -> np.ndarray:
+        ''' Array of shape (logs, models) for metric. '''
+        return self.values[:,:,METRICS.index(metric)]
+
+
+class BatchMetrics:
+    '''
+    Uniform roleset relevance, zero order relevance and unit earth movers
+    distance between any of a named set of role trace logs or model
+    languages. The same name may be used as a log in one comparison and a
+    model in another.
+    '''
+
+    def __init__(self, reps: dict):
+        self._tfs = {}
+        self._universe = {}
+        for name, rep in reps.items():
+            tf = rep if isinstance(rep,TraceFrequency) \
+                    else RoleTraceFrequency(rep)
+            self._tfs[name] = tf
+            for trace in tf.traces():
+                if trace not in self._universe:
+                    self._universe[trace] = len(self._universe)
+        self._rows = {}
+        self._modelFreqs = {}
+        debug(f'BatchMetrics: {len(self._tfs)} reps,'
+              f' {len(self._universe)} variants')
+
+    def tf(self, name) -> TraceFrequency:
+        return self._tfs[name]
+
+    def variant_count(self) -> int:
+        return len(self._universe)
+
+    def log_row(self, name) -> LogRow:
+        if name not in self._rows:
+            self._rows[name] = LogRow(self._tfs[name],self._universe)
+        return self._rows[name]
+
+    def model_freqs(self, name) -> np.ndarray:
+        if name not in self._modelFreqs:
+            tf = self._tfs[name]
+            freqs = np.zeros(len(self._universe))
+            for trace in tf.traces():
+                freqs[self._universe[trace]] = tf.freq(trace)
+            self._modelFreqs[name] = freqs
+        return self._modelFreqs[name]
+
+    def model_arrays(self, modelNames: list) -> tuple:
+        '''
+        (modelFreqs, modelTotals) for modelNames, as compare_row takes them.
+        '''
+        modelFreqs = np.array( [self.model_freqs(name)
+                                    for name in modelNames] )\
+                        .reshape( (len(modelNames),len(self._universe)) )
+        modelTotals = np.array( [self._tfs[name].trace_total()
+                                    for name in modelNames], dtype=float )
+        return (modelFreqs, modelTotals)
+
+    def compare_rows(self, rows: list, modelFreqs: list, modelTotals: list,
+                     parallel: bool=False, workers: int=None) -> list:
+        '''
+        compare_row for each log row against its own model arrays. If
+        parallel, rows are computed in a process pool of workers processes.
+        '''
+        if parallel and len(rows) > 1:
+            if not workers:
+                workers = os.cpu_count()
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                return list( executor.map( compare_row, rows, modelFreqs,
+                                           modelTotals ) )
+        return [compare_row(row,freqs,totals)
+                    for row, freqs, totals in zip(rows,modelFreqs,modelTotals)]
+
+    def compare(self, logNames: list, modelNames: list,
+                parallel: bool=False, workers: int=None) -> MetricMatrix:
+        '''
+        Metrics for every log in logNames against every model in
+        modelNames. If parallel, log rows are computed in a process pool of
+        workers processes.
+        '''
+        rows = [self.log_row(name) for name in logNames]
+        modelFreqs, modelTotals = self.model_arrays(modelNames)
+        results = self.compare_rows(rows, [modelFreqs]*len(rows),
+                                    [modelTotals]*len(rows), parallel, workers)
+        values = np.array(results)\
+                    .reshape( (len(rows),len(modelNames),len(METRICS)) )
+        return MetricMatrix(logNames,modelNames,values)
+
+    def compare_pairs(self, pairs: list, parallel: bool=False,
+                      workers: int=None) -> dict:
+        '''
+        Metrics for each (log, model) name pair in pairs only, as a dict
+        from pair to metrics by name. Each log row is computed once, against
+        only the models it is paired with. If parallel, log rows are
+        computed in a process pool of workers processes.
+        '''
+        byLog = {}
+        for log, model in pairs:
+            models = byLog.setdefault(log,[])
+            if model not in models:
+                models.append(model)
+        rows, modelFreqs, modelTotals = [], [], []
+        for log, models in byLog.items():
+            rows.append( self.log_row(log) )
+            freqs, totals = self.model_arrays(models)
+            modelFreqs.append(freqs)
+            modelTotals.append(totals)
+        results = self.compare_rows(rows, modelFreqs, modelTotals, 
+                                    parallel, workers)
+        values = {}
+        for (log, models), result in zip(byLog.items(),results):
+            for j, model in enumerate(models):
+                values[(log,model)] = { metric: float(result[j,k])
+                                        for k, metric in enumerate(METRICS) }
+        return values
+
+    def metrics(self, log, model) -> dict:
+        return self.compare([log],[model]).metrics(log,model)
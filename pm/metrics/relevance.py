@@ -12,7 +12,9 @@ Uniform background model only.
 import logging
 import math
 
-from pm.logs.statesnaplog import format_trace
+from pm.metrics.variants import LogVariants, selector_cost_arrays, \
+        trace_compression_cost_arrays, uniform_background_costs, \
+        uniform_role_background_costs
 from pm.pmmodels.tracefreq import *
 
 # class BackgroundModel(Enum):
@@ -60,42 +62,40 @@ def uniform_role_background_cost(logTF,trace):
 
 background_cost = uniform_background_cost
 
+'''
+Array forms of the uniform background costs, computed from trace lengths.
+'''
+VECTORISED_BACKGROUND_COSTS = {
+    uniform_background_cost: uniform_background_costs,
+    uniform_role_background_cost: uniform_role_background_costs }
+
+
+def background_costs(lv: LogVariants, background_cost):
+    '''
+    Background cost of each trace of lv, by the array form of
+    background_cost where it has one.
+    '''
+    vectorised = VECTORISED_BACKGROUND_COSTS.get(background_cost)
+    return lv.background_costs(background_cost, vectorised)
+
 
-def selector_cost(logTF: TraceFrequency, modelTF: TraceFrequency) -> float:
-    lsum = 0
-    full_coverage = True
-    for trace in logTF.traces():
-        mf = modelTF.freq(trace)
-        if mf > 0:
-            lsum += logTF.freq(trace)
-        else:
-            full_coverage = False
-    if (lsum == 0) or full_coverage:
-        return 0
-    rho = lsum / logTF.trace_total()
-    return -1 * (rho * math.log2(rho) + (1 - rho)*math.log2(1 - rho));
+def selector_cost(logTF: TraceFrequency, modelTF: TraceFrequency,
+                  logVariants: LogVariants = None) -> float:
+    lv = logVariants or LogVariants(logTF)
+    return selector_cost_arrays(lv.freqs, lv.total, lv.align(modelTF))
 
 
 def trace_compression_cost(logTF: TraceFrequency, 
                            modelTF: TraceFrequency,
-                           background_cost) -> float:
-    lsum = 0
-    mc = 0
-    bgc = 0
-    for trace in logTF.traces():
-        mf = modelTF.freq(trace)
-        cost = 0
-        if mf > 0:
-            cost = logTF.freq(trace) * model_cost(modelTF,trace)
-            mc += cost
-            debug(f'Compression model cost: {format_trace(trace)!s:33} {cost}')
-        else:
-            cost = logTF.freq(trace) * background_cost(logTF,trace)
-            bgc += cost
-            debug(f'Compression bg cost: {format_trace(trace)!s:33} {cost}')
-        lsum += cost
-    debug(f'Trace compression cost: {lsum / logTF.trace_total()}')
-    return lsum / logTF.trace_total()
+                           background_cost,
+                           logVariants: LogVariants = None) -> float:
+    lv = logVariants or LogVariants(logTF)
+    result = trace_compression_cost_arrays(lv.freqs, lv.total,
+                                           lv.align(modelTF),
+                                           modelTF.trace_total(),
+                                           background_costs(lv,background_cost))
+    debug(f'Trace compression cost: {result}')
+    return result
 
 
 def log2floor(x:float) -> float:
@@ -110,9 +110,19 @@ def uniform_prelude_cost(logTF: TraceFrequency,modelTF: TraceFrequency):
 
 
 class RelevanceCalculator:
-    def relevance(self,logTF: TraceFrequency, modelTF: TraceFrequency) -> float:
-        return selector_cost(logTF,modelTF) \
-             + trace_compression_cost(logTF,modelTF,self.background_cost)\
+    '''
+    Log and model frequencies are aligned once as LogVariants arrays, and
+    the selector and compression costs computed from them. Pass
+    logVariants to reuse the arrays for one log across models.
+    '''
+    def relevance(self,logTF: TraceFrequency, modelTF: TraceFrequency,
+                  logVariants: LogVariants = None) -> float:
+        lv = logVariants or LogVariants(logTF)
+        modelFreqs = lv.align(modelTF)
+        return selector_cost_arrays(lv.freqs, lv.total, modelFreqs) \
+             + trace_compression_cost_arrays(lv.freqs, lv.total, modelFreqs,
+                            modelTF.trace_total(),
+                            background_costs(lv,self.background_cost)) \
              + self.prelude_cost(logTF,modelTF)
 
 
@@ -155,7 +165,7 @@ class ZeroOrderRelevanceCalculator(RelevanceCalculator):
         self.prelude_cost = \
                 lambda logTf, modelTf: \
                     self.zero_order_prelude_cost(logTf)
-        self._roleFreq = EntryFrequency(logTF)
+        self._roleFreq = logTF.entry_frequency()
         self.background_cost = \
                 lambda logTf, trace: \
                         self.zero_order_background_cost(logTf,
@@ -174,16 +184,12 @@ class ZeroOrderRelevanceCalculator(RelevanceCalculator):
 
     def zero_order_background_cost(self,logTF:TraceFrequency, 
                                    roleFreq:EntryFrequency, trace) -> float:
-        debug(f'zero_order_bg {trace}')
         roleCtWithTerminals = roleFreq.entry_total() + logTF.trace_total()
         sumv = 0
         for entry in trace:
-            entrybits =  math.log2( roleFreq.entry_freq(entry) / \
-                                    roleCtWithTerminals)
-            sumv += entrybits 
-            debug(f'    {entry}  ... {entrybits}')
+            sumv += math.log2( roleFreq.entry_freq(entry) / \
+                               roleCtWithTerminals)
         sumv += math.log2( logTF.trace_total() / roleCtWithTerminals )
-        debug(f'    {-1*sumv}') 
         return -1*sumv
 
 
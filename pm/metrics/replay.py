@@ -0,0 +1,151 @@
+'''
+Exact model probabilities for the traces of a log, by replaying a prefix
+trie of the log's variants against the model semantics.
+
+Probability mass over markings is carried down the trie, so traces sharing
+a prefix share its replay, and only markings reached by some log prefix
+are ever explored. Model behaviour the log does not use is pruned as soon
+as its role set leaves the trie.
+'''
+
+import logging
+
+from pm.pmmodels.plpn import Marking, PetriNetSemantics, frozen_mark
+
+
+logger = logging.getLogger(__name__)
+debug, info = logger.debug, logger.info
+
+
+def marking_label(mark) -> frozenset:
+    return frozenset( [place.name for place in mark] )
+
+
+class TraceTrie:
+    '''
+    Prefix tree of traces. Node 0 is the root, for the empty prefix. Each
+    node has children by next entry, and the frequency of the traces that
+    end at it.
+    '''
+
+    def __init__(self, log: dict = None):
+        self._children = [{}]
+        self._entries = [None]
+        self._ends = [None]
+        if log:
+            for trace, freq in log.items():
+                self.add(trace,freq)
+
+    def add(self, trace: tuple, freq: int = 1):
+        node = 0
+        for entry in trace:
+            entry = frozenset(entry)
+            children = self._children[node]
+            if entry not in children:
+                children[entry] = len(self._children)
+                self._children.append({})
+                self._entries.append(entry)
+                self._ends.append(None)
+            node = children[entry]
+        self._ends[node] = (trace, (self._ends[node] or (trace,0))[1] + freq)
+
+    def children(self, node: int) -> dict:
+        return self._children[node]
+
+    def entry(self, node: int) -> frozenset:
+        return self._entries[node]
+
+    def ending(self, node: int):
+        ''' (trace, frequency) of the trace ending at node, or None. '''
+        return self._ends[node]
+
+    def __len__(self):
+        return len(self._children)
+
+
+class ReplayProbabilities:
+    '''
+    Model probabilities of the traces of a log, found by replaying a
+    TraceTrie of the log. Provides freq() and trace_total() as
+    TraceFrequency does, with freq() the probability and trace_total() one,
+    so it can be used as the model in the relevance calculations.
+    '''
+
+    def __init__(self, semantics: PetriNetSemantics, log: dict):
+        self._semantics = semantics
+        self._trie = log if isinstance(log,TraceTrie) else TraceTrie(log)
+        self._moves = {}
+        self._probs = {}
+        self.replay()
+
+    def moves(self, marking: Marking) -> tuple:
+        '''
+        (absorbing, successors) for marking, where successors maps each
+        next marking's label to a dict of next marking to probability.
+        Computed once per marking.
+        '''
+        fm = marking.mark
+        if fm in self._moves:
+            return self._moves[fm]
+        sem = self._semantics
+        sem.mark = marking
+        enabled = sem.enabled()
+        total = sum( [tran.weight for tran in enabled] )
+        successors = {}
+        if total > 0:
+            for tran in enabled:
+                nm = sem.remark(tran)
+                sem.mark = marking
+                byLabel = successors.setdefault(marking_label(nm.mark),{})
+                byLabel[nm.mark] = byLabel.get(nm.mark,0.0) \
+                                        + tran.weight / total
+        result = (total <= 0, successors)
+        self._moves[fm] = result
+        return result
+
+    def replay(self):
+        sem = self._semantics
+        startMarking = sem.mark
+        net = startMarking.net
+        start = frozen_mark(startMarking.mark)
+        trie = self._trie
+        # node, distribution of marking to probability
+        stack = []
+        rootEntry = marking_label(start)
+        if rootEntry in trie.children(0):
+            stack.append( (trie.children(0)[rootEntry], {start: 1.0}) )
+        while stack:
+            node, dist = stack.pop()
+            ending = trie.ending(node)
+            if ending is not None:
+                prob = 0.0
+                for fm, p in dist.items():
+                    absorbing, successors = self.moves(Marking(net,fm))
+                    if absorbing:
+                        prob += p
+                self._probs[ending[0]] = prob
+            for entry, child in trie.children(node).items():
+                nextDist = {}
+                for fm, p in dist.items():
+                    absorbing, successors = self.moves(Marking(net,fm))
+                    for nm, q in successors.get(entry,{}).items():
+                        nextDist[nm] = nextDist.get(nm,0.0) + p*q
+                if nextDist:
+                    stack.append( (child, nextDist) )
+        sem.mark = startMarking
+        debug(f'ReplayProbabilities: {len(trie)} trie nodes,'
+              f' {len(self._moves)} markings')
+
+    def marking_count(self) -> int:
+        ''' Markings explored during replay. '''
+        return len(self._moves)
+
+    def probabilities(self) -> dict:
+        ''' Probability of each log trace the model can produce. '''
+        return self._probs
+
+    def freq(self, trace) -> float:
+        return self._probs.get(trace,0.0)
+
+    def trace_total(self) -> float:
+        return 1.0
@@ -0,0 +1,87 @@
+'''
+Log and model trace frequencies aligned as parallel NumPy arrays, for
+computing relevance and earth mover's distance as array reductions.
+
+Each distinct log trace is interned to an id, its position in the log. A
+model is aligned by looking up the model frequency of each log trace once,
+after which no metric needs per-trace Python work.
+'''
+
+import math
+
+import numpy as np
+
+from pm.pmmodels.tracefreq import TraceFrequency
+
+
+class LogVariants:
+    '''
+    Trace ids, frequencies and lengths of the traces of a log. Build once
+    per log and align against any number of models.
+    '''
+
+    def __init__(self, logTF: TraceFrequency):
+        self.logTF = logTF
+        self.traces = list(logTF.traces())
+        self.index = { trace: i for i, trace in enumerate(self.traces) }
+        count = len(self.traces)
+        self.freqs = np.fromiter( (logTF.freq(trace) for trace in self.traces),
+                                  dtype=float, count=count )
+        self.lengths = np.fromiter( (len(trace) for trace in self.traces),
+                                    dtype=float, count=count )
+        self.total = logTF.trace_total()
+
+    def __len__(self):
+        return len(self.traces)
+
+    def align(self, modelTF: TraceFrequency) -> np.ndarray:
+        ''' Model frequency of each log trace, by trace id. '''
+        return np.fromiter( (modelTF.freq(trace) for trace in self.traces),
+                            dtype=float, count=len(self.traces) )
+
+    def background_costs(self, background_cost,
+                         vectorised=None) -> np.ndarray:
+        '''
+        Background cost of each log trace. vectorised, the array form of
+        background_cost over LogVariants, is used if given; otherwise
+        background_cost is called per trace.
+        '''
+        if background_cost is None:
+            return np.zeros(len(self))
+        if vectorised:
+            return vectorised(self)
+        return np.fromiter( (background_cost(self.logTF,trace)
+                                for trace in self.traces),
+                            dtype=float, count=len(self) )
+
+
+def uniform_background_costs(lv: LogVariants) -> np.ndarray:
+    return (lv.lengths + 1) * math.log2( lv.logTF.role_total() + 1 )
+
+def uniform_role_background_costs(lv: LogVariants) -> np.ndarray:
+    return (lv.lengths + 1) * math.log2( 2**lv.logTF.role_total() + 1 )
+
+
+def selector_cost_arrays(logFreqs: np.ndarray, logTotal: float,
+                         modelFreqs: np.ndarray) -> float:
+    covered = modelFreqs > 0
+    lsum = logFreqs[covered].sum()
+    if (lsum == 0) or covered.all():
+        return 0
+    rho = lsum / logTotal
+    return float( -1 * (rho * math.log2(rho) + (1 - rho)*math.log2(1 - rho)) )
+
+
+def trace_compression_cost_arrays(logFreqs: np.ndarray, logTotal: float,
+                                  modelFreqs: np.ndarray, modelTotal: float,
+                                  backgroundCosts: np.ndarray) -> float:
+    covered = modelFreqs > 0
+    modelCosts = -1.0 * np.log2( modelFreqs[covered] / modelTotal )
+    lsum = np.dot( logFreqs[covered], modelCosts ) \
+         + np.dot( logFreqs[~covered], backgroundCosts[~covered] )
+    return float( lsum / logTotal )
+
+
+def unit_earthmovers_arrays(freqs1: np.ndarray, total1: float,
+                            freqs2: np.ndarray, total2: float) -> float:
+    return float( 1 - np.maximum( freqs1/total1 - freqs2/total2, 0 ).sum() )
@@ -1,15 +1,24 @@
 
-from copy import deepcopy
+from collections import deque
 import logging
+import time
 from typing import Iterable
 
 from pmkoalas.models.petrinet import Place, LabelledPetriNet
-from pm.pmmodels.plpn import Marking, PetriNetSemantics
+from pm.pmmodels.plpn import Marking, PetriNetSemantics, frozen_mark
 
 logger = logging.getLogger(__name__)
 debug, info = logger.debug, logger.info
 
 
+COMPLETE = 'complete'
+MAX_MARKINGS = 'max_markings'
+MAX_DEPTH = 'max_depth'
+TIME_LIMIT = 'time_limit'
+
+PROGRESS_INTERVAL = 10000
+
+
 def place_tuple_key(pt):
     place, val = pt
     return  (place.name,place.pid,val)
@@ -20,17 +29,9 @@ def sort_place_tuple_seq(ptl):
         result.append( entry )
     return tuple(result)
 
-def freeze_semantics(semantics:PetriNetSemantics):
-    return freeze_mark(semantics.marking())
-
 def freeze_mark(marking:Marking):
-    debug(f"freeze_mark( {marking.mark} )")
     return sort_place_tuple_seq(marking.mark.items())
 
-def thaw_mark(marking:tuple):
-    debug(f'thaw_mark( {marking} )')
-    return { place : tokens for place, tokens in marking }
-
 
 def reachable_markings(semantics:PetriNetSemantics) -> Iterable:
     '''
@@ -39,40 +40,240 @@ def reachable_markings(semantics:PetriNetSemantics) -> Iterable:
     provides no termination guarantee. The caller is responsible to pass 
     nets, markings and semantics that do not create infinite reachable markings,
     eg, workflow nets.
+
+    Markings are searched as FrozenMark and returned as sorted place tuple
+    sequences, as from freeze_mark.
     '''
     debug(f'reachable_markings() ')
     if len(semantics.mark.mark) == 0:
         return set()
-    stack = []
-    result = set()  
-    startMark = deepcopy(semantics.mark.mark)
-    debug(f'startMark {startMark}')
-    enabled = semantics.enabled()
-    fsm = freeze_mark(semantics.mark)
-    # marking, level
-    stack.append( (fsm, 0) )
+    startMarking = semantics.mark
+    net = startMarking.net
+    start = frozen_mark(startMarking.mark)
+    debug(f'startMark {start}')
+    visited = {start}
+    stack = [Marking(net,start)]
     while stack != []:
-        fmark, level = stack.pop()
-        mark = thaw_mark (fmark)
-        debug(f'looking at {mark}')
-        semantics.mark = Marking(semantics.mark.net,mark)
-        result |= set( [fmark] )
-        level += 1
-        enabled = semantics.enabled()
-        debug(f'{level} enabled {enabled}')
-        for tran in enabled:
-            # debug(f'    semantics.mark {semantics.mark}')
-            # debug(f'    {level}    marking {semantics.mark.mark}')
-            # debug(f'    {level}    enabled {enabled}')
-            nm = semantics.remark(tran)
-            debug(f'    new mark {nm.mark}')
-            newmark = freeze_mark(nm)
-            if newmark not in result:
-                debug(f"    not in result, pushing on stack ... {newmark}")
-                stack.append( (newmark, level ) )
-            # debug(f'    {level}     next_markings {next_markings}')
-            semantics.mark = Marking(semantics.mark.net,mark)
-    semantics.mark = Marking(semantics.mark.net,startMark)
-    return result
+        marking = stack.pop()
+        semantics.mark = marking
+        for tran in semantics.enabled():
+            nm = semantics.remark(tran).mark
+            if nm not in visited:
+                visited.add(nm)
+                stack.append( semantics.mark )
+            semantics.mark = marking
+    semantics.mark = startMarking
+    return set( [sort_place_tuple_seq(mark.items()) for mark in visited] )
+
+
+class BitmaskReachability:
+    '''
+    Reachability for nets with place capacity one under RoleStateNetSemantics,
+    with markings encoded as integer bitmasks. Each place is a bit, assigned
+    in place_tuple_key order, so decoded markings match freeze_mark.
+
+    Each transition is indexed under one of its input places. A transition
+    can only be enabled if that place is marked, so only transitions indexed
+    under marked places are tested, each once.
+    '''
+
+    def __init__(self, net: LabelledPetriNet):
+        self._places = sorted(net.places,key=lambda p: (p.name,p.pid))
+        self._bits = { place: 1 << i for i, place in enumerate(self._places) }
+        incoming = {}
+        outgoing = {}
+        for tran in net.transitions:
+            incoming[tran] = 0
+            outgoing[tran] = 0
+        for arc in net.arcs:
+            if arc.to_node in incoming:
+                incoming[arc.to_node] |= self._bits[arc.from_node]
+            elif arc.from_node in outgoing:
+                outgoing[arc.from_node] |= self._bits[arc.to_node]
+        self._transitions = list(net.transitions)
+        self._sourceTrans = []
+        self._placeTrans = [ [] for place in self._places ]
+        for tran in self._transitions:
+            inMask = incoming[tran]
+            outMask = outgoing[tran]
+            # in mask, out places not also inputs, picky
+            entry = (inMask, outMask & ~inMask, outMask,
+                     getattr(tran,'picky',False), tran)
+            if inMask:
+                low = inMask & -inMask
+                self._placeTrans[low.bit_length()-1].append(entry)
+            else:
+                self._sourceTrans.append(entry)
+
+    def encode(self, mark: dict) -> int:
+        mask = 0
+        for place, tokens in mark.items():
+            if tokens == 0:
+                continue
+            if tokens > 1:
+                raise ValueError(
+                    f'Place {place} has {tokens} tokens, capacity is one')
+            mask |= self._bits[place]
+        return mask
+
+    def decode(self, mask: int) -> tuple:
+        '''
+        Marking as a sorted place tuple sequence, as from freeze_mark.
+        '''
+        result = []
+        while mask:
+            low = mask & -mask
+            result.append( (self._places[low.bit_length()-1], 1) )
+            mask ^= low
+        return tuple(result)
+
+    def candidates(self, mask: int):
+        yield from self._sourceTrans
+        while mask:
+            low = mask & -mask
+            yield from self._placeTrans[low.bit_length()-1]
+            mask ^= low
+
+    def successors(self, mask: int):
+        '''
+        Pairs of (transition, next marking mask) for transitions enabled at
+        mask.
+        '''
+        for inMask, addMask, outMask, picky, tran in self.candidates(mask):
+            if mask & inMask != inMask or mask & addMask:
+                continue
+            if picky and mask != inMask:
+                continue
+            yield tran, (mask & ~inMask) | outMask
+
+    def reachable(self, start: int) -> set:
+        '''
+        Set of marking masks reachable from start, by breadth first search.
+        '''
+        return self.explore(start).markings
+
+    def explore(self, start: int, budget: 'ReachabilityBudget' = None) \
+            -> 'ReachabilityResult':
+        '''
+        Breadth first search from start, stopping early if budget is
+        exhausted. The result markings are masks.
+        '''
+        if budget is None:
+            budget = ReachabilityBudget()
+        budget.start()
+        visited = {start}
+        frontier = deque([(start,0)])
+        status = COMPLETE
+        expanded = 0
+        depth = 0
+        while frontier:
+            if budget.progress_due(expanded):
+                budget.report(expanded,len(visited),len(frontier))
+                if budget.out_of_time():
+                    status = TIME_LIMIT
+                    break
+            mask, depth = frontier.popleft()
+            expanded += 1
+            for tran, nm in self.successors(mask):
+                if nm in visited:
+                    continue
+                if budget.maxDepth is not None and depth >= budget.maxDepth:
+                    status = MAX_DEPTH
+                    continue
+                if budget.maxMarkings is not None \
+                        and len(visited) >= budget.maxMarkings:
+                    status = MAX_MARKINGS
+                    frontier.clear()
+                    break
+                visited.add(nm)
+                frontier.append( (nm,depth+1) )
+        return ReachabilityResult(visited,status,depth,budget.elapsed())
+
+
+class ReachabilityBudget:
+    '''
+    Limits on a reachability search. Any limit may be None for no limit.
+    timeLimit is in seconds, checked every progressInterval expanded
+    markings, when progress is also reported. progress, if given, is called
+    as progress(markings, frontier, rate) with the number of markings found,
+    the frontier size and markings found per second, otherwise progress is
+    logged at debug level.
+    '''
+
+    def __init__(self, maxMarkings: int = None, maxDepth: int = None,
+                 timeLimit: float = None, progress = None,
+                 progressInterval: int = PROGRESS_INTERVAL):
+        self.maxMarkings = maxMarkings
+        self.maxDepth = maxDepth
+        self.timeLimit = timeLimit
+        self.progress = progress
+        self.progressInterval = progressInterval
+        self._started = None
+
+    def start(self):
+        self._started = time.monotonic()
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self._started
+
+    def out_of_time(self) -> bool:
+        return self.timeLimit is not None and self.elapsed() >= self.timeLimit
+
+    def progress_due(self, expanded: int) -> bool:
+        return expanded > 0 and expanded % self.progressInterval == 0
+
+    def report(self, expanded: int, markings: int, frontier: int):
+        elapsed = self.elapsed()
+        rate = markings / elapsed if elapsed > 0 else 0.0
+        if self.progress:
+            self.progress(markings,frontier,rate)
+        else:
+            debug(f'reachability: {markings} markings, frontier {frontier},'
+                  f' {rate:.0f} markings/s')
+
+
+class ReachabilityResult:
+    '''
+    Markings found by a reachability search. status is COMPLETE, or the
+    budget limit that stopped the search, in which case markings is a
+    subset of the reachable markings.
+    '''
 
+    def __init__(self, markings: set, status: str, depth: int, 
+                 elapsed: float):
+        self.markings = markings
+        self.status = status
+        self.depth = depth
+        self.elapsed = elapsed
 
+    @property
+    def complete(self) -> bool:
+        return self.status == COMPLETE
+
+    def __repr__(self):
+        return f'ReachabilityResult({len(self.markings)} markings,' \
+               f' {self.status}, depth {self.depth}, {self.elapsed:.2f}s)'
+
+
+def rsnet_reachable_markings(semantics:PetriNetSemantics) -> set:
+    '''
+    As reachable_markings, for RoleStateNetSemantics on nets with place
+    capacity one, using BitmaskReachability. The semantics marking is not
+    changed.
+    '''
+    return rsnet_explore(semantics).markings
+
+
+def rsnet_explore(semantics:PetriNetSemantics,
+                  budget: ReachabilityBudget = None) -> ReachabilityResult:
+    '''
+    As rsnet_reachable_markings, within budget. Markings are in the same
+    form as reachable_markings, and partial if the budget was exhausted.
+    '''
+    if len(semantics.mark.mark) == 0:
+        return ReachabilityResult(set(),COMPLETE,0,0.0)
+    engine = BitmaskReachability(semantics.mark.net)
+    result = engine.explore( engine.encode(semantics.mark.mark), budget )
+    debug(f'rsnet_explore() {result}')
+    result.markings = set( [engine.decode(mask) for mask in result.markings] )
+    return result
@@ -2,13 +2,192 @@
 Semantics for a Place Labelled Petri Net
 '''
 
-from copy import deepcopy
+from collections.abc import Mapping
 from dataclasses import dataclass
-from typing import Dict, Set
+from typing import Dict, Iterable, Set
 from pmkoalas.models.petrinet import *
 
 
 
+class FrozenMark(Mapping):
+    """
+    Immutable mapping from place to token count, with a cached hash.
+
+    Firing shares the unchanged counts. The new FrozenMark holds only the
+    counts of the consumed and produced places over the marking it was
+    fired from, and its hash and length are updated from those places, so
+    firing is O(degree). Lookups walk the chain of markings fired from,
+    which is copied into a dict once it is MAX_DEPTH long, or when the
+    marking is iterated. Markings can be used directly as dictionary keys 
+    and set members.
+    """
+    __slots__ = ('_tokens','_base','_delta','_depth','_len','_hash')
+
+    MAX_DEPTH = 8
+
+    def __init__(self, tokens: Dict[Place,int] = None):
+        self._tokens = dict(tokens) if tokens else {}
+        self._base = None
+        self._delta = None
+        self._depth = 0
+        self._len = len(self._tokens)
+        self._hash = None
+
+    @classmethod
+    def _wrap(cls, tokens: dict) -> 'FrozenMark':
+        fm = cls.__new__(cls)
+        fm._tokens = tokens
+        fm._base = None
+        fm._delta = None
+        fm._depth = 0
+        fm._len = len(tokens)
+        fm._hash = None
+        return fm
+
+    def fire(self, consumed: Iterable[Place], 
+             produced: Iterable[Place]) -> 'FrozenMark':
+        """
+        New marking with a token removed from each consumed place and added
+        to each produced place. Places left with no tokens are dropped.
+        """
+        delta = {}
+        olds = {}
+        for place in consumed:
+            if place in delta:
+                count = delta[place]
+            else:
+                count = olds[place] = self.get(place,0)
+            if count <= 0:
+                raise KeyError(place)
+            delta[place] = count - 1
+        for place in produced:
+            if place in delta:
+                count = delta[place]
+            else:
+                count = olds[place] = self.get(place,0)
+            delta[place] = count + 1
+        if self._depth >= self.MAX_DEPTH:
+            tokens = dict(self._flat())
+            for place, count in delta.items():
+                if count:
+                    tokens[place] = count
+                else:
+                    del tokens[place]
+            return FrozenMark._wrap(tokens)
+        hv = hash(self)
+        length = self._len
+        for place, count in delta.items():
+            old = olds[place]
+            if old:
+                hv ^= hash((place,old))
+                length -= 1
+            if count:
+                hv ^= hash((place,count))
+                length += 1
+        fm = FrozenMark.__new__(FrozenMark)
+        fm._tokens = None
+        fm._base = self
+        fm._delta = delta
+        fm._depth = self._depth + 1
+        fm._len = length
+        fm._hash = hv
+        return fm
+
+    def _flat(self) -> dict:
+        """
+        The counts as a dict, flattening the chain of markings fired from 
+        on first use.
+        """
+        if self._tokens is None:
+            tokens = dict(self._base._flat())
+            for place, count in self._delta.items():
+                if count:
+                    tokens[place] = count
+                else:
+                    tokens.pop(place,None)
+            self._tokens = tokens
+            self._base = None
+            self._delta = None
+            self._depth = 0
+        return self._tokens
+
+    def changed_from(self, other: 'FrozenMark') -> Iterable[Place]:
+        """
+        Places whose counts differ from other if this marking was fired
+        directly from other, otherwise None.
+        """
+        if self._base is other:
+            return self._delta.keys()
+        return None
+
+    def __getitem__(self, place: Place) -> int:
+        count = self.get(place,0)
+        if not count:
+            raise KeyError(place)
+        return count
+
+    def __contains__(self, place) -> bool:
+        return self.get(place,0) > 0
+
+    def get(self, place, default=None):
+        fm = self
+        while fm._tokens is None:
+            count = fm._delta.get(place)
+            if count is not None:
+                return count if count else default
+            fm = fm._base
+        return fm._tokens.get(place,default)
+
+    def keys(self):
+        return self._flat().keys()
+
+    def items(self):
+        return self._flat().items()
+
+    def values(self):
+        return self._flat().values()
+
+    def __iter__(self):
+        return iter(self._flat())
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __hash__(self) -> int:
+        if self._hash is None:
+            hv = 0
+            for item in self._flat().items():
+                hv ^= hash(item)
+            self._hash = hv
+        return self._hash
+
+    def __eq__(self, other) -> bool:
+        if self is other:
+            return True
+        if isinstance(other,FrozenMark):
+            if self._len != other._len or hash(self) != hash(other):
+                return False
+            return self._flat() == other._flat()
+        if isinstance(other,Mapping):
+            return self._flat() == dict(other.items())
+        return NotImplemented
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __repr__(self):
+        return f'FrozenMark({self._flat()})'
+
+
+def frozen_mark(mark: Mapping) -> FrozenMark:
+    if isinstance(mark,FrozenMark):
+        return mark
+    return FrozenMark(mark)
+
+
 @dataclass(frozen=True)
 class Marking:
     net: LabelledPetriNet
@@ -23,25 +202,50 @@ def singleton_marking(net, mark: list[Place]) -> Marking:
 class PetriNetSemantics:
     """
     Calculate enabling and firing semantics for a marked net.
+
+    Incoming and outgoing places of each transition, and the transitions
+    depending on each place, are indexed once. The enabled set is computed
+    in full on first use, then updated on each change of marking for only
+    the transitions depending on places whose token counts changed. 
+    Markings are treated as immutable.
     """
 
     def __init__(self, marking: Marking) -> None:
         self._net = marking.net
         self._mark = marking
+        self._enabled = None
         # for each transition compute the incoming and outgoing places
         # self._incoming
         # self._outgoing
         self._init_arc_context()
 
     def _init_arc_context(self):
-        self._incoming:Dict[Transition,Set[Place]] = dict()
-        self._outgoing:Dict[Transition,Set[Place]] = dict()
+        self._incoming:Dict[Transition,list[Place]] = dict()
+        self._outgoing:Dict[Transition,list[Place]] = dict()
+        self._dependents:Dict[Place,Set[Transition]] = dict()
+        # arcs may hold equal but distinct transition objects
+        transitions = dict()
         for trans in self._net.transitions:
-            arcs = self._net.arcs
-            incoming = [ arc for arc in arcs if  arc.to_node == trans ]
-            outgoing = [ arc for arc in arcs if arc.from_node == trans ]
-            self._incoming[trans] = [ arc.from_node for arc in incoming ]
-            self._outgoing[trans] = [ arc.to_node for arc in outgoing ]
+            transitions[trans] = trans
+            self._incoming[trans] = []
+            self._outgoing[trans] = []
+        for arc in self._net.arcs:
+            if arc.to_node in transitions:
+                trans, place = transitions[arc.to_node], arc.from_node
+                self._incoming[trans].append(place)
+            elif arc.from_node in transitions:
+                trans, place = transitions[arc.from_node], arc.to_node
+                self._outgoing[trans].append(place)
+            else:
+                continue
+            if self.indexed(trans):
+                self._dependents.setdefault(place,set()).add(trans)
+
+    def indexed(self, trans: Transition) -> bool:
+        """
+        Whether enabling of trans is updated through the place index.
+        """
+        return True
 
     @property
     def mark(self):
@@ -49,46 +253,87 @@ class PetriNetSemantics:
 
     @mark.setter
     def mark(self, value: Marking):
-        self._mark = value
+        self.set_marking(value)
+
+    def set_marking(self, value: Marking, changed: Iterable[Place] = None):
+        """
+        Move to marking value. changed, if given, holds every place whose 
+        token count differs from the current marking, otherwise it is 
+        found by comparing markings.
+        """
+        if value is self._mark:
+            return
+        if self._enabled is not None:
+            if changed is None:
+                changed = changed_places(self._mark.mark,value.mark)
+            self._mark = value
+            self.update_enabled(changed)
+        else:
+            self._mark = value
+
+    def transition_enabled(self, trans: Transition) -> bool:
+        for place in self._incoming[trans]:
+            if self._mark.mark.get(place,0) <= 0:
+                return False
+        return True
+
+    def compute_enabled(self) -> Set[Transition]:
+        return set( [trans for trans in self._net.transitions 
+                           if self.transition_enabled(trans)] )
+
+    def update_enabled(self, changed: Iterable[Place]):
+        affected = set()
+        for place in changed:
+            if place in self._dependents:
+                affected |= self._dependents[place]
+        for trans in affected:
+            if self.transition_enabled(trans):
+                self._enabled.add(trans)
+            else:
+                self._enabled.discard(trans)
 
     def enabled(self) -> Set[Transition]:
         """
         returns the set of transitions that are enabled at this marking.
         """
-        ret = set()
-        for trans in self._net.transitions:
-            enabled = True
-            for place in self._incoming[trans]:
-                enabled = enabled and place in self._mark.mark \
-                        and self._mark.mark[place] > 0
-            if (enabled):
-                ret.add(trans)
-        return ret
+        if self._enabled is None:
+            self._enabled = self.compute_enabled()
+        return set(self._enabled)
 
     def remark(self, firing:Transition) -> Marking:
         """
         Returns a new marking, that is one step from this marking by firing
         the given transition.
         """
-        if firing not in self.enabled():
+        if firing not in self._incoming \
+                or not self.transition_enabled(firing):
             raise ValueError(f"Transition {firing} cannot fire from marking {self._mark.mark}.")
-        next_mark = deepcopy(self._mark.mark)
-        for incoming in self._incoming[firing]:
-            next_mark[incoming] = next_mark[incoming] - 1
-            if next_mark[incoming] == 0:
-                del next_mark[incoming] 
-        for outgoing in self._outgoing[firing]:
-            if outgoing in next_mark:
-                next_mark[outgoing] = next_mark[outgoing] + 1
-            else:
-                next_mark[outgoing] = 1
-        self._mark = Marking(self._net, next_mark)
+        next_mark = frozen_mark(self._mark.mark).fire( 
+                        self._incoming[firing], self._outgoing[firing] )
+        self.set_marking( Marking(self._net, next_mark), 
+                          self._incoming[firing] + self._outgoing[firing] )
         return self._mark
 
     def marking(self):
         return self._mark
 
 
+def changed_places(mark1: dict, mark2: dict) -> set:
+    if isinstance(mark1,FrozenMark) and isinstance(mark2,FrozenMark):
+        changed = mark2.changed_from(mark1)
+        if changed is None:
+            changed = mark1.changed_from(mark2)
+        if changed is not None:
+            return set(changed)
+    changed = set()
+    for place, tokens in mark1.items():
+        if mark2.get(place) != tokens:
+            changed.add(place)
+    for place in mark2:
+        if place not in mark1:
+            changed.add(place)
+    return changed
+
 
 
 
@@ -101,26 +346,14 @@ class PLPNSemantics(PetriNetSemantics):
         super().__init__(marking)
 
 
-    def enabled(self) -> Set[Transition]:
-        """
-        returns the set of transitions that are enabled at this marking.
-        """
-        ret = set()
-        for trans in self._net.transitions:
-            enabled = True
-            for inp in self._incoming[trans]:
-                enabled = enabled \
-                        and inp in self._mark.mark \
-                        and self._mark.mark[inp] > 0
-            if not enabled:
-                next
-            for outp in self._outgoing[trans]:
-                enabled = enabled \
-                        and (not outp in self._mark.mark \
-                             or outp in self._incoming[trans])
-            if (enabled):
-                ret.add(trans)
-        return ret
+    def transition_enabled(self, trans: Transition) -> bool:
+        for inp in self._incoming[trans]:
+            if self._mark.mark.get(inp,0) <= 0:
+                return False
+        for outp in self._outgoing[trans]:
+            if outp in self._mark.mark and outp not in self._incoming[trans]:
+                return False
+        return True
 
 
 
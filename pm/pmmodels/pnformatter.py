@@ -8,6 +8,7 @@ from pmkoalas.models.petrinet import PetriNetDOTFormatter, Arc, Transition
 ## Includes local cut and paste fork elements
 ## Also has RoleStateNet specific elements 
 from pm.pmmodels.dotutil import export_DOT_to_image
+from pm.logs.rolestats import RoleStatistics
 from pm.pmmodels.rsnet import RoleStateNet
 
 
@@ -17,24 +18,17 @@ debug, info = logger.debug, logger.info
 class ScaledFormatter(PetriNetDOTFormatter):
     # These sizes should probably be relative instead of absolute
 
-    def __init__(self,pn,sslog:dict,font='SimSun'):
+    def __init__(self,pn,sslog:dict,font='SimSun',
+                 roleStats:RoleStatistics=None):
         rfont = 'SimSun' if (font is None) else font
         super().__init__(pn,rfont)
         self._nodemap = {}
         # self._default_height = 0.2
         self._default_font_size=12
-        actfreq = {}
-        actsum = 0
-        for caseId in sslog:
-            for ss in sslog[caseId]:
-                for act in ss.activities:
-                    if act in actfreq:
-                        actfreq[act] += 1
-                    else:
-                        actfreq[act] = 1
-                    actsum += 1
-        self._actfreq = actfreq
-        self._actsum = actsum
+        if roleStats is None:
+            roleStats = RoleStatistics.from_log(sslog)
+        self._actfreq = roleStats.frequencies()
+        self._actsum = roleStats.total()
         self._sf = 40
         self._arcscale = 10
         self._plscale = 2
@@ -96,8 +90,9 @@ class RoleStateNetFormatter(ScaledFormatter):
     def __init__(self,pn:RoleStateNet,sslog:dict,font='SimSun',
                  termination_weights=True,
                  initial_name = INITIAL_NAME, final_name=FINAL_NAME,
-                 final_arc_overflow=FINAL_ARC_OVERFLOW):
-        super().__init__(pn,sslog,font)
+                 final_arc_overflow=FINAL_ARC_OVERFLOW,
+                 roleStats:RoleStatistics=None):
+        super().__init__(pn,sslog,font,roleStats)
         self._termination_weights = termination_weights
         self._initial_name = initial_name
         self._final_name = final_name
@@ -143,10 +138,30 @@ class RoleStateNetFormatter(ScaledFormatter):
             for place in tran_incoming[tran]:
                 fstr += f'{place.name}; '
             fstr += f'</td><td align="right">{tran.weight}</td></tr>\n'
-        if suppress_defaults and suppressed_finals:
+        # Unobserved finals of an observedOnly net are counted only if
+        # reachability was already explored, as rendering is unbudgeted
+        unobserved = getattr(self._pn,'unobserved',None)
+        uncounted = unobserved is not None and not unobserved.computed()
+        if unobserved is not None and not uncounted \
+                and unobserved.count() > 0:
+            suppressed_finals += unobserved.count()
+            default_final_weight = unobserved.unobservedWeight
+        if suppressed_finals:
             fstr += '<tr><td align="left">'
             fstr += f'{suppressed_finals} unobserved combinations'
             fstr += f'</td><td align="right">{default_final_weight}</td></tr>\n'
+        if uncounted:
+            fstr += '<tr><td align="left">'
+            fstr += 'Unobserved combinations not computed'
+            fstr += '</td><td align="right">'
+            fstr += f'{unobserved.unobservedWeight}</td></tr>\n'
+        reachability = getattr(self._pn,'reachability',None)
+        if reachability is None and unobserved is not None:
+            reachability = unobserved.reachability
+        if reachability is not None and not reachability.complete:
+            fstr += '<tr><td align="left">'
+            fstr += f'Reachability incomplete ({reachability.status})'
+            fstr += '</td><td align="right"></td></tr>\n'
         fstr += '</table>>];\n'
         return fstr
 
@@ -189,20 +204,25 @@ class RoleStateNetFormatter(ScaledFormatter):
 
 
 
-def exportToScaledDOT(net,sslog: set,font) -> str:
-    return ScaledFormatter(net,sslog,font).transform_net()
+def exportToScaledDOT(net,sslog: set,font,
+                      roleStats:RoleStatistics=None) -> str:
+    return ScaledFormatter(net,sslog,font,roleStats).transform_net()
 
 
-def exportNetToScaledImage(vard,oname,pn,sslog,font):
-    dotStr = exportToScaledDOT(pn,sslog,font)
+def exportNetToScaledImage(vard,oname,pn,sslog,font,
+                           roleStats:RoleStatistics=None):
+    dotStr = exportToScaledDOT(pn,sslog,font,roleStats)
     export_DOT_to_image(vard,oname,dotStr) 
 
-def exportRoleStateNetDOT(net,sslog,font) -> str:
+def exportRoleStateNetDOT(net,sslog,font,
+                          roleStats:RoleStatistics=None) -> str:
     return RoleStateNetFormatter(net,sslog,font,
-                                 termination_weights=True).transform_net()
+                                 termination_weights=True,
+                                 roleStats=roleStats).transform_net()
 
-def exportRoleStateNetToImage(vard,oname,pn,sslog,font,imgformat='png'):
-    dotStr = exportRoleStateNetDOT(pn,sslog,font)
+def exportRoleStateNetToImage(vard,oname,pn,sslog,font,imgformat='png',
+                              roleStats:RoleStatistics=None):
+    dotStr = exportRoleStateNetDOT(pn,sslog,font,roleStats)
     export_DOT_to_image(vard,oname,dotStr,imgformat) 
 
 
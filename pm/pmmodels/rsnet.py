@@ -5,6 +5,7 @@ nets with place capacities of one and two types of transitions.
 
 from typing import Dict, Set, Iterable
 import xml.etree.ElementTree as ET
+from xml.sax.saxutils import XMLGenerator
 from pmkoalas.models.petrinet import Place, Transition, Arc, LabelledPetriNet
 import pm
 from pm.pmmodels.plpn import Marking, singleton_marking, PetriNetSemantics
@@ -45,6 +46,22 @@ class RoleStateNet(LabelledPetriNet):
             if not hasattr(tran,'picky'):
                 tran.picky = False
         LabelledPetriNet.__init__(self,places,transitions,arcs,name) 
+        # Final transitions not yet added, see pm.ssnap.ssnap.UnobservedFinals
+        self.unobserved = None
+        # ReachabilityResult of the search for final transitions, if any.
+        # If it is not complete only observed final transitions were added
+        self.reachability = None
+
+def with_unobserved_finals(net:LabelledPetriNet) -> LabelledPetriNet:
+    '''
+    The net with all its final transitions. For nets mined with only
+    observed final transitions, the remaining ones are added, otherwise the
+    net is returned unchanged.
+    '''
+    unobserved = getattr(net,'unobserved',None)
+    if unobserved is None:
+        return net
+    return unobserved.materialise()
 
 def to_rsnet(net:LabelledPetriNet) -> RoleStateNet:
     for tran in net._transitions:
@@ -55,10 +72,25 @@ def to_rsnet(net:LabelledPetriNet) -> RoleStateNet:
 class RoleStateNetSemantics(PetriNetSemantics):
     """
     Firing rules for RSNets including capacity.
+
+    Picky transitions are indexed by their set of input places, as they are
+    enabled only when that is exactly the set of marked places.
     """
     def __init__(self, marking: Marking) -> None:
+        self._enabledPicky = set()
         super().__init__(marking)
 
+    def _init_arc_context(self):
+        super()._init_arc_context()
+        self._pickyIndex:Dict[frozenset,list[Transition]] = dict()
+        for trans in self._net.transitions:
+            if trans.picky:
+                key = frozenset(self._incoming[trans])
+                self._pickyIndex.setdefault(key,[]).append(trans)
+
+    def indexed(self, trans: Transition) -> bool:
+        return not trans.picky
+
     def active_enabled(self,trans):
         for inp in self._incoming[trans]:
             if inp not in self._mark.mark \
@@ -75,100 +107,236 @@ class RoleStateNetSemantics(PetriNetSemantics):
             return False
         return self.active_enabled(trans)
 
+    def transition_enabled(self, trans: Transition) -> bool:
+        if trans.picky:
+            return self.picky_enabled(trans)
+        return self.active_enabled(trans)
 
-    def enabled(self) -> Set[Transition]:
-        """
-        returns the set of transitions that are enabled at this marking.
-        """
-        ret = set()
-        for trans in self._net.transitions:
-            renabled = True
-            if trans.picky:
-                renabled = self.picky_enabled(trans)
-            else:
-                renabled = self.active_enabled(trans)
-            if renabled:
-                ret.add(trans)
+    def compute_enabled(self) -> Set[Transition]:
+        ret = super().compute_enabled()
+        self._enabledPicky = set( [trans for trans in ret if trans.picky] )
         return ret
 
+    def update_enabled(self, changed: Iterable[Place]):
+        super().update_enabled(changed)
+        self._enabled -= self._enabledPicky
+        candidates = self._pickyIndex.get(frozenset(self._mark.mark),())
+        self._enabledPicky = set( [trans for trans in candidates 
+                                         if self.active_enabled(trans)] )
+        self._enabled |= self._enabledPicky
+
 
-def convert_net_to_xml(net:LabelledPetriNet ) -> ET.Element: 
+PNML_URL = 'http://www.pnml.org/version-2009/grammar/pnmlcoremodel'
+RSNET_TOOL = 'RoleStateNet'
+SPN_TOOL = 'StochasticPetriNet'
+PLACE_PREFIX = 'place-'
+TRANSITION_PREFIX = 'transition-'
+
+
+def write_rsnet_pnml(net:LabelledPetriNet, out, encoding:str='utf-8'):
     """
-    Converts a given Petri net to an XML structure that conforms with the pnml
-    schema.
+    Write net as pnml to the binary stream out, one element at a time.
+
+    Transition weights and silence are kept in a StochasticPetriNet
+    toolspecific, as read by ProM. Picky and observed flags on transitions,
+    and the final flag on places, are kept in a RoleStateNet toolspecific.
+    Final transitions not yet added to nets mined with observedOnly are not
+    written; see with_unobserved_finals.
 
     See: http://www.pnml.org/version-2009/grammar/pnmlcoremodel.rng
     """
-    # Copy-paste fork of koalas version, stripping out cruft and irrelevancies
-    # At time of writing, koalas version needs rework to
-    #   - strip out subclass logic for DPNs
-    #   - remove markings from net data structure
-    #   - fix UUID behaviour
-    root = ET.Element('pnml')
-    net_node = ET.SubElement(root,'net', 
-            attrib={'type': PNML_URL,
-                    'id':net.name} )
-    net_namer = ET.SubElement(net_node, "name")
-    ET.SubElement(net_namer, "text").text = net.name
-    page = ET.SubElement(net_node,'page', id="page1")
-    for place in net.places:
-        placeNode = ET.SubElement(page,'place', 
-            attrib={'id': "place-"+str(place.pid) } )
+    gen = XMLGenerator(out, encoding=encoding, short_empty_elements=True)
+    gen.startDocument()
+    gen.startElement('pnml', {})
+    _indent(gen,1)
+    gen.startElement('net', {'type': PNML_URL, 'id': net.name or 'net'})
+    if net.name is not None:
+        _indent(gen,2)
+        _write_name(gen, net.name, 2)
+    _indent(gen,2)
+    gen.startElement('page', {'id': 'page1'})
+    placeIds = {}
+    for place in sorted(net.places, key=_node_key):
+        placeId = PLACE_PREFIX + str(len(placeIds)+1)
+        placeIds[place] = placeId
+        _indent(gen,3)
+        gen.startElement('place', {'id': placeId})
         if place.name:
-            name_node = ET.SubElement(placeNode,'name')
-            text_node = ET.SubElement(name_node,'text')
-            text_node.text = place.name
-        if isinstance(place.pid, int):
-            localNode = f'p{place.pid}'
-        else:
-            localNode = place.pid
-        prom_node = ET.SubElement(
-                placeNode, 'toolspecific',
-                attrib={
-                    'tool' : "ProM",
-                    'version' : "6.4",
-                    'localNodeID' : localNode
-                }
-            )
-    for tran in net.transitions:
-        tranNode = ET.SubElement(page,'transition', 
-                        attrib={'id':"transition-"+str(tran.tid) } )
+            _indent(gen,4)
+            _write_name(gen, place.name, 4)
+        localNode = f'p{place.pid}' if isinstance(place.pid, int) \
+                        else str(place.pid)
+        _indent(gen,4)
+        _write_empty(gen, 'toolspecific', {'tool': 'ProM', 'version': '6.4',
+                                           'localNodeID': localNode})
+        rsattrs = { 'tool': RSNET_TOOL, 'version': pm.version,
+                    'pid': str(place.pid) }
+        if getattr(place,'final',False):
+            rsattrs['final'] = 'true'
+        _indent(gen,4)
+        _write_empty(gen, 'toolspecific', rsattrs)
+        _indent(gen,3)
+        gen.endElement('place')
+    for tran in sorted(net.transitions, key=_node_key):
+        _indent(gen,3)
+        gen.startElement('transition',
+                         {'id': TRANSITION_PREFIX+str(tran.tid)})
         if tran.name:
-            name_node = ET.SubElement(tranNode,'name')
-            text_node = ET.SubElement(name_node,'text')
-        ts_node = ET.SubElement(tranNode,'toolspecific',
-                        attrib={ 'tool':'StochasticPetriNet',
-                                 'version':'0.2', 
-                                 'invisible': str(tran.silent),
-                                 'priority': '1',
-                                 'weight' : str(tran.weight),
-                                 'distributionType': 'IMMEDIATE'} )
-        trs_node = ET.SubElement(tranNode,'toolspecific',
-                        attrib={ 'tool':'RoleStateNet',
-                                 'version':pm.version, 
-                                 'transitionType': \
-                                    ( 'PICKY' if tran.picky else 'ACTIVE') } )
-
-    arcid = 1
-    for arc in net.arcs:
-        if isinstance(arc.from_node, Place):
-            arcNode = ET.SubElement(page,'arc',
-                attrib={'source': "place-"+str(arc.from_node.nodeId), 
-                        'target': "transition-"+str(arc.to_node.nodeId),
-                        'id': "arc-"+str(arcid) } )
+            _indent(gen,4)
+            _write_name(gen, tran.name, 4)
+        _indent(gen,4)
+        _write_empty(gen, 'toolspecific',
+                     { 'tool': SPN_TOOL,
+                       'version': '0.2',
+                       'invisible': _flag(tran.silent),
+                       'priority': '1',
+                       'weight': str(tran.weight),
+                       'distributionType': 'IMMEDIATE'} )
+        rsattrs = { 'tool': RSNET_TOOL,
+                    'version': pm.version,
+                    'transitionType': 'PICKY' if getattr(tran,'picky',False)
+                                        else 'ACTIVE' }
+        if hasattr(tran,'observed'):
+            rsattrs['observed'] = _flag(tran.observed)
+        _indent(gen,4)
+        _write_empty(gen, 'toolspecific', rsattrs)
+        _indent(gen,3)
+        gen.endElement('transition')
+    arcs = sorted( [(_node_id(arc.from_node,placeIds),
+                     _node_id(arc.to_node,placeIds)) for arc in net.arcs] )
+    for arcid, (source, target) in enumerate(arcs, start=1):
+        _indent(gen,3)
+        _write_empty(gen, 'arc', {'id': f'arc-{arcid}', 'source': source,
+                                  'target': target})
+    _indent(gen,2)
+    gen.endElement('page')
+    _indent(gen,1)
+    gen.endElement('net')
+    _indent(gen,0)
+    gen.endElement('pnml')
+    gen.endDocument()
+
+
+def export_rsnet_to_pnml(rsnet:LabelledPetriNet, fname:str):
+    with open(fname,'wb') as out:
+        write_rsnet_pnml(rsnet, out)
+
+
+def import_rsnet_from_pnml(fname) -> RoleStateNet:
+    """
+    Read a net written by export_rsnet_to_pnml. Elements are parsed and
+    discarded one at a time, so memory is bounded by the net itself.
+
+    Node ids of digits are read back as ints, as the miners number them.
+    Transitions without a RoleStateNet toolspecific are active.
+    """
+    places = {}
+    transitions = {}
+    arcs = []
+    name = None
+    page = None
+    for event, elem in ET.iterparse(fname, events=('start','end')):
+        tag = _local_tag(elem.tag)
+        if event == 'start':
+            if tag == 'page':
+                page = elem
+            continue
+        if tag == 'place':
+            rsattrs = _tool_attrs(elem,RSNET_TOOL)
+            pid = rsattrs.get('pid')
+            place = Place( elem.findtext('name/text'),
+                           pid=_parse_id(pid if pid is not None
+                                            else elem.get('id'), PLACE_PREFIX) )
+            if _flag_value( rsattrs.get('final') ):
+                place.final = True
+            places[elem.get('id')] = place
+        elif tag == 'transition':
+            spn = _tool_attrs(elem,SPN_TOOL)
+            rsattrs = _tool_attrs(elem,RSNET_TOOL)
+            tran = Transition( elem.findtext('name/text'),
+                               tid=_parse_id(elem.get('id'),
+                                             TRANSITION_PREFIX),
+                               weight=_parse_number(spn.get('weight','1')),
+                               silent=_flag_value(spn.get('invisible')) )
+            tran.picky = rsattrs.get('transitionType') == 'PICKY'
+            if 'observed' in rsattrs:
+                tran.observed = _flag_value(rsattrs['observed'])
+            transitions[elem.get('id')] = tran
+        elif tag == 'arc':
+            source, target = elem.get('source'), elem.get('target')
+            if source in places:
+                arcs.append( Arc(places[source],transitions[target]) )
+            else:
+                arcs.append( Arc(transitions[source],places[target]) )
+        elif tag == 'name' and page is None:
+            name = elem.findtext('text')
+            continue
         else:
-            arcNode = ET.SubElement(page,'arc',
-                attrib={'source': "transition-"+str(arc.from_node.nodeId), 
-                        'target': "place-"+str(arc.to_node.nodeId),
-                        'id': "arc"+str(arcid) } )
-        arcid += 1
+            continue
+        elem.clear()
+        page.clear()
+    return RoleStateNet(places.values(),transitions.values(),arcs,name)
+
+
+def _indent(gen:XMLGenerator, depth:int):
+    gen.ignorableWhitespace('\n' + '  '*depth)
+
+
+def _write_name(gen:XMLGenerator, text:str, depth:int):
+    gen.startElement('name', {})
+    _indent(gen,depth+1)
+    gen.startElement('text', {})
+    gen.characters(text)
+    gen.endElement('text')
+    _indent(gen,depth)
+    gen.endElement('name')
+
+
+def _write_empty(gen:XMLGenerator, tag:str, attrs:dict):
+    gen.startElement(tag, attrs)
+    gen.endElement(tag)
+
+
+def _node_id(node, placeIds:dict) -> str:
+    if isinstance(node, Place):
+        return placeIds[node]
+    return TRANSITION_PREFIX+str(node.tid)
+
+
+def _node_key(node) -> tuple:
+    nid = node.nodeId
+    if isinstance(nid, int):
+        return (0, nid, '', node.name or '')
+    return (1, 0, str(nid), node.name or '')
+
+
+def _flag(value) -> str:
+    return 'true' if value else 'false'
+
+
+def _flag_value(text:str) -> bool:
+    return text is not None and text.lower() == 'true'
+
+
+def _parse_id(nodeId:str, prefix:str):
+    nid = nodeId[len(prefix):] if nodeId.startswith(prefix) else nodeId
+    return int(nid) if nid.isdigit() else nid
+
+
+def _parse_number(text:str):
+    try:
+        return int(text)
+    except ValueError:
+        return float(text)
 
 
-def export_rsnet_to_pnml(rsnet:RoleStateNet, fname:str):
-    # Under-tested
-    # Copy-paste fork of koalas version, stripping out cruft and irrelevancies
-    xml =  convert_rsnet_to_xml(net)
-    ET.indent( xml ) 
-    ET.ElementTree(xml).write(fname,xml_declaration=True, encoding="utf-8")
+def _local_tag(tag:str) -> str:
+    return tag.rpartition('}')[2]
 
 
+def _tool_attrs(elem, tool:str) -> dict:
+    for child in elem:
+        if _local_tag(child.tag) == 'toolspecific' \
+                and child.get('tool') == tool:
+            return child.attrib
+    return {}
@@ -1,10 +1,23 @@
+import hashlib
+from types import MappingProxyType
 
 
 class TraceFrequency:
-    def __init__(self,elements:dict = {}):
-        self._elements = elements
-        self._trace_total = sum( elements.values() )
-        self._roles = set( [r for t in self._elements for r in t] )
+    '''
+    Immutable table of trace frequencies. Totals, the role universe and
+    entry frequencies are computed on first use and cached, so one instance
+    can be shared between metrics.
+
+    Equal tables, of the same class, compare and hash equal.
+    '''
+
+    def __init__(self,elements:dict = None):
+        self._elements = dict(elements) if elements else {}
+        self._trace_total = None
+        self._roles = None
+        self._entryFreq = None
+        self._hash = None
+        self._fingerprint = None
 
     def freq(self,trace):
         if trace in self._elements:
@@ -12,16 +25,85 @@ class TraceFrequency:
         return 0
 
     def trace_total(self):
+        if self._trace_total is None:
+            self._trace_total = sum( self._elements.values() )
         return self._trace_total
 
+    def trace_roles(self,trace):
+        return trace
+
+    def roles(self) -> frozenset:
+        if self._roles is None:
+            self._roles = frozenset( [r for t in self._elements
+                                        for r in self.trace_roles(t)] )
+        return self._roles
+
     def role_total(self):
-        return len(self._roles)
+        return len(self.roles())
+
+    def entry_frequency(self) -> 'EntryFrequency':
+        if self._entryFreq is None:
+            self._entryFreq = EntryFrequency(self)
+        return self._entryFreq
+
+    def merge(self,other: 'TraceFrequency') -> 'TraceFrequency':
+        '''
+        New table of the same class with the frequencies of both summed.
+        '''
+        elements = dict(self._elements)
+        for trace, f in other._elements.items():
+            elements[trace] = elements.get(trace,0) + f
+        return self.__class__(elements)
+
+    def subtract(self,other: 'TraceFrequency') -> 'TraceFrequency':
+        '''
+        New table of the same class with the frequencies of other taken
+        away. Traces left with no frequency are dropped.
+        '''
+        elements = dict(self._elements)
+        for trace, f in other._elements.items():
+            if trace in elements:
+                remaining = elements[trace] - f
+                if remaining > 0:
+                    elements[trace] = remaining
+                else:
+                    del elements[trace]
+        return self.__class__(elements)
+
+    def fingerprint(self) -> str:
+        '''
+        Hex digest of the contents, stable across processes. Role sets are
+        compared in sorted order.
+        '''
+        if self._fingerprint is None:
+            digest = hashlib.sha256()
+            for line in sorted( [f'{canonical_trace(t)!r}:{f!r}'
+                                    for t, f in self._elements.items()] ):
+                digest.update(line.encode())
+                digest.update(b'\n')
+            self._fingerprint = digest.hexdigest()
+        return self._fingerprint
+
+    def __eq__(self,other):
+        if self is other:
+            return True
+        if type(self) is not type(other):
+            return NotImplemented
+        return self._elements == other._elements
+
+    def __hash__(self):
+        if self._hash is None:
+            self._hash = hash( frozenset( self._elements.items() ) )
+        return self._hash
+
+    def __len__(self):
+        return len(self._elements)
 
     def __str__(self):
         traces = ""
         for t in self._elements:
             traces += f'    {t}  :{self._elements[t]}\n'
-        return f'TraceFrequency:\n    {len(self._roles)} roles: {self._roles}\n    {self._trace_total} traces\n{traces}'
+        return f'TraceFrequency:\n    {self.role_total()} roles: {set(self.roles())}\n    {self.trace_total()} traces\n{traces}'
 
     '''
     Treat return value as read-only.
@@ -31,26 +113,31 @@ class TraceFrequency:
 
 
     '''
-    Treat return value as read-only.
+    Read-only view of the frequencies by trace.
     '''
     def elements(self):
-        return self._elements
+        return MappingProxyType(self._elements)
 
 
 class RoleTraceFrequency(TraceFrequency):
-    def __init__(self, elements:dict = {}):
-        self._elements = elements
-        self._trace_total = sum( elements.values() )
-        self._roles = \
-                set( [r for t in self._elements for rs in t for r in rs] )
-
+    def trace_roles(self,trace):
+        return [r for rs in trace for r in rs]
 
     def __str__(self):
         traces = ""
         for t in self._elements:
             ts = [set(x) for x in t]
             traces += f'    {str(ts):40s}: {self._elements[t]:8d}\n'
-        return f'TraceFrequency:\n    {len(self._roles)} roles: {self._roles}\n    {self._trace_total} traces\n{traces}'
+        return f'TraceFrequency:\n    {self.role_total()} roles: {set(self.roles())}\n    {self.trace_total()} traces\n{traces}'
+
+
+def canonical_trace(trace):
+    if isinstance(trace,(tuple,list)):
+        return tuple( [canonical_trace(entry) for entry in trace] )
+    if isinstance(trace,(set,frozenset)):
+        return tuple( sorted( [canonical_trace(entry) for entry in trace],
+                              key=repr ) )
+    return trace
 
 
 class EntryFrequency:
@@ -0,0 +1,341 @@
+'''
+Incremental state snapshot miners. Transition counts, places and final state
+counts persist between calls, so a log can be mined in batches of new or
+revised traces and nets rebuilt without re-reading earlier batches.
+'''
+
+import logging
+
+from pmkoalas.models.petrinet import LabelledPetriNet, Place, \
+        silent_transition
+from pm.logs.statesnaplog import RoleSetTable
+from pm.pmmodels.rsnet import RoleStateNet
+from pm.ssnap.ssnap import addPlaces, arcsSpanningTran
+from pm.ssnap.trantable import TransitionTable
+
+
+logger = logging.getLogger(__name__)
+debug, info = logger.debug, logger.info
+
+
+INITIAL_NAME = 'I'
+FINAL_NAME = 'F'
+
+
+class IncrementalMiner:
+    '''
+    Base for incremental miners. Role sets and transition counts are kept
+    in a TransitionTable, with transitions keyed by pairs of role set ids
+    as in the batch miners. Transition and place ids are allocated in order
+    of first appearance and are stable across updates. A transition whose
+    count drops to zero keeps its id if it is counted again.
+
+    Adding a trace for a case id already present replaces the old trace, so
+    a career extended by a new edition can be resubmitted whole.
+
+    Each transition and its arcs are built once and reused by later nets
+    until the transition's count changes, so a build after an update only
+    creates transitions for the keys the update touched. Assembling the
+    net's place, transition and arc sets is still linear in the net.
+    '''
+
+    def __init__(self, label=None, final=True, firstPid=1,
+                 roles: RoleSetTable=None):
+        self.label = label
+        self.final = final
+        self._table = TransitionTable(roles)
+        self._initialPlace = Place(name=INITIAL_NAME,pid=1)
+        self._initRS = frozenset([INITIAL_NAME])
+        self._atop = {INITIAL_NAME: self._initialPlace}
+        self._pid = firstPid
+        self._built = {}
+        self._roleCounts = {}
+        self._traces = {}
+
+    def trace_keys(self, variant: tuple) -> list:
+        '''
+        Transition keys for a trace variant of role set ids, in firing order.
+        '''
+        keys = []
+        prev = self._table.initial
+        for rsid in variant:
+            keys.append( (prev,rsid) )
+            prev = rsid
+        return keys
+
+    def key_sets(self, key: tuple) -> tuple:
+        ''' (from, to) role sets of a transition key. '''
+        return (self._table.roleset(key[0]), self._table.roleset(key[1]))
+
+    def live(self, key: tuple) -> bool:
+        tid = self._table.transition_id(*key)
+        return tid is not None and self._table.counts[tid] > 0
+
+    def add_traces(self, sslog_delta: dict):
+        '''
+        Add or replace the traces in sslog_delta. Cost is proportional to the
+        size of the delta.
+        '''
+        for caseId in self.case_order(sslog_delta):
+            if caseId in self._traces:
+                self.remove_traces([caseId])
+            variant = self._table.roles.variant_key(sslog_delta[caseId])
+            if not variant:
+                continue
+            self._traces[caseId] = variant
+            self.count_variant(variant,1)
+
+    def remove_traces(self, caseIds):
+        '''
+        Remove the traces for caseIds. Unknown case ids are ignored.
+        Transitions and places no longer used by any trace are removed.
+        '''
+        for caseId in caseIds:
+            if caseId not in self._traces:
+                continue
+            variant = self._traces.pop(caseId)
+            self.count_variant(variant,-1)
+
+    def case_order(self, sslog_delta: dict):
+        return sslog_delta.keys()
+
+    def count_variant(self, variant: tuple, inc: int):
+        for rsid in variant:
+            fact = self._table.roleset(rsid)
+            for act in fact:
+                self._roleCounts[act] = self._roleCounts.get(act,0) + inc
+            if inc > 0:
+                self._pid = addPlaces(self._atop,fact,self._pid)
+            else:
+                for act in fact:
+                    if self._roleCounts[act] == 0:
+                        del self._roleCounts[act]
+                        del self._atop[act]
+        for key in self.trace_keys(variant):
+            self.count_transition(key,inc)
+
+    def count_transition(self, key: tuple, inc: int):
+        tid = self._table.count(key[0],key[1],inc)
+        self._built.pop(tid,None)
+        ct = self._table.counts[tid]
+        if ct == 0:
+            self.transition_removed(key)
+        elif inc > 0 and ct == inc:
+            self.transition_added(key)
+
+    def transition_added(self, key: tuple):
+        pass
+
+    def transition_removed(self, key: tuple):
+        pass
+
+    def case_count(self) -> int:
+        return len(self._traces)
+
+    def live_tids(self) -> list:
+        ''' Ids of transitions with a non-zero count. '''
+        return [tid for tid, ct in enumerate(self._table.counts) if ct > 0]
+
+    def build_transitions(self, atop: dict, arcs: set) -> set:
+        '''
+        Weighted transitions for the current counts, reusing those built for
+        unchanged counts. Side effect: mutates arcs.
+        '''
+        transitions = set()
+        built = self._built
+        table = self._table
+        for tid in self.live_tids():
+            entry = built.get(tid)
+            if entry is None:
+                tran = silent_transition(tid=tid+1)
+                tran.weight = table.counts[tid]
+                fromPlaces, toPlaces = self.key_sets(table.keys[tid])
+                entry = (tran, arcsSpanningTran(fromPlaces,tran,toPlaces,atop))
+                built[tid] = entry
+            transitions.add(entry[0])
+            arcs |= entry[1]
+        return transitions
+
+
+class IncrementalPLPNMiner(IncrementalMiner):
+    '''
+    Incremental equivalent of minePurePLPN. Adding a whole log in one call
+    gives the same net as minePurePLPN.
+    '''
+
+    def __init__(self, label=None, final=True):
+        super().__init__(label,final, firstPid = 2 if final else 1)
+        if final:
+            self._finalPlace = Place(name=FINAL_NAME,pid=2)
+            self._atop[FINAL_NAME] = self._finalPlace
+            self._finalId = self._table.marker(FINAL_NAME)
+
+    def trace_keys(self, variant: tuple) -> list:
+        keys = super().trace_keys(variant)
+        if self.final:
+            keys.append( (variant[-1],self._finalId) )
+        return keys
+
+    def net(self) -> LabelledPetriNet:
+        arcs = set()
+        transitions = self.build_transitions(self._atop,arcs)
+        return LabelledPetriNet( places = set(self._atop.values()),
+                                 transitions = transitions, arcs = arcs,
+                                 name = self.label )
+
+
+class IncrementalRoleStateNetMiner(IncrementalMiner):
+    '''
+    Incremental equivalent of minePureRoleStateNet. Adding a whole log in one
+    call gives the same net as minePureRoleStateNet.
+
+    Reachable markings of the net without final transitions are kept between
+    builds as frozensets of place names. After additions only markings
+    reachable through new transitions are explored. After a transition is
+    removed the reachable set may shrink, so it is recomputed in full at the
+    next build.
+
+    Picky final transitions are created when the net is built and numbered
+    after all other transitions, in sorted marking order. They are rebuilt
+    on every call, as their ids and the final place move when transitions
+    and places are added.
+    '''
+
+    def __init__(self, label=None, final=True, unobservedWeight=0.8):
+        super().__init__(label,final, firstPid=2)
+        self.unobservedWeight = unobservedWeight
+        self._placeIndex = {}
+        self._sourceKeys = set()
+        self._reachable = {self._initRS}
+        self._newKeys = []
+        self._stale = False
+
+    def case_order(self, sslog_delta: dict):
+        return sorted(sslog_delta.keys())
+
+    def count_variant(self, variant: tuple, inc: int):
+        super().count_variant(variant,inc)
+        finals = self._table.finals
+        last = variant[-1]
+        finals[last] = finals.get(last,0) + inc
+        if finals[last] == 0:
+            del finals[last]
+
+    def transition_added(self, key: tuple):
+        fromSet = self.key_sets(key)[0]
+        if not fromSet:
+            self._sourceKeys.add(key)
+        for place in fromSet:
+            self._placeIndex.setdefault(place,set()).add(key)
+        self._newKeys.append(key)
+
+    def transition_removed(self, key: tuple):
+        self._sourceKeys.discard(key)
+        for place in self.key_sets(key)[0]:
+            self._placeIndex[place].discard(key)
+        self._stale = True
+
+    def enabled_keys(self, marking: frozenset):
+        '''
+        Transition keys enabled at marking under RoleStateNetSemantics.
+        Transitions from an empty role set have no input places, so are
+        candidates at every marking.
+        '''
+        candidates = set(self._sourceKeys)
+        for place in marking:
+            if place in self._placeIndex:
+                candidates |= self._placeIndex[place]
+        return [key for key in candidates 
+                    if fires(self.key_sets(key),marking)]
+
+    def explore(self, frontier: list):
+        while frontier:
+            marking = frontier.pop()
+            for key in self.enabled_keys(marking):
+                nm = fire(self.key_sets(key),marking)
+                if nm not in self._reachable:
+                    self._reachable.add(nm)
+                    frontier.append(nm)
+
+    def update_reachable(self):
+        if self._stale:
+            debug('update_reachable() full')
+            self._reachable = {self._initRS}
+            self.explore([self._initRS])
+        else:
+            debug(f'update_reachable() {len(self._newKeys)} new transitions')
+            newKeys = [self.key_sets(key) for key in self._newKeys 
+                            if self.live(key)]
+            frontier = []
+            for marking in self._reachable:
+                for keySets in newKeys:
+                    if fires(keySets,marking):
+                        nm = fire(keySets,marking)
+                        if nm not in self._reachable:
+                            frontier.append(nm)
+            self._reachable.update(frontier)
+            self.explore(frontier)
+        self._newKeys = []
+        self._stale = False
+
+    def reachable_markings(self) -> set:
+        '''
+        Reachable markings as frozensets of place names. Treat as read-only.
+        '''
+        self.update_reachable()
+        return self._reachable
+
+    def net(self) -> RoleStateNet:
+        atop = dict(self._atop)
+        arcs = set()
+        transitions = self.build_transitions(atop,arcs)
+        if self.final:
+            finalPlace = Place(name=FINAL_NAME,pid=self._pid)
+            finalPlace.final = True
+            atop[FINAL_NAME] = finalPlace
+            transitions |= self.build_final_transitions(atop,arcs)
+        return RoleStateNet( places = set(atop.values()),
+                             transitions = transitions, arcs = arcs,
+                             name = self.label )
+
+    def build_final_transitions(self, atop: dict, arcs: set) -> set:
+        '''
+        Picky transitions to the final place for each reachable marking,
+        weighted as in addRSNetFinalTransitions. Side effect: mutates arcs.
+        '''
+        transitions = set()
+        tranId = max(self.live_tids(),default=-1) + 1
+        finals = self._table.roleset_finals()
+        nameMarkings = sorted([tuple(sorted(marking))
+                                for marking in self.reachable_markings()])
+        for placeNames in nameMarkings:
+            if len(placeNames) == 0 or placeNames == (INITIAL_NAME,):
+                continue
+            tranId += 1
+            tran = silent_transition(tid=tranId)
+            tran.picky = True
+            tran.observed = True
+            fPlaceNames = frozenset(placeNames)
+            if fPlaceNames in finals:
+                tran.weight = finals[fPlaceNames]
+            else:
+                tran.weight = self.unobservedWeight
+                tran.observed = False
+            arcs |= arcsSpanningTran(fPlaceNames,tran,[FINAL_NAME],atop)
+            transitions.add(tran)
+        return transitions
+
+
+def fires(key: tuple, marking: frozenset) -> bool:
+    '''
+    Active transition enabling on place name sets, with place capacity one.
+    key is the (from, to) pair of place name sets of the transition.
+    '''
+    fromPlaces, toPlaces = key
+    return fromPlaces <= marking \
+            and not ( (toPlaces - fromPlaces) & marking )
+
+def fire(key: tuple, marking: frozenset) -> frozenset:
+    fromPlaces, toPlaces = key
+    return (marking - fromPlaces) | toPlaces
+
@@ -2,6 +2,7 @@
 
 from pm.loggen.wpn_loggen import *
 from pm.metrics.relevance import relevance_uniform_roleset
+from pm.metrics.replay import ReplayProbabilities
 from pm.pmmodels.plpn import *
 from pm.pmmodels.rsnet import *
 from pm.pmmodels.tracefreq import TraceFrequency, RoleTraceFrequency
@@ -34,27 +35,40 @@ def enclose_traces(log:dict, initial_place_label='I',
 
 def entropic_relevance(log: dict, model: LabelledPetriNet, marking: Marking, 
                        loggran=DEFAULT_LOG_GRANULARITY,
-                       semantics=RoleStateNetSemantics) -> float:
+                       semantics=RoleStateNetSemantics,
+                       exact:bool=False) -> float:
+    '''
+    If exact, model probabilities of the log traces are calculated by 
+    ReplayProbabilities, rather than estimated by generating a log of 
+    loggran traces.
+    '''
     elog = enclose_traces(log)
     ltf = RoleTraceFrequency(elog)
     # debug('Log TF')
     # debug(ltf)
+    fullModel = with_unobserved_finals(model)
+    if fullModel is not model:
+        marking = Marking(fullModel,marking.mark)
     sem = semantics(marking)
-    wslg = WeightedTokenGameStateLogGenerator(sem,loggran)
-    mtf = RoleTraceFrequency(wslg.generate())
+    if exact:
+        mtf = ReplayProbabilities(sem,elog)
+    else:
+        wslg = WeightedTokenGameStateLogGenerator(sem,loggran)
+        mtf = RoleTraceFrequency(wslg.generate())
     # debug('Model TF')
     # debug(mtf)
     return relevance_uniform_roleset(ltf, mtf)
 
 def entropic_relevance_plpn(log: dict, model: LabelledPetriNet, 
                             marking: Marking, 
-                            loggran=DEFAULT_LOG_GRANULARITY) -> float:
-    return entropic_relevance(log,model,marking,loggran,PLPNSemantics)
+                            loggran=DEFAULT_LOG_GRANULARITY,
+                            exact:bool=False) -> float:
+    return entropic_relevance(log,model,marking,loggran,PLPNSemantics,exact)
 
 
 def entropic_relevance_rsnet(log: dict, model: RoleStateNet,
                             marking: Marking, 
-                            loggran=DEFAULT_LOG_GRANULARITY) -> float:
-    return entropic_relevance(log,model,marking,loggran,RoleStateNetSemantics)
-
-
+                            loggran=DEFAULT_LOG_GRANULARITY,
+                            exact:bool=False) -> float:
+    return entropic_relevance(log,model,marking,loggran,RoleStateNetSemantics,
+                              exact)
@@ -3,20 +3,24 @@ Mine a place-labelled SLPN from a state snapshot log.
 '''
 
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 from itertools import chain, combinations
 import logging
+import os
 from typing import Any
 from operator import attrgetter
 
 from pmkoalas.models.petrinet import *
 from pm.logs.statesnaplog import *
-from pm.pmmodels.conform import reachable_markings, sort_place_tuple_seq
+from pm.pmmodels.conform import rsnet_explore, ReachabilityBudget, \
+        sort_place_tuple_seq
 from pm.pmmodels.rsnet import *
+from pm.ssnap.trantable import TransitionTable
 
 
 logger = logging.getLogger(__name__)
-debug, info = logger.debug, logger.info
+debug, info, warning = logger.debug, logger.info, logger.warning
 
 
 
@@ -30,20 +34,6 @@ def arcsSpanningTran(fromActs,tran,toActs,atop) -> set:
     arcs += [Arc(tran,atop[pl]) for pl in toActs]
     return set(arcs)
 
-'''
-Side effect: mutates atot and tweights.
-'''
-def addTransition(fromPlaces,toPlaces,tranId,atot,tweights) -> Transition:
-    if (fromPlaces,toPlaces) in atot:
-        tran = atot[(fromPlaces,toPlaces)]
-        tweights[tran] = tweights[tran] + 1 
-    else:
-        tranId += 1
-        tran = silent_transition(tid = tranId)
-        atot[(fromPlaces,toPlaces)] = tran
-        tweights[tran] = 1
-    return tran
-
 '''
 Adds places for activities if absent. Returns the new place identifier.
 Side effect: mutates atop.
@@ -79,64 +69,67 @@ def arcSetDiff(s1,s2):
 
 def minePurePLPN(sslog: dict,label=None,final=True) -> LabelledPetriNet:
     debug("minePLPN()")
-    arcs = set()
+    table = TransitionTable( getattr(sslog,'table',None) )
+    finalId = table.marker('F') if final else None
+    for caseId in sslog:
+        table.add_trace(sslog[caseId],finalId)
     atop = {}
-    atot = {}
-    # Mutating the weight changes the hash of the transition object
-    # and Python set comparisons start breaking because the implementation
-    # caches the hash
-    tweights = {}
-    tranId = 0
-    pid = 1
     initialPlace = Place(name='I',pid=1)
     atop[initialPlace.name] = initialPlace
+    pid = 1
     if final:
         pid = 2
         finalPlace = Place(name='F',pid=pid)
         atop[finalPlace.name] = finalPlace
-    for caseId in sslog:
-        trace = sslog[caseId]
-        prevAct = None
-        for snap in trace:
-            fact = frozenset(snap.activities)
-            if not prevAct:
-                prevAct = frozenset([initialPlace.name])
-            pid = addPlaces(atop,fact,pid)
-            tran = addTransition(prevAct,fact,tranId,atot,tweights)
-            tranId = max(tranId,tran.tid)
-            newarcs = arcsSpanningTran(prevAct,tran,fact,atop)
-            arcs |= newarcs
-            prevAct = fact
-        if final:
-            tran = addTransition(prevAct,finalPlace.name,tranId,atot,tweights)
-            tranId = max(tranId,tran.tid)
-            newarcs |= arcsSpanningTran(prevAct,tran,finalPlace.name,atop)
-            arcs |= newarcs
-    places = set( atop.values() ) | set([initialPlace])
-    if final:
-        places |= set([finalPlace])
+    arcs = set()
     transitions = set()
-    for tran in atot.values():
-        tran.weight = tweights[tran]
+    for tid, (fromId, toId) in enumerate(table.keys):
+        fromPlaces, toPlaces = table.roleset(fromId), table.roleset(toId)
+        pid = addPlaces(atop,toPlaces,pid)
+        tran = silent_transition(tid = tid+1)
+        tran.weight = table.counts[tid]
+        arcs |= arcsSpanningTran(fromPlaces,tran,toPlaces,atop)
         transitions.add(tran)
-    return LabelledPetriNet( places = places, transitions = transitions, 
+    return LabelledPetriNet( places = set( atop.values() ), 
+                             transitions = transitions, 
                              arcs = arcs, name=label )
 
-def addRSNetFinalTransitions(partialNet, atot, atop, tranId, tweights, arcs, 
+def nameMarkingKey(marking) -> tuple:
+    return tuple(sorted([place.name for place, ct in marking]))
+
+def addRSNetFinalTransitions(partialNet, atot, atop, tranId, arcs, 
                              initialPlace, finalPlace, finals, finalRS,
-                             unobservedWeight=0.8):
+                             unobservedWeight=0.8, 
+                             budget:ReachabilityBudget=None,
+                             observedOnly:bool=False):
     '''
-    Mutates input parameters, particularly atot and arcs.
+    Mutates input parameters, particularly atot and arcs. Final transition
+    weights are set before the transitions are hashed into arcs.
+
+    If observedOnly, or if reachability exploration exhausts budget, final 
+    transitions are only added for the observed final markings in finals.
+    Returns the ReachabilityResult of the exploration, or None if 
+    observedOnly.
     '''
-    marking = Marking( partialNet, {initialPlace:1} )
-    sem = RoleStateNetSemantics(marking)
-    markings = reachable_markings(sem)
     # debug(f'activities {len(activities)}')
     # debug(f'placeSubsets {len(set(placeSubsets))} {placeSubsets}')
     debug(f'atop {atop}')
-    nameMarkings = \
-        sorted([tuple(sorted([place.name for place, ct in marking])) \
-                             for marking in markings])
+    result = None
+    if observedOnly:
+        nameMarkings = sorted([tuple(sorted(placeNames)) 
+                                    for placeNames in finals])
+    else:
+        marking = Marking( partialNet, {initialPlace:1} )
+        sem = RoleStateNetSemantics(marking)
+        result = rsnet_explore(sem,budget)
+        if result.complete:
+            nameMarkings = sorted([nameMarkingKey(marking) 
+                                        for marking in result.markings])
+        else:
+            warning(f'Reachability budget exhausted ({result}),'
+                    ' adding observed final transitions only')
+            nameMarkings = sorted([tuple(sorted(placeNames)) 
+                                        for placeNames in finals])
     debug(f'nameMarkings {nameMarkings}')
     for placeNames in nameMarkings:
         # debug(f'    marking {marking}')
@@ -154,83 +147,254 @@ def addRSNetFinalTransitions(partialNet, atot, atop, tranId, tweights, arcs,
         tran.observed = True
         fPlaceNames = frozenset(placeNames)
         if fPlaceNames in finals:
-            tweights[tran] = finals[fPlaceNames]
+            tran.weight = finals[fPlaceNames]
         else:
-            tweights[tran] = unobservedWeight
+            tran.weight = unobservedWeight
             tran.observed = False
         atot[(fPlaceNames,finalRS)] = tran
         tranId = max(tranId,tran.tid)
         newarcs = arcsSpanningTran(fPlaceNames,tran,finalPlace.name,atop)
         arcs |= newarcs
+    return result
+
+
+class UnobservedFinals:
+    '''
+    Final transitions for the reachable markings not observed as final in
+    the log, for a net mined with observedOnly. Reachability is explored
+    the first time count(), mass() or materialise() is called, and its
+    ReachabilityResult kept as reachability.
+    '''
+
+    def __init__(self, partialNet, atot, atop, tranId, arcs,
+                 initialPlace, finalPlace, finals, finalRS,
+                 unobservedWeight=0.8, budget:ReachabilityBudget=None):
+        self._partialNet = partialNet
+        self._atot = dict(atot)
+        self._atop = atop
+        self._tranId = tranId
+        self._arcs = set(arcs)
+        self._initialPlace = initialPlace
+        self._finalPlace = finalPlace
+        self._finals = dict(finals)
+        self._finalRS = finalRS
+        self.unobservedWeight = unobservedWeight
+        self._budget = budget
+        self._markings = None
+        self._net = None
+        self.reachability = None
+
+    def markings(self) -> list:
+        '''
+        Sorted place name tuples of the unobserved reachable markings.
+        '''
+        if self._markings is None:
+            sem = RoleStateNetSemantics( 
+                        Marking(self._partialNet, {self._initialPlace:1}) )
+            result = rsnet_explore(sem,self._budget)
+            self.reachability = result
+            if not result.complete:
+                warning(f'Reachability budget exhausted ({result}),'
+                        ' unobserved finals are incomplete')
+            observed = set([tuple(sorted(placeNames)) 
+                                for placeNames in self._finals])
+            observed.add( (self._initialPlace.name,) )
+            observed.add( () )
+            self._markings = sorted([ nm for nm in 
+                                        set([nameMarkingKey(marking) 
+                                            for marking in result.markings])
+                                        if nm not in observed ])
+        return self._markings
+
+    def computed(self) -> bool:
+        ''' True if reachability has already been explored. '''
+        return self._markings is not None
+
+    def count(self) -> int:
+        return len(self.markings())
+
+    def mass(self) -> float:
+        '''
+        Total weight of the unobserved final transitions.
+        '''
+        return self.count() * self.unobservedWeight
 
-def minePureRoleStateNet(sslog: dict,label=None, final=True) -> RoleStateNet:
+    def materialise(self) -> RoleStateNet:
+        '''
+        The net with final transitions for all reachable markings, as mined
+        without observedOnly.
+        '''
+        if self._net is None:
+            atot = dict(self._atot)
+            arcs = set(self._arcs)
+            result = addRSNetFinalTransitions(self._partialNet, atot, 
+                                     self._atop, self._tranId, arcs, 
+                                     self._initialPlace, self._finalPlace, 
+                                     self._finals, self._finalRS,
+                                     self.unobservedWeight, self._budget)
+            self._net = buildRoleStateNet(atot, arcs, 
+                                          set( self._atop.values() ),
+                                          self._partialNet.name)
+            self._net.reachability = result
+        return self._net
+
+
+def addFinalTransitions(partialNet, atot, atop, tranId, arcs, 
+                        initialPlace, finalPlace, finals, finalRS,
+                        budget:ReachabilityBudget=None,
+                        observedOnly:bool=False):
+    '''
+    As addRSNetFinalTransitions. Returns (unobserved, reachability), where
+    unobserved is an UnobservedFinals if observedOnly, otherwise None, and
+    reachability is the ReachabilityResult of addRSNetFinalTransitions.
+    '''
+    unobserved = None
+    if observedOnly:
+        unobserved = UnobservedFinals(partialNet, atot, atop, tranId, 
+                                      arcs, initialPlace, 
+                                      finalPlace, finals, finalRS,
+                                      budget=budget)
+    reachability = addRSNetFinalTransitions(partialNet, atot, atop, tranId, 
+                             arcs, initialPlace, finalPlace, finals, 
+                             finalRS, budget=budget, 
+                             observedOnly=observedOnly)
+    return (unobserved, reachability)
+
+def buildRoleStateNet(atot, arcs, places, label) -> RoleStateNet:
+    return RoleStateNet( places = places, transitions = set( atot.values() ),
+                         arcs = arcs, name=label )
+
+def minePureRoleStateNet(sslog: dict,label=None, final=True, 
+                         workers:int=None, 
+                         budget:ReachabilityBudget=None,
+                         observedOnly:bool=False) -> RoleStateNet:
     '''
     Mine a RoleStateNet, which has picky transitions to a final place for all 
     reachable markings. 
+
+    If workers is more than one, transitions are counted in parallel by
+    minePureRoleStateNetParallel.
+
+    If budget is given and reachability exploration exhausts it, only
+    observed final transitions are added.
+
+    If observedOnly, only observed final transitions are added and no
+    reachability analysis is done while mining. The returned net's 
+    unobserved attribute is an UnobservedFinals, which gives the remaining
+    final transitions when a consumer needs them.
     '''
+    if workers and workers > 1:
+        return minePureRoleStateNetParallel(sslog,label,final,workers,
+                                            budget=budget,
+                                            observedOnly=observedOnly)
     debug("minePureRoleStateNet()")
-    arcs = set()
-    activities = set()
-    atop = {}
-    atot = {}
-    # Mutating the weight changes the hash of the transition object
-    # and Python set comparisons start breaking because the implementation
-    # caches the hash
-    tweights = {}
-    tranId = 0
-    pid = 1
+    table = TransitionTable( getattr(sslog,'table',None) )
+    for caseId in sorted(sslog.keys()):
+        table.add_trace(sslog[caseId])
+    return roleStateNetFromTable(table, label, final, budget, observedOnly)
+
+
+
+def countShardTransitions(traces: list) -> TransitionTable:
+    '''
+    Transition table for a shard of traces, in order. Run in worker
+    processes by minePureRoleStateNetParallel.
+    '''
+    table = TransitionTable()
+    for trace in traces:
+        table.add_trace(trace)
+    return table
+
+def minePureRoleStateNetParallel(sslog: dict, label=None, final=True, 
+                                 workers:int=None, 
+                                 shardsPerWorker:int=4,
+                                 budget:ReachabilityBudget=None,
+                                 observedOnly:bool=False) -> RoleStateNet:
+    '''
+    Mine a RoleStateNet as minePureRoleStateNet. Shards of consecutive cases
+    are interned and counted in a process pool, each into its own
+    TransitionTable, and the tables are merged in shard order before the net
+    is built once.
+
+    Merging in shard order remaps each shard's role set and transition ids
+    in order of first appearance in the log, so place and transition ids
+    are the same as minePureRoleStateNet for any number of workers.
+    '''
+    debug("minePureRoleStateNetParallel()")
+    caseIds = sorted(sslog.keys())
+    if not workers:
+        workers = os.cpu_count()
+    shardSize = max(1, -(-len(caseIds) // (workers*shardsPerWorker)) )
+    shards = [ [sslog[caseId] for caseId in caseIds[i:i+shardSize]]
+                    for i in range(0,len(caseIds),shardSize) ]
+    table = TransitionTable()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for shardTable in executor.map(countShardTransitions, shards):
+            table.merge(shardTable)
+    return roleStateNetFromTable(table, label, final, budget, observedOnly)
+
+
+def roleStateNetFromTable(table: TransitionTable, label=None, final=True,
+                          budget:ReachabilityBudget=None,
+                          observedOnly:bool=False) -> RoleStateNet:
+    '''
+    Build a RoleStateNet from a TransitionTable. Places and transitions are
+    numbered in table.ordered_tids() order, so a table of a subset of a
+    log's traces counted with first positions gives the same net as mining
+    that subset directly.
+    '''
+    tids = table.ordered_tids()
+    return roleStateNetFromKeys(table.roleset, 
+                                [table.keys[tid] for tid in tids],
+                                [table.counts[tid] for tid in tids],
+                                table.finals, label, final, budget,
+                                observedOnly)
+
+
+def roleStateNetFromKeys(roleset, keys: list, weights: list,
+                         rsfinals: dict, label=None, final=True,
+                         budget:ReachabilityBudget=None,
+                         observedOnly:bool=False) -> RoleStateNet:
+    '''
+    Build a RoleStateNet from transition keys, pairs of role set ids, in 
+    transition id order, with their weights. Arcs are made once per 
+    transition, after its weight is set, so the net's arc set hashes
+    consistently. roleset maps role set ids to role sets, and the initial
+    place's role set is {'I'}.
+    '''
     initialPlace = Place(name='I',pid=1)
-    initRS =  frozenset([initialPlace.name])
-    atop[initialPlace.name] = initialPlace
+    atop = {initialPlace.name: initialPlace}
     pid = 2
-    finals = {}
-    for caseId in sorted(sslog.keys()):
-        trace = sslog[caseId]
-        prevAct = None
-        for snap in trace:
-            fact = frozenset(snap.activities)
-            activities.update(fact)
-            if not prevAct:
-                prevAct = initRS
-            pid = addPlaces(atop,fact,pid)
-            tran = addTransition(prevAct,fact,tranId,atot,tweights)
-            tranId = max(tranId,tran.tid)
-            newarcs = arcsSpanningTran(prevAct,tran,fact,atop)
-            arcs |= newarcs
-            prevAct = fact
-        if prevAct in finals:
-            finals[prevAct] += 1
-        else:
-            finals[prevAct] = 1
+    atot = {}
+    arcs = set()
+    tranId = 0
+    for key, weight in zip(keys,weights):
+        tranId += 1
+        tran = silent_transition(tid = tranId)
+        tran.weight = weight
+        fromPlaces = roleset(key[0])
+        toPlaces = roleset(key[1])
+        pid = addPlaces(atop,toPlaces,pid)
+        atot[(fromPlaces,toPlaces)] = tran
+        arcs |= arcsSpanningTran(fromPlaces,tran,toPlaces,atop)
+    finals = {roleset(rsid): ct for rsid, ct in rsfinals.items()}
+    unobserved, reachability = None, None
     if final:
         finalPlace = Place(name='F',pid=pid)
         finalPlace.final = True
         atop[finalPlace.name] = finalPlace
         finalRS = frozenset([finalPlace])
-        places = set( atop.values() ) | set([initialPlace,finalPlace]) 
-    else:
-        places = set( atop.values() ) | set([initialPlace]) 
-    transitions = set()
-    for tran in atot.values():
-        transitions.add(tran)
-    partialNet = RoleStateNet( places = places, transitions = transitions, 
-        arcs = arcs, name=label )
-    if final:
-        addRSNetFinalTransitions(partialNet, atot, atop, tranId, tweights, 
-                                 arcs, initialPlace, finalPlace, finals, 
-                                 finalRS)
-        places = set( atop.values() ) | set([initialPlace,finalPlace]) 
-    else:
-        places = set( atop.values() ) | set([initialPlace]) 
-    transitions = set()
-    debug(f'tweights {tweights}')
-    debug(f'atot {atot}')
-    for tran in atot.values():
-        tran.weight = tweights[tran]
-        transitions.add(tran)
-    return RoleStateNet( places = places, transitions = transitions, 
-                             arcs = arcs, name=label )
-
+        partialNet = RoleStateNet( places = set( atop.values() ), 
+                                   transitions = set( atot.values() ),
+                                   arcs = arcs, name=label )
+        unobserved, reachability = addFinalTransitions(partialNet, atot, 
+                                         atop, tranId, arcs, initialPlace, 
+                                         finalPlace, finals, finalRS, 
+                                         budget, observedOnly)
+    net = buildRoleStateNet(atot, arcs, set( atop.values() ), label)
+    net.unobserved = unobserved
+    net.reachability = reachability
+    return net
 
 
 '''
@@ -279,13 +443,17 @@ def minePLPN(sslog: dict, label=None, noiseThreshold=0.0, final=False) \
     else:
         return pnet
 
-def mineRoleStateNet(sslog: dict, label=None, noiseThreshold=0.0,final=True) \
-            -> RoleStateNet:
+def mineRoleStateNet(sslog: dict, label=None, noiseThreshold=0.0,final=True,
+                     workers:int=None, budget:ReachabilityBudget=None,
+                     observedOnly:bool=False,
+                     variantIndex:VariantIndex=None) -> RoleStateNet:
     if noiseThreshold > 0:
-        nrlog =  noiseReduceByVariant(sslog, noiseThreshold) 
-        return minePureRoleStateNet(nrlog,label,final)
+        nrlog =  noiseReduceByVariant(sslog, noiseThreshold, variantIndex) 
+        return minePureRoleStateNet(nrlog,label,final,workers,budget,
+                                    observedOnly)
     else:
-        return minePureRoleStateNet(sslog,label,final)
+        return minePureRoleStateNet(sslog,label,final,workers,budget,
+                                    observedOnly)
 
 mine = mineRoleStateNet
 
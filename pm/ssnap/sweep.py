@@ -0,0 +1,247 @@
+'''
+Mining nets over grids of noise thresholds and time windows.
+
+Role sets are interned and every trace is cut to every window in one pass
+over the log, with cuts found by binary search in one TimeIndex per sweep.
+A window of years keeps the snapshots of a trace up to the first one more
+than that many years after the trace starts, as
+cgedq.mine.filterByTimeOnInt does, so shorter windows give prefixes of the
+traces of longer ones.
+
+Within a window, raising the noise threshold only removes variants. Role
+State nets are built from one running TransitionTable per window, sharing
+the sweep's RoleSetTable, adding variants from the most to the least
+frequent as the threshold is lowered.
+PLPNs are mined once per window and pruned for each threshold.
+'''
+
+from concurrent.futures import ProcessPoolExecutor
+import logging
+import os
+
+from pmkoalas.models.petrinet import LabelledPetriNet
+from pm.logs.statesnaplog import RoleSetTable
+from pm.logs.windows import TimeIndex
+from pm.pmmodels.conform import ReachabilityBudget
+from pm.pmmodels.plpn import Marking
+from pm.pmmodels.rsnet import RoleStateNet
+from pm.ssnap.ssmetrics import entropic_relevance_plpn, \
+        entropic_relevance_rsnet
+from pm.ssnap.ssnap import minePurePLPN, pruneForNoiseByTranWeight, \
+        roleStateNetFromTable
+from pm.ssnap.trantable import TransitionTable
+
+
+logger = logging.getLogger(__name__)
+debug, info = logger.debug, logger.info
+
+
+class WindowVariants:
+    '''
+    Distinct traces of a log cut to one window, as tuples of role set ids,
+    with their case counts and the rank of their first case in case id
+    order. years is None for the whole log.
+    '''
+
+    def __init__(self, years):
+        self.years = years
+        self.counts = {}
+        self.firstRanks = {}
+        self.total = 0
+
+    def add(self, variant: tuple, rank: int):
+        if variant in self.counts:
+            self.counts[variant] += 1
+        else:
+            self.counts[variant] = 1
+            self.firstRanks[variant] = rank
+        self.total += 1
+
+    def by_frequency(self) -> list:
+        ''' Variants, most frequent first, ties in first case order. '''
+        return sorted( self.counts,
+                       key=lambda v: (-self.counts[v],self.firstRanks[v]) )
+
+    def log(self, roles: RoleSetTable) -> dict:
+        ''' Variant log of role set tuples to counts, for relevance. '''
+        rolesets = roles.rolesets()
+        return { tuple([rolesets[rsid] for rsid in variant]): ct
+                    for variant, ct in self.counts.items() }
+
+
+def window_variants(sslog: dict, windows: list,
+                    roles: RoleSetTable=None,
+                    timeIndex: TimeIndex=None) -> tuple:
+    '''
+    Returns (roles, variants), where roles is the RoleSetTable the variants'
+    role set ids are interned in, by default the log's own for columnar
+    logs, and variants maps each window to its WindowVariants. Traces are
+    read once, in case id order. Empty traces are skipped. Pass timeIndex,
+    a TimeIndex of sslog, to reuse it.
+    '''
+    windows = sort_windows(windows)
+    if timeIndex is None:
+        timeIndex = TimeIndex(sslog)
+    if roles is None:
+        roles = getattr(sslog,'table',None)
+    if roles is None:
+        roles = RoleSetTable()
+    variants = { years: WindowVariants(years) for years in windows }
+    for rank, caseId in enumerate(sorted(sslog.keys())):
+        trace = sslog[caseId]
+        if not trace:
+            continue
+        full = roles.variant_key(trace)
+        for years, cut in zip(windows, 
+                              timeIndex.first_years_cuts(caseId,windows)):
+            variants[years].add(tuple(full[:cut]),rank)
+    return (roles, variants)
+
+
+def sort_windows(windows) -> list:
+    return sorted(set(windows), key=lambda y: (y is None, y or 0))
+
+
+class SweepResult:
+    '''
+    Net mined for one grid point. relevance is None unless requested.
+    complete is False if a reachability budget ran out while adding the
+    net's final transitions.
+    '''
+
+    def __init__(self, noiseThreshold, years, net: LabelledPetriNet):
+        self.noiseThreshold = noiseThreshold
+        self.years = years
+        self.net = net
+        self.relevance = None
+
+    @property
+    def complete(self) -> bool:
+        reachability = getattr(self.net,'reachability',None)
+        return reachability is None or reachability.complete
+
+    def __repr__(self):
+        return f'SweepResult(noise={self.noiseThreshold}, years={self.years},'\
+               f' relevance={self.relevance}, complete={self.complete})'
+
+
+def sweep_window_rsnets(roles: RoleSetTable, wv: WindowVariants,
+                        noiseThresholds: list, label=None, final=True,
+                        budget:ReachabilityBudget=None,
+                        observedOnly:bool=False) -> dict:
+    '''
+    Role State nets for one window, by noise threshold, each the same as
+    mineRoleStateNet on the window log with that threshold.
+    '''
+    table = TransitionTable(roles)
+    ordered = wv.by_frequency()
+    added = 0
+    nets = {}
+    for noise in sorted(set(noiseThresholds), reverse=True):
+        threshold = max(noise,0) * wv.total
+        while added < len(ordered) and wv.counts[ordered[added]] >= threshold:
+            variant = ordered[added]
+            table.add_variant(variant, wv.counts[variant],
+                              wv.firstRanks[variant])
+            added += 1
+        debug(f'sweep window {wv.years} noise {noise}:'
+              f' {added} variants, {table.transition_count()} transitions')
+        nets[noise] = roleStateNetFromTable(table, label, final, budget,
+                                            observedOnly)
+    return nets
+
+
+def initial_marking(net: LabelledPetriNet) -> Marking:
+    initialPlace = [place for place in net.places if place.name == 'I'][0]
+    return Marking(net, {initialPlace:1})
+
+
+def net_relevance(log: dict, net: LabelledPetriNet, exact: bool) -> float:
+    marking = initial_marking(net)
+    if isinstance(net,RoleStateNet):
+        return entropic_relevance_rsnet(log,net,marking,exact=exact)
+    return entropic_relevance_plpn(log,net,marking,exact=exact)
+
+
+def sweep_relevance(results: list, logs: dict, exact: bool=False,
+                    parallel: bool=False, workers: int=None):
+    '''
+    Set the relevance of each result's net to its window log. Side effect:
+    mutates results.
+    '''
+    args = [ (logs[result.years], result.net, exact) for result in results ]
+    if parallel and len(args) > 1:
+        if not workers:
+            workers = os.cpu_count()
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            values = list( executor.map( net_relevance, *zip(*args) ) )
+    else:
+        values = [net_relevance(*arg) for arg in args]
+    for result, value in zip(results,values):
+        result.relevance = value
+
+
+def mineRoleStateNetSweep(sslog: dict, noiseThresholds: list,
+                          windows: list=(None,), label=None, final=True,
+                          budget:ReachabilityBudget=None,
+                          observedOnly:bool=False,
+                          relevance:bool=False, exact:bool=False,
+                          parallel:bool=False, workers:int=None) -> list:
+    '''
+    Mine a RoleStateNet for each combination of noise threshold and window
+    of years, where a window of None is the whole log. Returns SweepResults
+    ordered by window, then noise threshold, as given.
+
+    If relevance, the entropic relevance of the window log to each net is
+    also calculated, in a process pool if parallel.
+    '''
+    roles, variants = window_variants(sslog,windows)
+    nets = {}
+    for years in variants:
+        for noise, net in sweep_window_rsnets(roles, variants[years],
+                                              noiseThresholds, label, final,
+                                              budget, observedOnly).items():
+            nets[(years,noise)] = net
+    results = [ SweepResult(noise,years,nets[(years,noise)])
+                    for years in windows for noise in noiseThresholds ]
+    if relevance:
+        logs = { years: variants[years].log(roles) for years in variants }
+        sweep_relevance(results,logs,exact,parallel,workers)
+    return results
+
+
+def minePLPNSweep(sslog: dict, noiseThresholds: list,
+                  windows: list=(None,), label=None, final=False,
+                  relevance:bool=False, exact:bool=False,
+                  parallel:bool=False, workers:int=None) -> list:
+    '''
+    Mine a PLPN for each combination of noise threshold and window of
+    years, as minePLPN. The unpruned net is mined once per window. Returns
+    SweepResults ordered by window, then noise threshold, as given.
+    '''
+    timeIndex = TimeIndex(sslog)
+    results = []
+    for years in windows:
+        wlog = window_log(sslog,years,timeIndex)
+        pnet = minePurePLPN(wlog,label,final)
+        for noise in noiseThresholds:
+            net = pruneForNoiseByTranWeight(pnet,noise) if noise > 0 \
+                    else pnet
+            results.append( SweepResult(noise,years,net) )
+    if relevance:
+        roles, variants = window_variants(sslog,windows,timeIndex=timeIndex)
+        logs = { years: variants[years].log(roles) for years in variants }
+        sweep_relevance(results,logs,exact,parallel,workers)
+    return results
+
+
+def window_log(sslog: dict, years, timeIndex: TimeIndex=None) -> dict:
+    '''
+    View of the traces of sslog cut to a window, in log order. Pass
+    timeIndex, a TimeIndex of sslog, to reuse it across windows.
+    '''
+    if years is None:
+        return sslog
+    if timeIndex is None:
+        timeIndex = TimeIndex(sslog)
+    return timeIndex.first_years(years)
@@ -0,0 +1,153 @@
+'''
+Transition counts for the state snapshot miners, keyed by pairs of interned
+role set ids.
+
+Role sets are interned in a RoleSetTable, which can be shared with the log
+being mined and between tables. The initial and final places are markers
+with negative ids kept in the TransitionTable, so counting a log into its
+own RoleSetTable does not add them to the log's roles. Transitions are numbered in order of first
+firing, with counts in a dense list by transition id, so mining a snapshot
+is one role set lookup, one integer pair lookup and an increment. Places,
+transitions and arcs are only created when a net is built from the table,
+once per transition.
+
+The batch, parallel, sweep and incremental miners all count into a
+TransitionTable.
+'''
+
+from pm.logs.statesnaplog import RoleSetTable
+
+
+INITIAL_NAME = 'I'
+
+
+class TransitionTable:
+    '''
+    Transitions and final role set counts of a log, over role set ids of
+    roles. Transition ids start at zero; nets number transitions from one.
+
+    Tables counted out of log order, as the sweep miner adds variants by
+    frequency, can record the first position of each transition with
+    add_variant, and ordered_tids() then gives log order.
+    '''
+
+    def __init__(self, roles: RoleSetTable = None,
+                 initialName: str = INITIAL_NAME):
+        self.roles = roles if roles is not None else RoleSetTable()
+        self._markers = []
+        self._markerIds = {}
+        self._tids = {}
+        self.keys = []
+        self.counts = []
+        self.finals = {}
+        self.firsts = {}
+        self.initial = self.marker(initialName)
+
+    def marker(self, name) -> int:
+        '''
+        Id of the role set {name} of a marker place, such as the initial or
+        final place. Marker ids are negative and not interned in roles, so
+        a role of the same name keeps its own id.
+        '''
+        rsid = self._markerIds.get(name)
+        if rsid is None:
+            self._markers.append( frozenset([name]) )
+            rsid = self._markerIds[name] = -len(self._markers)
+        return rsid
+
+    def roleset(self, rsid: int) -> frozenset:
+        ''' The role set for a role set or marker id. '''
+        if rsid < 0:
+            return self._markers[-rsid-1]
+        return self.roles.roleset(rsid)
+
+    def intern(self, roles: frozenset) -> int:
+        return self.roles.intern(roles)
+
+    def count(self, fromId: int, toId: int, inc: int = 1) -> int:
+        ''' Add inc firings of the transition between role set ids. '''
+        key = (fromId,toId)
+        tid = self._tids.get(key)
+        if tid is None:
+            tid = len(self.keys)
+            self._tids[key] = tid
+            self.keys.append(key)
+            self.counts.append(inc)
+        else:
+            self.counts[tid] += inc
+        return tid
+
+    def transition_id(self, fromId: int, toId: int) -> int:
+        ''' Id of the transition between role set ids, or None. '''
+        return self._tids.get( (fromId,toId) )
+
+    def add_variant(self, variant: tuple, ct: int = 1, rank: int = None,
+                    finalId: int = None) -> int:
+        '''
+        Count ct traces of variant, a tuple of role set ids, from the initial
+        role set, and to finalId if given. The variant's last role set is
+        counted as final. If rank, the position of the variant's first trace
+        in the log, is given, transition first positions are kept for
+        ordered_tids(). Returns the last role set id.
+        '''
+        prev = self.initial
+        firsts = self.firsts
+        for step, rsid in enumerate(variant):
+            tid = self.count(prev,rsid,ct)
+            if rank is not None:
+                pos = (rank,step)
+                if tid not in firsts or pos < firsts[tid]:
+                    firsts[tid] = pos
+            prev = rsid
+        if finalId is not None:
+            self.count(prev,finalId,ct)
+        if variant:
+            self.finals[prev] = self.finals.get(prev,0) + ct
+        return prev
+
+    def add_trace(self, trace: list, finalId: int = None) -> int:
+        '''
+        Count the transitions of a trace from the initial role set, and to
+        finalId if given. Snapshots interned in roles are not interned
+        again. The trace's last role set is counted as final. Returns the
+        last role set id.
+        '''
+        return self.add_variant(self.roles.variant_key(trace),
+                                finalId=finalId)
+
+    def merge(self, other: 'TransitionTable') -> list:
+        '''
+        Add the counts of other, a table for later traces of the same log.
+        Its role sets and transitions are interned here in its own order,
+        so merging the tables of consecutive shards in shard order numbers
+        them as one table over the whole log would. Returns the map from
+        other's role set ids to ids here. Markers are mapped by name.
+        '''
+        remap = [self.intern(roles) for roles in other.roles.rolesets()]
+        def local(rsid):
+            if rsid < 0:
+                return self.marker( *other.roleset(rsid) )
+            return remap[rsid]
+        for (fromId, toId), ct in zip(other.keys,other.counts):
+            self.count(local(fromId),local(toId),ct)
+        for rsid, ct in other.finals.items():
+            rsid = local(rsid)
+            self.finals[rsid] = self.finals.get(rsid,0) + ct
+        return remap
+
+    def ordered_tids(self) -> list:
+        '''
+        Transition ids in order of first position if positions were kept,
+        otherwise in id order.
+        '''
+        if not self.firsts:
+            return list(range(len(self.keys)))
+        return sorted(self.firsts, key=self.firsts.__getitem__)
+
+    def transition_count(self) -> int:
+        return len(self.keys)
+
+    def roleset_finals(self) -> dict:
+        ''' Non-zero final counts keyed by role set. '''
+        return { self.roleset(rsid): ct for rsid, ct in self.finals.items()
+                    if ct }
@@ -131,6 +131,26 @@ class  WeightedTokenGameStateLogGeneratorTest(unittest.TestCase):
                      }
         self.assertEqual(expected, lg)
 
+    def test_long_trace(self):
+        net = self.net("I -> {a} -> A -> {c 5.0} -> A")
+        pi = findPlace(net,"I")
+        imark = singleton_marking(net, [pi])
+        sem = PLPNSemantics(imark)
+        gen = WeightedTokenGameStateLogGenerator(sem,log_size=3,
+                                                 max_trace_length=5000,
+                                                 warnings=False)
+        lg = gen.generate()
+        expected = { tuple( [ss(["I"])] + [ss(["A"])]*4999 ) : 3 }
+        self.assertEqual(expected, lg)
+        self.assertEqual(imark, sem.mark)
+
+    def test_zero_budget(self):
+        net = self.net("I -> {a} -> A")
+        pi = findPlace(net,"I")
+        imark = singleton_marking(net, [pi])
+        sem = PLPNSemantics(imark)
+        gen = WeightedTokenGameStateLogGenerator(sem,0)
+        self.assertEqual({}, gen.generate())
 
 
 class BagTest(unittest.TestCase):
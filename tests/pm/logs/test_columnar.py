@@ -0,0 +1,86 @@
+import unittest
+
+from pm.logs.columnar import StateSnapshotLog
+from pm.logs.statesnaplog import *
+from pm.ssnap.ssnap import minePurePLPN, minePureRoleStateNet
+from pm.ssnap.sweep import mineRoleStateNetSweep
+
+
+def sample_log():
+    return {1: [ StateSnapshot(1,1700, set(['Student'])),
+                 StateSnapshot(1,1701, set(['Sweep'])),
+                 StateSnapshot(1,1702, set(['Drone'])) ],
+            2: [ StateSnapshot(2,1701, set(['Sweep']) ),
+                 StateSnapshot(2,1705, set(['CEO','Sweep']))] ,
+            3: [ StateSnapshot(3,1705, set(['Sweep']) ) ],
+            4: [ StateSnapshot(4,1706, set(['Sweep']) ) ] }
+
+
+class StateSnapshotLogTest(unittest.TestCase):
+
+    def setUp(self):
+        self.sslog = sample_log()
+        self.clog = StateSnapshotLog.from_dict(self.sslog)
+
+    def test_dict_protocol(self):
+        self.assertEqual( 4, len(self.clog) )
+        self.assertEqual( [1,2,3,4], list(self.clog) )
+        self.assertTrue( 2 in self.clog )
+        self.assertFalse( 5 in self.clog )
+        self.assertEqual( self.sslog[2], self.clog[2] )
+        self.assertEqual( self.sslog, self.clog )
+        self.assertEqual( self.sslog, self.clog.to_dict() )
+        self.assertEqual( 7, self.clog.snapshot_count() )
+        self.assertEqual( [3,2,1,1], list(self.clog.trace_lengths()) )
+
+    def test_miner_unchanged(self):
+        self.assertEqual( minePureRoleStateNet(self.sslog),
+                          minePureRoleStateNet(self.clog) )
+
+    def test_mining_leaves_table_unchanged(self):
+        rolesets = list(self.clog.table.rolesets())
+        roleCount = self.clog.table.role_count()
+        minePurePLPN(self.clog)
+        minePureRoleStateNet(self.clog)
+        mineRoleStateNetSweep(self.clog,[0,1],[None])
+        self.assertEqual( rolesets, self.clog.table.rolesets() )
+        self.assertEqual( roleCount, self.clog.table.role_count() )
+
+    def test_select_cases(self):
+        self.assertEqual( {2: self.sslog[2], 4: self.sslog[4]},
+                          self.clog.select_cases([1,3]) )
+        self.assertEqual( {1: self.sslog[1], 2: self.sslog[2]},
+                          self.clog.cases(slice(0,2)) )
+        self.assertEqual( {}, self.clog.select_cases([]) )
+
+    def test_filter_by_role(self):
+        self.assertEqual( filter_by_role(self.sslog,'Sweep'),
+                          self.clog.filter_by_role('Sweep') )
+        self.assertEqual( filter_by_role(self.sslog,'Drone'),
+                          self.clog.filter_by_role('Drone') )
+        self.assertEqual( {}, self.clog.filter_by_role('Nobody') )
+
+    def test_filter_by_roleset(self):
+        self.assertEqual( filter_by_roleset(self.sslog,['CEO','Sweep']),
+                          self.clog.filter_by_roleset(['CEO','Sweep']) )
+
+    def test_take_tails(self):
+        for min_length in [0,1,2]:
+            self.assertEqual( take_tails(self.sslog,'Sweep',min_length),
+                              self.clog.take_tails('Sweep',min_length) )
+
+    def test_keep_top_roles(self):
+        for drop in [True,False]:
+            self.assertEqual( keep_top_roles(self.sslog,2,drop=drop),
+                              self.clog.keep_top_roles(2,drop=drop) )
+
+    def test_noise_reduce(self):
+        for noise in [0.0,0.3,0.5]:
+            self.assertEqual( noiseReduceByVariant(self.sslog,noise),
+                              self.clog.noise_reduce_by_variant(noise) )
+
+    def test_group_by_variant(self):
+        groups = self.clog.group_by_variant()
+        self.assertEqual( [[0],[1],[2,3]], 
+                          sorted([list(cases) for cases in groups.values()]) )
+
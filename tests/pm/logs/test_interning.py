@@ -0,0 +1,119 @@
+import pickle
+import unittest
+
+from pm.logs.statesnaplog import *
+
+
+class RoleSetTableTest(unittest.TestCase):
+
+    def test_intern(self):
+        table = RoleSetTable()
+        rs1 = table.intern(['Student'])
+        rs2 = table.intern(['Student','Tutor'])
+        self.assertEqual( 0, rs1 )
+        self.assertEqual( 1, rs2 )
+        self.assertEqual( rs2, table.intern(frozenset(['Tutor','Student'])) )
+        self.assertEqual( 2, len(table) )
+        self.assertEqual( 2, table.role_count() )
+        self.assertEqual( 0b11, table.rolemask(rs2) )
+        self.assertEqual( frozenset(['Student','Tutor']), table.roleset(rs2) )
+
+    def test_empty_set(self):
+        table = RoleSetTable()
+        rsid = table.intern([])
+        self.assertEqual( 0, table.rolemask(rsid) )
+        self.assertEqual( frozenset(), table.roleset(rsid) )
+
+    def test_containing(self):
+        table = RoleSetTable()
+        table.intern(['a'])
+        table.intern(['a','b'])
+        table.intern(['b','c'])
+        self.assertEqual( [True,True,False], list(table.containing(['a'])) )
+        self.assertEqual( [False,True,True], list(table.containing(['b'])) )
+        self.assertEqual( [False,True,False], 
+                          list(table.containing(['a','b'])) )
+        self.assertEqual( [False,False,False], list(table.containing(['z'])) )
+        self.assertEqual( 3, table.role_count() )
+
+    def test_roles_of_mask(self):
+        table = RoleSetTable()
+        table.intern(['a','b','c'])
+        self.assertEqual( frozenset(['a','c']), table.roles_of_mask(0b101) )
+
+
+class InternedStateSnapshotTest(unittest.TestCase):
+
+    def test_activities_shared(self):
+        table = RoleSetTable()
+        ss1 = InternedStateSnapshot(1,1801,set(['Student']),table)
+        ss2 = InternedStateSnapshot(2,1805,['Student'],table)
+        self.assertEqual( frozenset(['Student']), ss1.activities )
+        self.assertIs( ss1.activities, ss2.activities )
+        self.assertEqual( ss1.rsid, ss2.rsid )
+
+    def test_eq_hash(self):
+        t1 = RoleSetTable()
+        t2 = RoleSetTable()
+        t2.intern(['Other'])
+        ss1 = InternedStateSnapshot(1,1801,['Student'],t1)
+        ss2 = InternedStateSnapshot(1,1801,['Student'],t2)
+        self.assertNotEqual( ss1.rsid, ss2.rsid )
+        self.assertEqual( ss1, ss2 )
+        self.assertEqual( hash(ss1), hash(ss2) )
+        self.assertNotEqual( ss1, InternedStateSnapshot(1,1802,['Student'],t1) )
+        self.assertEqual( ss1, 
+                InternedStateSnapshot.from_rsid(1,1801,ss1.rsid,t1) )
+
+    def test_eq_plain(self):
+        iss = InternedStateSnapshot(1,1801,['Student'],RoleSetTable())
+        ss = StateSnapshot(1,1801,['Student'])
+        self.assertEqual( ss, iss )
+        self.assertEqual( iss, ss )
+        self.assertEqual( hash(ss), hash(iss) )
+        self.assertEqual( [ss], [iss] )
+        self.assertNotEqual( iss, StateSnapshot(1,1801,['Sweep']) )
+
+    def test_pickle(self):
+        ss = InternedStateSnapshot(1,1801,['Student'],RoleSetTable())
+        self.assertEqual( ss, pickle.loads(pickle.dumps(ss)) )
+
+    def test_intern_log(self):
+        sslog = {1: [ StateSnapshot(1,1700, set(['Student'])),
+                      StateSnapshot(1,1701, set(['Sweep']))],
+                 2: [ StateSnapshot(2,1701, set(['Student'])) ] }
+        table = RoleSetTable()
+        ilog = intern_log(sslog,table)
+        self.assertEqual( 2, len(table) )
+        for caseId in sslog:
+            self.assertEqual( sstrace_to_variant(sslog[caseId]),
+                              sstrace_to_variant(ilog[caseId]) )
+        self.assertEqual( (0,1), sstrace_to_variant_key(ilog[1],table) )
+        self.assertEqual( sstrace_to_variant(ilog[1]),
+                          sstrace_to_variant_key(ilog[1]) )
+
+    def test_variant_key_mixed_tables(self):
+        trace = [ StateSnapshot(1,1700, set(['Student'])),
+                  StateSnapshot(1,1701, set(['Sweep']))]
+        t1 = RoleSetTable()
+        t2 = RoleSetTable()
+        t2.intern(['Sweep'])
+        plain = sstrace_to_variant_key(trace,t1)
+        self.assertEqual( plain, sstrace_to_variant_key(intern_trace(trace,t1),
+                                                         t1) )
+        self.assertEqual( plain, sstrace_to_variant_key(intern_trace(trace,t2),
+                                                         t1) )
+        sslog = {1: trace, 2: intern_trace(trace,t2),
+                 3: [ StateSnapshot(3,1700, set(['Sweep'])) ] }
+        self.assertEqual( 2, VariantIndex(sslog,t1).count(trace) )
+        self.assertEqual( 2, VariantIndex(sslog).count(trace) )
+        self.assertEqual( [1,2], list(noiseReduceByVariant(sslog,0.5)) )
+
+    def test_noise_reduce_interned(self):
+        sslog = {1: [ StateSnapshot(1,1700, set(['Student'])) ],
+                 2: [ StateSnapshot(2,1701, set(['Sweep']) ) ] ,
+                 3: [ StateSnapshot(3,1705, set(['Sweep']) ) ],
+                 4: [ StateSnapshot(4,1701, set(['Sweep']) ) ] }
+        ilog = intern_log(sslog,RoleSetTable())
+        self.assertEqual( [2,3,4], list(noiseReduceByVariant(ilog,0.3)) )
+
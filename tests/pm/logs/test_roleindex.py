@@ -0,0 +1,72 @@
+
+import unittest
+
+from pm.logs.roleindex import *
+from pm.logs.statesnaplog import StateSnapshot, filter_by_role, \
+        filter_by_roleset, take_tails
+
+
+class RoleIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.sslog = {1: [ StateSnapshot(1,1700, ['Student']),
+                           StateSnapshot(1,1701, ['Sweep']),
+                           StateSnapshot(1,1702, ['Drone','Sweep']) ],
+                      2: [ StateSnapshot(2,1701, ['Sweep']),
+                           StateSnapshot(2,1705, ['CEO']) ],
+                      3: [ StateSnapshot(3,1705, ['Sweep','CEO']) ],
+                      4: [ StateSnapshot(4,1706, ['Student']),
+                           StateSnapshot(4,1707, ['Tutor']) ] }
+        self.index = RoleIndex(self.sslog)
+
+    def test_postings(self):
+        self.assertEqual( [1,2,3], self.index.cases('Sweep') )
+        self.assertEqual( [1,2], self.index.positions('Sweep',1) )
+        self.assertEqual( 1, self.index.first_position('Sweep',1) )
+        self.assertIsNone( self.index.first_position('Sweep',4) )
+        self.assertEqual( 4, self.index.snapshot_count('Sweep') )
+        self.assertEqual( [], self.index.cases('Nobody') )
+
+    def test_filters_match_scans(self):
+        for role in ['Sweep','CEO','Drone','Student','Nobody']:
+            self.assertEqual( filter_by_role(self.sslog,role),
+                              self.index.filter_by_role(role).to_dict() )
+            self.assertEqual( filter_by_role(self.sslog,role),
+                              filter_by_role(self.sslog,role,self.index) )
+            for min_length in [0,1,2]:
+                self.assertEqual( take_tails(self.sslog,role,min_length),
+                    self.index.take_tails(role,min_length).to_dict() )
+        for roles in [['Sweep','CEO'],['Sweep','Drone'],['Student','Tutor'],
+                      ['Sweep']]:
+            self.assertEqual( filter_by_roleset(self.sslog,roles),
+                        self.index.filter_by_roleset(roles).to_dict() )
+
+    def test_empty_roleset(self):
+        sslog = dict(self.sslog)
+        sslog[5] = []
+        index = RoleIndex(sslog)
+        self.assertEqual( [1,2,3,4], list(filter_by_roleset(sslog,[])) )
+        self.assertEqual( filter_by_roleset(sslog,[]),
+                          index.filter_by_roleset([]).to_dict() )
+        tails = index.take_tails('Sweep',2)
+        self.assertEqual( tails.to_dict(),
+                          index.filter_by_roleset([],view=tails).to_dict() )
+
+    def test_chained_view(self):
+        tails = self.index.take_tails('Sweep',2)
+        self.assertEqual( [1,2], list(tails) )
+        self.assertEqual( {2: self.sslog[2][0:2]},
+                          self.index.filter_by_role('CEO',view=tails)
+                                .to_dict() )
+        expected = filter_by_role( take_tails(self.sslog,'Student',1),
+                                   'Sweep' )
+        tails = self.index.take_tails('Student',1)
+        self.assertEqual( expected,
+                          self.index.filter_by_role('Sweep',view=tails)
+                                .to_dict() )
+
+    def test_co_occurring_roles(self):
+        self.assertEqual( {'Drone': 1, 'CEO': 1},
+                          self.index.co_occurring_roles('Sweep') )
+        self.assertEqual( {}, self.index.co_occurring_roles('Tutor') )
+
@@ -0,0 +1,62 @@
+
+import unittest
+
+from pm.logs.rolestats import *
+from pm.logs.columnar import StateSnapshotLog
+from pm.logs.statesnaplog import StateSnapshot, keep_top_roles
+
+
+class RoleStatisticsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.sslog = {1: [ StateSnapshot(1,1700, ['Student']),
+                           StateSnapshot(1,1701, ['Sweep','Student']),
+                           StateSnapshot(1,1702, ['Drone']) ],
+                      2: [ StateSnapshot(2,1701, ['Sweep']),
+                           StateSnapshot(2,1705, ['CEO','Student']) ] }
+
+    def test_frequencies(self):
+        stats = RoleStatistics.from_log(self.sslog)
+        self.assertEqual( {'Student': 3, 'Sweep': 2, 'Drone': 1, 'CEO': 1},
+                          stats.frequencies() )
+        self.assertEqual( 7, stats.total() )
+        self.assertEqual( 0, stats.frequency('Nobody') )
+        cstats = RoleStatistics.from_log(
+                                StateSnapshotLog.from_dict(self.sslog) )
+        self.assertEqual( stats.frequencies(), cstats.frequencies() )
+        self.assertEqual( 7, cstats.total() )
+
+    def test_stream(self):
+        stats = RoleStatistics()
+        passed = list( stats.add_stream( self.sslog.items() ) )
+        self.assertEqual( list(self.sslog.items()), passed )
+        self.assertEqual( RoleStatistics.from_log(self.sslog).frequencies(),
+                          stats.frequencies() )
+
+    def test_top_roles(self):
+        stats = RoleStatistics.from_log(self.sslog)
+        self.assertEqual( ['Student','Sweep'], stats.top_roles(2) )
+        self.assertEqual( ['Student','Sweep','CEO'], stats.top_roles(3) )
+        self.assertEqual( 4, len(stats.top_roles(10)) )
+
+    def test_replacement_map(self):
+        stats = RoleStatistics.from_log(self.sslog)
+        self.assertEqual( {'Student': 'Student', 'Sweep': 'Sweep',
+                           'Drone': 'other', 'CEO': 'other'},
+                          stats.replacement_map(2) )
+        self.assertEqual( None, stats.replacement_map(2,drop=True)['CEO'] )
+
+    def test_keep_top_roles(self):
+        stats = RoleStatistics.from_log(self.sslog)
+        expected = {1: [ StateSnapshot(1,1700, ['Student']),
+                         StateSnapshot(1,1701, ['Sweep','Student']),
+                         StateSnapshot(1,1702, ['other']) ],
+                    2: [ StateSnapshot(2,1701, ['Sweep']),
+                         StateSnapshot(2,1705, ['other','Student']) ] }
+        self.assertEqual( expected, keep_top_roles(self.sslog,2) )
+        self.assertEqual( expected,
+                          keep_top_roles(self.sslog,2,roleStats=stats) )
+        dropped = keep_top_roles(self.sslog,1,drop=True)
+        self.assertEqual( frozenset(), dropped[1][2].activities )
+        self.assertEqual( frozenset(['Student']), dropped[2][1].activities )
+
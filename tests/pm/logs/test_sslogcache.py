@@ -0,0 +1,113 @@
+import functools
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from pm.logs.columnar import StateSnapshotLog
+from pm.logs.sslogcache import cache_key, cached_log, load_log, store_log
+from pm.logs.statesnaplog import *
+from tests.pm import ssnap as tssnap
+
+mpath = os.path.abspath(tssnap.__path__[0])
+
+
+class StateSnapshotLogCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.cachedir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.cachedir)
+
+    def test_cache_key(self):
+        cf = os.path.join(mpath,'test_ssnap_log1.csv')
+        k1 = cache_key(cf,{'timeCol':'year', 'types':{'year':int}})
+        self.assertEqual( k1, 
+                          cache_key(cf,{'types':{'year':int},'timeCol':'year'}))
+        self.assertNotEqual( k1, 
+                cache_key(cf,{'timeCol':'year', 'types':{'year':float}}) )
+        cf2 = os.path.join(mpath,'test_ssnap_log_range.csv')
+        self.assertNotEqual( k1, 
+                cache_key(cf2,{'timeCol':'year', 'types':{'year':int}}) )
+
+    def test_cache_key_converters(self):
+        cf = os.path.join(mpath,'test_ssnap_log1.csv')
+        def key(conv):
+            return cache_key(cf,{'types':{'year':conv}})
+        def scaled(factor):
+            return lambda x: int(x)*factor
+        self.assertNotEqual( key(lambda x: int(x)), key(lambda x: float(x)) )
+        self.assertEqual( key(lambda x: int(x)), key(lambda x: int(x)) )
+        self.assertNotEqual( key(scaled(1)), key(scaled(2)) )
+        self.assertEqual( key(scaled(2)), key(scaled(2)) )
+        with self.assertRaises(ValueError):
+            key( functools.partial(int,base=10) )
+
+    def test_cached_log_uncacheable(self):
+        cf = os.path.join(mpath,'test_ssnap_log1.csv')
+        calls = []
+        def loader():
+            calls.append(1)
+            return {1: [ StateSnapshot(1,1700, set(['Student'])) ] }
+        params = {'types': {'year': functools.partial(int,base=10)}}
+        clog = cached_log(self.cachedir,cf,params,loader)
+        cached_log(self.cachedir,cf,params,loader)
+        self.assertEqual( 2, len(calls) )
+        self.assertEqual( loader(), clog )
+        self.assertEqual( [], os.listdir(self.cachedir) )
+
+    def test_store_load(self):
+        sslog = {'a': [ StateSnapshot('a',1700.5, set(['Student'])),
+                        StateSnapshot('a',1701, set(['Sweep','Student']))],
+                 'b': [ StateSnapshot('b',1701, set(['Student'])) ] }
+        self.assertIsNone( load_log(self.cachedir,'k') )
+        store_log(self.cachedir,'k',StateSnapshotLog.from_dict(sslog))
+        clog = load_log(self.cachedir,'k')
+        self.assertEqual( sslog, clog )
+        self.assertEqual( ['a','b'], list(clog) )
+        self.assertIsInstance( clog.rsids.base, np.memmap )
+
+    def test_sslog_from_csv_cached(self):
+        cf = os.path.join(mpath,'test_ssnap_log1.csv')
+        types = {'personid': int, 'year':int }
+        expected = sslogFromCSV(cf, 'personid','job','year', types=types)
+        for i in range(2):
+            sslog = sslogFromCSV(cf, 'personid','job','year', types=types, 
+                                 cacheDir=self.cachedir)
+            self.assertEqual( expected, sslog )
+            self.assertEqual( 1, len(os.listdir(self.cachedir)) )
+        sslogFromCSV(cf, 'personid','job','year', types=types, 
+                     keepSuccDupes=False, cacheDir=self.cachedir)
+        self.assertEqual( 2, len(os.listdir(self.cachedir)) )
+
+    def test_sslog_with_ranges_cached(self):
+        cf = os.path.join(mpath,'test_ssnap_log_range.csv')
+        types = {'personid': int, 'yearStart':float, 'yearEnd':float }
+        expected = sslogWithRanges(cf, 'personid','job','yearStart','yearEnd',
+                                   timeInc=1, types=types)
+        for i in range(2):
+            sslog = sslogWithRanges(cf, 'personid','job','yearStart',
+                                    'yearEnd', timeInc=1, types=types,
+                                    cacheDir=self.cachedir)
+            self.assertEqual( expected, sslog )
+        self.assertEqual( 1, len(os.listdir(self.cachedir)) )
+        sslog = sslogWithRanges(cf, 'personid','job','yearStart','yearEnd',
+                                timeInc=1, types=types, vectorised=True,
+                                cacheDir=self.cachedir)
+        self.assertEqual( expected, sslog )
+        self.assertEqual( 2, len(os.listdir(self.cachedir)) )
+        self.assertEqual( expected, sslog.to_dict() )
+
+    def test_cached_log_calls_loader_once(self):
+        cf = os.path.join(mpath,'test_ssnap_log1.csv')
+        calls = []
+        def loader():
+            calls.append(1)
+            return {1: [ StateSnapshot(1,1700, set(['Student'])) ] }
+        cached_log(self.cachedir,cf,{},loader)
+        cached_log(self.cachedir,cf,{},loader)
+        self.assertEqual( 1, len(calls) )
+
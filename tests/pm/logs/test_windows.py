@@ -0,0 +1,59 @@
+
+import unittest
+
+from pm.logs.statesnaplog import StateSnapshot
+from pm.logs.windows import *
+
+
+def filter_first_years(sslog, years):
+    result = {}
+    for caseId in sslog:
+        trace = sslog[caseId]
+        ntrace = []
+        head = trace[0]
+        for ss in trace:
+            if ss.time > head.time + years:
+                break
+            ntrace.append(ss)
+        result[caseId] = ntrace
+    return result
+
+
+class TimeIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.sslog = {1: [ StateSnapshot(1,1700, ['Student']),
+                           StateSnapshot(1,1702, ['Sweep']),
+                           StateSnapshot(1,1705, ['Drone']) ],
+                      2: [ StateSnapshot(2,1703, ['Sweep']),
+                           StateSnapshot(2,1704, ['Sweep','Drone']) ],
+                      3: [ StateSnapshot(3,1710, ['CEO']) ],
+                      4: [] }
+        self.index = TimeIndex(self.sslog)
+
+    def test_first_years(self):
+        nonempty = {caseId: trace for caseId, trace in self.sslog.items()
+                        if trace}
+        for years in [0, 1, 2, 5, 100]:
+            view = self.index.first_years(years)
+            self.assertEqual( filter_first_years(nonempty,years),
+                              view.to_dict() )
+            self.assertEqual( list(nonempty), list(view) )
+        view = self.index.first_years(2)
+        self.assertEqual( (0,2), view.entry_range(1) )
+        self.assertEqual( 5, view.snapshot_count() )
+        self.assertIs( self.sslog[1][1], view[1][1] )
+
+    def test_first_years_cuts(self):
+        self.assertEqual( [1,2,2,3], 
+                          self.index.first_years_cuts(1,[0,2,4,None]) )
+        self.assertEqual( [1,2], self.index.first_years_cuts(2,[0,None]) )
+
+    def test_calendar(self):
+        view = self.index.calendar(1702,1705)
+        self.assertEqual( [1,2], list(view) )
+        self.assertEqual( [self.sslog[1][1]], view[1] )
+        self.assertEqual( self.sslog[2], view[2] )
+        self.assertNotIn( 3, view )
+        self.assertEqual( 0, len(self.index.calendar(1720,1730)) )
+
@@ -0,0 +1,72 @@
+
+import unittest
+
+from pm.metrics.batch import *
+from pm.metrics.earthmovers import unit_earthmovers
+from pm.metrics.relevance import relevance_uniform_roleset, \
+        relevance_zero_order
+
+ss = frozenset
+
+log1 = { (ss(['I']),ss(['A']),ss(['F'])): 20,
+         (ss(['I']),ss(['A','B']),ss(['F'])): 10,
+         (ss(['I']),ss(['B']),ss(['B','A']),ss(['F'])): 10 }
+
+log2 = { (ss(['I']),ss(['A']),ss(['F'])): 5,
+         (ss(['I']),ss(['C']),ss(['F'])): 15 }
+
+model1 = { (ss(['I']),ss(['A']),ss(['F'])): 60,
+           (ss(['I']),ss(['A','B']),ss(['F'])): 30,
+           (ss(['I']),ss(['B']),ss(['F'])): 10 }
+
+
+class BatchMetricsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.reps = {'log1': log1, 'log2': log2, 'model1': model1}
+        self.batch = BatchMetrics(self.reps)
+
+    def assertMatchesPairwise(self, mm, logNames, modelNames):
+        for log in logNames:
+            for model in modelNames:
+                tf1 = self.batch.tf(log)
+                tf2 = self.batch.tf(model)
+                self.assertAlmostEqual( relevance_uniform_roleset(tf1,tf2),
+                    mm.value(RELEVANCE_UNIFORM_ROLESET,log,model) )
+                self.assertAlmostEqual( relevance_zero_order(tf1,tf2),
+                    mm.value(RELEVANCE_ZERO_ORDER,log,model) )
+                self.assertAlmostEqual( unit_earthmovers(tf1,tf2),
+                    mm.value(UNIT_EARTHMOVERS,log,model) )
+
+    def test_universe(self):
+        self.assertEqual( 5, self.batch.variant_count() )
+
+    def test_compare(self):
+        names = list(self.reps)
+        mm = self.batch.compare(names,names)
+        self.assertEqual( (3,3), mm.matrix(UNIT_EARTHMOVERS).shape )
+        self.assertMatchesPairwise(mm,names,names)
+
+    def test_compare_parallel(self):
+        mm = self.batch.compare(['log1','log2'],['model1','log1'],
+                                parallel=True, workers=2)
+        self.assertMatchesPairwise(mm,['log1','log2'],['model1','log1'])
+
+    def test_metrics(self):
+        result = self.batch.metrics('log2','model1')
+        self.assertEqual( set(METRICS), set(result) )
+        self.assertAlmostEqual( 0.25, result[UNIT_EARTHMOVERS] )
+
+
+    def test_compare_pairs(self):
+        pairs = [('log1','model1'), ('log2','model1'), ('log1','log2'),
+                 ('model1','log1'), ('log1','model1')]
+        names = list(self.reps)
+        mm = self.batch.compare(names,names)
+        for parallel in [False,True]:
+            values = self.batch.compare_pairs(pairs, parallel=parallel,
+                                              workers=2)
+            self.assertEqual( set(pairs), set(values) )
+            for (log, model), result in values.items():
+                for metric, value in mm.metrics(log,model).items():
+                    self.assertAlmostEqual( value, result[metric] )
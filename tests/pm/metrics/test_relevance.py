@@ -22,6 +22,52 @@ class TraceFrequencyTest(unittest.TestCase):
         self.assertEqual( 5, mtf.trace_total() )
         self.assertEqual( 2, mtf.role_total() )
 
+    def test_elements_read_only(self):
+        tf1 = TraceFrequency()
+        with self.assertRaises(TypeError):
+            tf1.elements()['a'] = 1
+        self.assertEqual( 0, TraceFrequency().trace_total() )
+        elements = { 'a': 2 }
+        tf2 = TraceFrequency(elements)
+        elements['a'] = 3
+        self.assertEqual( 2, tf2.freq('a') )
+
+    def test_roles(self):
+        rtf = RoleTraceFrequency( { (ss(['a','b']),ss(['c'])): 2,
+                                    (ss(['a']),): 1 } )
+        self.assertEqual( frozenset(['a','b','c']), rtf.roles() )
+        self.assertEqual( 3, rtf.role_total() )
+        self.assertIs( rtf.entry_frequency(), rtf.entry_frequency() )
+        self.assertEqual( 3, rtf.entry_frequency().entry_freq(ss(['a','b']))
+                             + rtf.entry_frequency().entry_freq(ss(['a'])) )
+
+    def test_merge_subtract(self):
+        tf1 = TraceFrequency( { 'a': 2, 'b': 3 } )
+        tf2 = TraceFrequency( { 'b': 1, 'c': 4 } )
+        merged = tf1.merge(tf2)
+        self.assertEqual( TraceFrequency( {'a': 2, 'b': 4, 'c': 4} ), merged )
+        self.assertEqual( 10, merged.trace_total() )
+        self.assertEqual( tf1, merged.subtract(tf2) )
+        self.assertEqual( TraceFrequency( {'a': 2} ),
+                          tf1.subtract(TraceFrequency( {'b': 5} )) )
+        self.assertEqual( 2, tf1.freq('a') )
+        rtf = RoleTraceFrequency( { (ss(['a']),): 1 } )
+        self.assertIsInstance( rtf.merge(rtf), RoleTraceFrequency )
+
+    def test_hash_fingerprint(self):
+        rtf1 = RoleTraceFrequency( { (ss(['a','b']),ss(['c'])): 2,
+                                     (ss(['a']),): 1 } )
+        rtf2 = RoleTraceFrequency( { (ss(['a']),): 1,
+                                     (ss(['b','a']),ss(['c'])): 2 } )
+        self.assertEqual( rtf1, rtf2 )
+        self.assertEqual( hash(rtf1), hash(rtf2) )
+        self.assertEqual( rtf1.fingerprint(), rtf2.fingerprint() )
+        rtf3 = RoleTraceFrequency( { (ss(['a']),): 2 } )
+        self.assertNotEqual( rtf1, rtf3 )
+        self.assertNotEqual( rtf1.fingerprint(), rtf3.fingerprint() )
+        self.assertNotEqual( TraceFrequency( {'a': 1} ),
+                             RoleTraceFrequency( {'a': 1} ) )
+
 
 # From Alkhammash paper
 ltf_e1 = TraceFrequency(  
@@ -0,0 +1,75 @@
+import unittest
+
+from pm.metrics.replay import TraceTrie, ReplayProbabilities
+from pm.pmmodels.plpn import *
+from pm.pmmodels.rsnet import RoleStateNetSemantics, to_rsnet
+from pm.ssnap.ssmetrics import enclose_traces
+
+from tests.pm.pmmodels.markovutil import AbsorbingMarkovChain
+from tests.pm.pmmodels.pnfragutil import *
+
+
+ss = frozenset
+
+class TraceTrieTest(unittest.TestCase):
+
+    def test_shared_prefix(self):
+        log = { (ss(['I']), ss(['A']), ss(['F'])): 3,
+                (ss(['I']), ss(['A'])): 2,
+                (ss(['I']), ss(['B']), ss(['F'])): 1 }
+        trie = TraceTrie(log)
+        self.assertEqual(6, len(trie))
+        inode = trie.children(0)[ss(['I'])]
+        self.assertEqual( set([ss(['A']),ss(['B'])]), 
+                          set(trie.children(inode).keys()) )
+        anode = trie.children(inode)[ss(['A'])]
+        self.assertEqual( ((ss(['I']), ss(['A'])), 2), trie.ending(anode) )
+        self.assertIsNone( trie.ending(inode) )
+
+
+class ReplayProbabilitiesTest(PetriNetTestCase):
+
+    def assertMatchesChain(self, semantics, log):
+        chain = AbsorbingMarkovChain.from_semantics(semantics)
+        replay = ReplayProbabilities(semantics,log)
+        for trace in log:
+            self.assertAlmostEqual( chain.freq(trace), replay.freq(trace) )
+        return replay
+
+    def test_choice(self):
+        net = self.net("I -> {tau__1 20.0} -> A -> {tau__2 20.0} -> F")
+        self.add(net,  "I -> {tau__3 10.0} -> B -> {tau__4 10.0} -> F ")
+        imark = singleton_marking(net, [findPlace(net,"I")])
+        sem = PLPNSemantics(imark)
+        log = enclose_traces( { (ss(['A']),): 20, (ss(['C']),): 5 } )
+        replay = self.assertMatchesChain(sem,log)
+        self.assertAlmostEqual(2/3, 
+                replay.freq( (ss(['I']), ss(['A']), ss(['F'])) ) )
+        self.assertEqual(0, replay.freq( (ss(['I']), ss(['C']), ss(['F'])) ))
+        self.assertEqual(1.0, replay.trace_total())
+        self.assertIs(imark, sem.mark)
+
+    def test_loop_and_concurrency(self):
+        net = self.net("I -> {tau__1 1.0} -> A -> {tau__2 1.0} -> C")
+        self.add(net,  "I -> {tau__1 1.0} -> B -> {tau__3 2.0} -> D")
+        self.add(net,  "C -> {tau__4 3.0} -> A")
+        net = to_rsnet(net)
+        imark = singleton_marking(net, [findPlace(net,"I")])
+        sem = RoleStateNetSemantics(imark)
+        log = { (ss(['I']), ss(['A','B']), ss(['B','C']), ss(['C','D'])): 4,
+                (ss(['I']), ss(['A','B']), ss(['B','C']), ss(['A','B']), 
+                            ss(['A','D']), ss(['C','D'])): 2,
+                (ss(['I']), ss(['A','B']), ss(['A','D'])): 1 }
+        self.assertMatchesChain(sem,log)
+
+    def test_prunes_unused_branches(self):
+        net = self.net("I -> {tau__1 1.0} -> A -> {tau__2 1.0} -> F")
+        self.add(net,  "I -> {tau__3 1.0} -> B -> {tau__4 1.0} -> C")
+        self.add(net,  "C -> {tau__5 1.0} -> D -> {tau__6 1.0} -> F")
+        imark = singleton_marking(net, [findPlace(net,"I")])
+        sem = PLPNSemantics(imark)
+        log = enclose_traces( { (ss(['A']),): 1 } )
+        replay = self.assertMatchesChain(sem,log)
+        self.assertAlmostEqual(0.5, 
+                replay.freq( (ss(['I']), ss(['A']), ss(['F'])) ) )
+        self.assertEqual(3, replay.marking_count())
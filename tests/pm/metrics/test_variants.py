@@ -0,0 +1,82 @@
+
+import math
+import unittest
+
+import numpy as np
+
+from pm.metrics.earthmovers import unit_earthmovers
+from pm.metrics.relevance import *
+from pm.metrics.variants import *
+from tests.pm.metrics.test_relevance import ltf_e1, ltf_e2, mtf_a1, \
+        mtf_a2, ltf_se2
+
+
+class LogVariantsTest(unittest.TestCase):
+
+    def test_align(self):
+        lv = LogVariants(ltf_e1)
+        self.assertEqual( 6, len(lv) )
+        self.assertEqual( 2000, lv.total )
+        modelFreqs = lv.align(mtf_a1)
+        for trace, i in lv.index.items():
+            self.assertEqual( ltf_e1.freq(trace), lv.freqs[i] )
+            self.assertEqual( len(trace), lv.lengths[i] )
+            self.assertEqual( mtf_a1.freq(trace), modelFreqs[i] )
+
+    def test_background_costs(self):
+        lv = LogVariants(ltf_se2)
+        for bgc in (uniform_background_cost, uniform_role_background_cost):
+            scalar = lv.background_costs(bgc)
+            costs = background_costs(lv,bgc)
+            for trace, i in lv.index.items():
+                self.assertAlmostEqual( bgc(ltf_se2,trace), scalar[i] )
+                self.assertAlmostEqual( bgc(ltf_se2,trace), costs[i] )
+
+    def test_vectorised_background_costs(self):
+        lv = LogVariants(ltf_se2)
+        costs = lv.background_costs(uniform_background_cost,
+                                    uniform_background_costs)
+        for trace, i in lv.index.items():
+            self.assertAlmostEqual(
+                    uniform_background_cost(ltf_se2,trace), costs[i] )
+
+    def test_per_trace_background_cost(self):
+        lv = LogVariants(ltf_e1)
+        costs = lv.background_costs( lambda logTF, trace: 2*len(trace) )
+        for trace, i in lv.index.items():
+            self.assertEqual( 2*len(trace), costs[i] )
+
+    def test_costs_match_per_trace(self):
+        for ltf in (ltf_e1, ltf_e2):
+            for mtf in (mtf_a1, mtf_a2):
+                lv = LogVariants(ltf)
+                lsum = 0
+                for trace in ltf.traces():
+                    if mtf.freq(trace) > 0:
+                        lsum += ltf.freq(trace) * model_cost(mtf,trace)
+                    else:
+                        lsum += ltf.freq(trace) \
+                                    * uniform_background_cost(ltf,trace)
+                self.assertAlmostEqual( lsum / ltf.trace_total(),
+                    trace_compression_cost(ltf,mtf,uniform_background_cost,
+                                           logVariants=lv) )
+
+    def test_unit_earthmovers(self):
+        lv = LogVariants(ltf_e1)
+        expected = 1 - sum( [max( ltf_e1.freq(trace)/ltf_e1.trace_total()
+                                - mtf_a1.freq(trace)/mtf_a1.trace_total(), 0)
+                             for trace in ltf_e1.traces()] )
+        self.assertAlmostEqual( expected,
+            unit_earthmovers_arrays(lv.freqs, lv.total,
+                                    lv.align(mtf_a1), mtf_a1.trace_total()) )
+        self.assertAlmostEqual( expected, unit_earthmovers(ltf_e1,mtf_a1) )
+
+    def test_full_coverage_selector(self):
+        freqs = np.array([3.0,2.0])
+        self.assertEqual( 0, selector_cost_arrays(freqs,5,np.array([1.0,1.0])) )
+        self.assertEqual( 0, selector_cost_arrays(freqs,5,np.array([0.0,0.0])) )
+        rho = 0.6
+        self.assertAlmostEqual(
+            -1 * (rho * math.log2(rho) + (1 - rho)*math.log2(1 - rho)),
+            selector_cost_arrays(freqs,5,np.array([4.0,0.0])) )
+
@@ -0,0 +1,126 @@
+'''
+Exact stochastic languages of small weighted nets, as absorbing Markov
+chains over all reachable markings, used as the test oracle for
+pm.metrics.replay. Reachability is explored in full with no budget.
+
+Each marking moves to the marking after firing an enabled transition with
+probability of that transition's weight over the total weight enabled, as
+in WeightedTokenGameStateLogGenerator. Markings with nothing enabled are
+absorbing and end a trace. A trace is the sequence of place name sets of
+the markings visited, so trace probabilities are computed by propagating
+probability vectors through the transition rows, keeping only markings
+with the label of each trace step.
+'''
+
+import logging
+
+from pm.metrics.replay import marking_label
+from pm.pmmodels.plpn import Marking, PetriNetSemantics, frozen_mark
+
+
+logger = logging.getLogger(__name__)
+debug, info = logger.debug, logger.info
+
+
+class AbsorbingMarkovChain:
+    '''
+    Transition rows over the reachable markings of a weighted net, each a
+    dict of successor state to probability, with markings grouped by
+    label.
+
+    Provides freq() and trace_total() as TraceFrequency does, with freq()
+    the exact probability of a trace and trace_total() one, so it can be
+    used as the model in the relevance calculations.
+    '''
+
+    def __init__(self, rows: list, labels: list, absorbing: list,
+                 initial: int = 0):
+        self._rows = rows
+        self._labels = labels
+        self._absorbing = absorbing
+        self._initial = initial
+        labelIndex = {}
+        for state, label in enumerate(labels):
+            labelIndex.setdefault(label,[]).append(state)
+        self._labelIndex = { label: set(states)
+                                for label, states in labelIndex.items() }
+        self._probs = {}
+
+    @classmethod
+    def from_semantics(cls, semantics: PetriNetSemantics) \
+            -> 'AbsorbingMarkovChain':
+        '''
+        Chain over the markings reachable from the semantics marking, which
+        is restored afterwards. Markings whose enabled transitions have no
+        total weight are treated as absorbing.
+        '''
+        startMarking = semantics.mark
+        net = startMarking.net
+        start = frozen_mark(startMarking.mark)
+        states = {start: 0}
+        markings = [Marking(net,start)]
+        rows = []
+        absorbing = []
+        state = 0
+        while state < len(markings):
+            marking = markings[state]
+            semantics.mark = marking
+            enabled = semantics.enabled()
+            total = sum( [tran.weight for tran in enabled] )
+            absorbing.append( total <= 0 )
+            row = {}
+            rows.append(row)
+            if total > 0:
+                for tran in enabled:
+                    nm = semantics.remark(tran)
+                    semantics.mark = marking
+                    if nm.mark not in states:
+                        states[nm.mark] = len(markings)
+                        markings.append(nm)
+                    # transitions between the same markings are summed
+                    col = states[nm.mark]
+                    row[col] = row.get(col,0) + tran.weight / total
+            state += 1
+        semantics.mark = startMarking
+        debug(f'AbsorbingMarkovChain: {len(markings)} markings')
+        labels = [marking_label(marking.mark) for marking in markings]
+        return cls(rows, labels, absorbing)
+
+    def state_count(self) -> int:
+        return len(self._labels)
+
+    def trace_probability(self, trace: tuple) -> float:
+        '''
+        Probability of trace, a sequence of role sets including the initial
+        and final entries, as from enclose_traces.
+        '''
+        if trace in self._probs:
+            return self._probs[trace]
+        prob = self.propagate(trace)
+        self._probs[trace] = prob
+        return prob
+
+    def propagate(self, trace: tuple) -> float:
+        if len(trace) == 0 or self._labels[self._initial] != trace[0]:
+            return 0.0
+        dist = {self._initial: 1.0}
+        for entry in trace[1:]:
+            states = self._labelIndex.get(frozenset(entry))
+            if states is None:
+                return 0.0
+            nextDist = {}
+            for state, prob in dist.items():
+                for col, move in self._rows[state].items():
+                    if col in states:
+                        nextDist[col] = nextDist.get(col,0) + prob * move
+            if not nextDist:
+                return 0.0
+            dist = nextDist
+        return sum( [prob for state, prob in dist.items() 
+                          if self._absorbing[state]] )
+
+    def freq(self, trace) -> float:
+        return self.trace_probability(trace)
+
+    def trace_total(self) -> float:
+        return 1.0
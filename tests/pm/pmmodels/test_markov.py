@@ -0,0 +1,68 @@
+import math
+import unittest
+
+from pm.loggen.wpn_loggen import WeightedTokenGameStateLogGenerator
+from pm.pmmodels.plpn import *
+from pm.pmmodels.rsnet import RoleStateNetSemantics, to_rsnet
+
+from tests.pm.pmmodels.markovutil import AbsorbingMarkovChain
+from tests.pm.pmmodels.pnfragutil import *
+
+
+ss = frozenset
+
+class AbsorbingMarkovChainTest(PetriNetTestCase):
+
+    def test_choice(self):
+        net = self.net("I -> {tau__1 20.0} -> A -> {tau__2 20.0} -> F")
+        self.add(net,  "I -> {tau__3 10.0} -> B -> {tau__4 10.0} -> F ")
+        imark = singleton_marking(net, [findPlace(net,"I")])
+        sem = PLPNSemantics(imark)
+        chain = AbsorbingMarkovChain.from_semantics(sem)
+        self.assertEqual(4, chain.state_count())
+        self.assertAlmostEqual(2/3, 
+            chain.freq( (ss(['I']), ss(['A']), ss(['F'])) ) )
+        self.assertAlmostEqual(1/3, 
+            chain.freq( (ss(['I']), ss(['B']), ss(['F'])) ) )
+        self.assertEqual(0, chain.freq( (ss(['I']), ss(['A'])) ) )
+        self.assertEqual(0, chain.freq( (ss(['I']), ss(['C']), ss(['F'])) ))
+        self.assertEqual(0, chain.freq( (ss(['A']), ss(['F'])) ) )
+        self.assertEqual(1.0, chain.trace_total())
+        self.assertIs(imark, sem.mark)
+
+    def test_loop(self):
+        net = self.net("I -> {a 1.0} -> A -> {b 1.0} -> F")
+        self.add(net,  "A -> {c 3.0} -> A")
+        imark = singleton_marking(net, [findPlace(net,"I")])
+        chain = AbsorbingMarkovChain.from_semantics(PLPNSemantics(imark))
+        for loops in range(5):
+            trace = tuple( [ss(['I'])] + [ss(['A'])]*(loops+1) + [ss(['F'])] )
+            self.assertAlmostEqual( 0.25 * 0.75**loops, chain.freq(trace) )
+
+    def test_concurrent_paths_summed(self):
+        net = self.net("I -> {tau__1 1.0} -> A -> {tau__2 1.0} -> C")
+        self.add(net,  "I -> {tau__1 1.0} -> B -> {tau__3 1.0} -> D")
+        net = to_rsnet(net)
+        imark = singleton_marking(net, [findPlace(net,"I")])
+        chain = AbsorbingMarkovChain.from_semantics(
+                                            RoleStateNetSemantics(imark))
+        self.assertAlmostEqual(0.5, 
+            chain.freq( (ss(['I']), ss(['A','B']), ss(['B','C']),
+                         ss(['C','D'])) ) )
+        self.assertAlmostEqual(0.5, 
+            chain.freq( (ss(['I']), ss(['A','B']), ss(['A','D']),
+                         ss(['C','D'])) ) )
+
+    def test_matches_generator(self):
+        net = self.net("I -> {a 1.0} -> A -> {b 2.0} -> F")
+        self.add(net,  "A -> {c 3.0} -> B -> {d 1.0} -> A")
+        self.add(net,  "B -> {e 1.0} -> F")
+        imark = singleton_marking(net, [findPlace(net,"I")])
+        sem = PLPNSemantics(imark)
+        chain = AbsorbingMarkovChain.from_semantics(sem)
+        lg = WeightedTokenGameStateLogGenerator(sem,100000).generate()
+        for trace, count in lg.items():
+            if len(trace) < 8:
+                self.assertTrue( math.isclose( count/100000, 
+                                               chain.freq(trace),
+                                               abs_tol=1e-4 ) )
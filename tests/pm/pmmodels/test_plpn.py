@@ -1,3 +1,4 @@
+from copy import deepcopy
 import unittest
 
 from pm.pmmodels.plpn import *
@@ -207,3 +208,52 @@ class PLPNSemanticsTest(unittest.TestCase):
 
 
 
+
+
+class FrozenMarkTest(unittest.TestCase):
+
+    def test_fire(self):
+        pi = Place("I","pi")
+        p1 = Place("p1","p1")
+        p2 = Place("p2","p2")
+        start = FrozenMark({pi:1, p1:1})
+        fm = start.fire([pi],[p1,p2])
+        self.assertEqual( {p1:2, p2:1}, dict(fm) )
+        self.assertEqual( {pi:1, p1:1}, dict(start) )
+        self.assertEqual( FrozenMark({p2:1, p1:2}), fm )
+        self.assertEqual( hash(FrozenMark({p2:1, p1:2})), hash(fm) )
+        self.assertNotEqual( start, fm )
+        self.assertEqual( {pi:1, p1:1}, start )
+
+    def test_fire_chain(self):
+        places = [Place(f"p{i}",f"p{i}") for i in range(3)]
+        fm = FrozenMark({places[0]:1})
+        for i in range(3*FrozenMark.MAX_DEPTH+1):
+            prev = fm
+            fm = fm.fire([places[i%3]],[places[(i+1)%3],places[2]])
+            self.assertEqual( {places[i%3], places[(i+1)%3], places[2]},
+                              changed_places(prev,fm) )
+            expected = FrozenMark(dict(fm.items()))
+            self.assertEqual( expected, fm )
+            self.assertEqual( hash(expected), hash(fm) )
+            self.assertEqual( len(expected), len(fm) )
+        self.assertEqual( 3*FrozenMark.MAX_DEPTH+2, sum(fm.values()) )
+        with self.assertRaises(KeyError):
+            FrozenMark({places[0]:1}).fire([places[1]],[])
+
+    def test_shared_places(self):
+        pi = Place("I","pi")
+        fm = FrozenMark({pi:1})
+        self.assertIs( fm, deepcopy(fm) )
+        self.assertIs( pi, list(fm.fire([],[]).keys())[0] )
+        self.assertIs( fm, frozen_mark(fm) )
+
+    def test_remark_shares_places(self):
+        pi = Place("I","pi")
+        pf = Place("F","pf")
+        ta = Transition("a")
+        net = LabelledPetriNet([pi,pf],[ta],[Arc(pi,ta),Arc(ta,pf)],"seq")
+        sem = PetriNetSemantics(singleton_marking(net, [pi]))
+        fmarking = sem.remark(ta)
+        self.assertIsInstance( fmarking.mark, FrozenMark )
+        self.assertIs( pf, list(fmarking.mark.keys())[0] )
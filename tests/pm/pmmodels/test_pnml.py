@@ -0,0 +1,76 @@
+import io
+import os
+import tempfile
+import unittest
+
+from pmkoalas.models.petrinet import Arc, Place, Transition
+from pm.pmmodels.rsnet import *
+from pm.ssnap.ssnap import StateSnapshot, mineRoleStateNet
+
+
+def trace(caseId, start, *rolesets):
+    return [ StateSnapshot(caseId,start+i,set(roles))
+                for i, roles in enumerate(rolesets) ]
+
+
+def round_trip(net):
+    with tempfile.TemporaryDirectory() as tdir:
+        fname = os.path.join(tdir,'net.pnml')
+        export_rsnet_to_pnml(net,fname)
+        return import_rsnet_from_pnml(fname)
+
+
+class RoleStateNetPNMLTest(unittest.TestCase):
+
+    def setUp(self):
+        self.sslog = {}
+        for caseId in range(1,5):
+            self.sslog[caseId] = trace(caseId,1700,['Student'],['Tutor'],
+                                       ['Tutor','Dean'])
+        self.sslog[5] = trace(5,1710,['Student'],['学士'])
+        self.sslog[6] = trace(6,1720,['Tutor'],['Student'])
+
+    def assertNetsEqual(self, expected, actual):
+        self.assertEqual(expected, actual)
+        self.assertEqual(expected.arcs, actual.arcs)
+        etrans = { tran.tid: tran for tran in expected.transitions }
+        for tran in actual.transitions:
+            self.assertEqual(etrans[tran.tid].picky, tran.picky)
+            self.assertEqual(getattr(etrans[tran.tid],'observed',None),
+                             getattr(tran,'observed',None))
+        efinals = set([place for place in expected.places
+                            if getattr(place,'final',False)])
+        afinals = set([place for place in actual.places
+                            if getattr(place,'final',False)])
+        self.assertEqual(efinals, afinals)
+
+    def test_mined_round_trip(self):
+        net = mineRoleStateNet(self.sslog,label='cases')
+        result = round_trip(net)
+        self.assertIsInstance(result, RoleStateNet)
+        self.assertNetsEqual(net, result)
+        self.assertTrue( any([tran.picky for tran in result.transitions]) )
+        self.assertEqual( set([0.8]),
+                          set([tran.weight for tran in result.transitions
+                                    if not getattr(tran,'observed',True)]) )
+
+    def test_observed_only_round_trip(self):
+        net = mineRoleStateNet(self.sslog,observedOnly=True)
+        self.assertNetsEqual(net, round_trip(net))
+
+    def test_hand_built_round_trip(self):
+        initial = Place("I",pid=1)
+        final = Place("F",pid='end')
+        atran = Transition("a",tid='ta',weight=2.5)
+        net = RoleStateNet([initial,final],[atran],
+                           [Arc(initial,atran),Arc(atran,final)],"handmade")
+        result = round_trip(net)
+        self.assertNetsEqual(net, result)
+        self.assertFalse( list(result.transitions)[0].silent )
+
+    def test_stable_output(self):
+        net = mineRoleStateNet(self.sslog)
+        first, second = io.BytesIO(), io.BytesIO()
+        write_rsnet_pnml(net,first)
+        write_rsnet_pnml(round_trip(net),second)
+        self.assertEqual(first.getvalue(), second.getvalue())
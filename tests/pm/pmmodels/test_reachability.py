@@ -5,7 +5,9 @@ import unittest
 
 from pmkoalas.models.pnfrag import *
 
-from pm.pmmodels.conform import reachable_markings
+from pm.pmmodels.conform import reachable_markings, \
+        rsnet_reachable_markings, rsnet_explore, BitmaskReachability, \
+        ReachabilityBudget, COMPLETE, MAX_MARKINGS, MAX_DEPTH, TIME_LIMIT
 from pm.pmmodels.plpn import Marking
 from pm.pmmodels.rsnet import RoleStateNetSemantics, to_rsnet
 
@@ -178,6 +180,143 @@ class ReachabilityTest(unittest.TestCase):
                                  markings)
 
 
+class BitmaskReachabilityTest(unittest.TestCase):
+
+    def setUp(self):
+        self.parser = PetriNetFragmentParser()
+
+    def net(self,netText):
+        return self.parser.create_net("reachtest",netText)
+
+    def add(self,net,netText):
+        return self.parser.add_to_net(net,netText)
+
+    def assertEnginesAgree(self,net,start):
+        sem = RoleStateNetSemantics( Marking(net,dict(start)) )
+        expected = reachable_markings(sem)
+        markings = rsnet_reachable_markings(sem)
+        self.assertEqual(expected,markings)
+        self.assertEqual(start,sem.mark.mark)
+        return markings
+
+    def test_empty_marking(self):
+        net = to_rsnet( self.net("I -> [tau__1] -> Student") )
+        sem = RoleStateNetSemantics( Marking(net,{}) )
+        self.assertEqual(set(),rsnet_reachable_markings(sem))
+
+    def test_encode_decode(self):
+        net = to_rsnet( self.net("I -> [tau__1] -> Student") )
+        self.add(net,  "I -> [tau__1] -> Drone")
+        init, student, drone = findPlaces(net,"I","Student","Drone")
+        engine = BitmaskReachability(net)
+        mask = engine.encode({student:1, drone:1})
+        self.assertEqual( ((drone,1),(student,1)), engine.decode(mask) )
+        self.assertEqual( 0, engine.encode({init:0}) )
+        with self.assertRaises(ValueError):
+            engine.encode({init:2})
+
+    def test_simple_choice(self):
+        net = self.net("I -> [tau__1] -> Student")
+        self.add(net,  "I -> [tau__2] -> Drone")
+        init = findPlace(net,"I")
+        markings = self.assertEnginesAgree(to_rsnet(net),{init:1})
+        self.assertEqual(3,len(markings))
+
+    def test_conc_seq(self):
+        net = self.net("I -> [tau__1] -> Student")
+        self.add(net,                   "Student -> [tau__2] -> Tutor")
+        self.add(net,  "I -> [tau__1] -> Drone")
+        init = findPlace(net,"I")
+        self.assertEnginesAgree(to_rsnet(net),{init:1})
+
+    def test_longer_loop(self):
+        net = self.net("I -> [tau__1] -> Student -> [tau__2] -> F")
+        self.add(net,                   "Student -> [tau__3] -> Bludger") 
+        self.add(net,                   "Bludger -> [tau__4] -> Student")
+        init = findPlace(net,"I")
+        self.assertEnginesAgree(to_rsnet(net),{init:1})
+
+    def test_triple_marking(self):
+        net = self.net("I -> {tau__1 3.0} -> Student")
+        self.add(net,  "Student -> [tau__2] -> Student")
+        self.add(net,  "Student -> [tau__2] -> Sweep")
+        self.add(net,  "Student -> [tau__3] -> Bludger")
+        self.add(net,  "Student -> [tau__4] -> Student")
+        self.add(net,  "Student -> [tau__4] -> Tutor")
+        self.add(net,  "Student -> [tau__5] -> Drone")
+        self.add(net,  "Tutor   -> [tau__5] -> Drone")
+        init = findPlace(net,"I")
+        markings = self.assertEnginesAgree(to_rsnet(net),{init:1})
+        self.assertEqual(11,len(markings))
+
+    def test_picky(self):
+        net = self.net("I -> [tau__1] -> Student")
+        self.add(net,  "I -> [tau__1] -> Drone")
+        self.add(net,  "I -> [tau__1] -> Sweep")
+        self.add(net,  "Student -> [tau__2] -> Tutor")
+        self.add(net,  "Drone -> [tau__3] -> F")
+        self.add(net,  "Tutor -> [tau__3] -> F")
+        net = to_rsnet(net)
+        self.assertEqual(4,len(self.assertEnginesAgree(net,
+                                    {findPlace(net,"I"):1})))
+        for tran in net.transitions:
+            tran.picky = (str(tran.tid) == '3')
+        # Sweep stays marked, so the picky transition never fires
+        self.assertEqual(3,len(self.assertEnginesAgree(net,
+                                    {findPlace(net,"I"):1})))
+
+    def branches(self,k):
+        net = self.net("I -> [tau__1] -> A0")
+        for i in range(1,k):
+            self.add(net,f"I -> [tau__1] -> A{i}")
+        tid = 2
+        for i in range(k):
+            self.add(net,f"A{i} -> [tau__{tid}] -> B{i} -> [tau__{tid+1}] -> C{i}")
+            tid += 2
+        net = to_rsnet(net)
+        return RoleStateNetSemantics( Marking(net,{findPlace(net,"I"):1}) )
+
+    def test_budget_unlimited(self):
+        sem = self.branches(3)
+        result = rsnet_explore(sem,ReachabilityBudget())
+        self.assertEqual(COMPLETE,result.status)
+        self.assertTrue(result.complete)
+        self.assertEqual(1+3**3,len(result.markings))
+        self.assertEqual(reachable_markings(sem),result.markings)
+        self.assertEqual(7,result.depth)
+
+    def test_budget_max_markings(self):
+        sem = self.branches(3)
+        result = rsnet_explore(sem,ReachabilityBudget(maxMarkings=10))
+        self.assertEqual(MAX_MARKINGS,result.status)
+        self.assertFalse(result.complete)
+        self.assertEqual(10,len(result.markings))
+        self.assertTrue( result.markings <= reachable_markings(sem) )
+        result = rsnet_explore(sem,ReachabilityBudget(maxMarkings=28))
+        self.assertEqual(COMPLETE,result.status)
+
+    def test_budget_max_depth(self):
+        sem = self.branches(3)
+        result = rsnet_explore(sem,ReachabilityBudget(maxDepth=1))
+        self.assertEqual(MAX_DEPTH,result.status)
+        self.assertEqual(2,len(result.markings))
+        result = rsnet_explore(sem,ReachabilityBudget(maxDepth=7))
+        self.assertEqual(COMPLETE,result.status)
+
+    def test_budget_time_limit_and_progress(self):
+        sem = self.branches(3)
+        reports = []
+        result = rsnet_explore(sem,
+                    ReachabilityBudget(timeLimit=0,progressInterval=5,
+                        progress=lambda m,f,r: reports.append((m,f,r))) )
+        self.assertEqual(TIME_LIMIT,result.status)
+        self.assertEqual(1,len(reports))
+        markings, frontier, rate = reports[0]
+        self.assertEqual(len(result.markings),markings)
+        self.assertTrue(frontier > 0)
+        self.assertTrue(rate >= 0)
+
+
 # Allows logging to work while running single tests
 if __name__ == '__main__':
     logger.level = logging.DEBUG
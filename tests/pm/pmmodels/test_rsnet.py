@@ -205,4 +205,39 @@ class RoleStateNetSemanticsTest(unittest.TestCase):
         fmarking = sem.remark(t_pc)
         self.assertEqual( set([pf]), set(fmarking.mark.keys()) ) 
 
-
+    def test_incremental_enabled(self):
+        pi = Place("I","pi")
+        p1 = Place("p1","p1")
+        p2 = Place("p2","p2")
+        p3 = Place("p3","p3")
+        pf = Place("F","pf")
+        ta = RSTransition("a")
+        tb = RSTransition("b")
+        tc = RSTransition("c")
+        t_pa = RSTransition("p_a",pickyt=True)
+        t_pb = RSTransition("p_b",pickyt=True)
+        net = LabelledPetriNet([pi,p1,p2,p3,pf],[ta,tb,tc,t_pa,t_pb],  
+                               [Arc(pi,ta), Arc(ta,p1), Arc(ta,p2), 
+                                Arc(p1,tb), Arc(tb,p3),
+                                Arc(p3,tc), Arc(tc,p1),
+                                Arc(p2,t_pa), Arc(p3,t_pa), Arc(t_pa,pf),
+                                Arc(p2,t_pb), Arc(p1,t_pb), Arc(t_pb,pf)],
+                               "conc-picky")
+        marking1 = singleton_marking(net, [pi])
+        sem = RoleStateNetSemantics(marking1)
+        self.assertEqual( set([ta]), sem.enabled() ) 
+        marking2 = sem.remark(ta)
+        self.assertEqual( set([tb,t_pb]), sem.enabled() ) 
+        self.assertEqual( sem.compute_enabled(), sem.enabled() ) 
+        sem.remark(tb)
+        self.assertEqual( set([tc,t_pa]), sem.enabled() ) 
+        self.assertEqual( sem.compute_enabled(), sem.enabled() ) 
+        sem.mark = marking2
+        self.assertEqual( set([tb,t_pb]), sem.enabled() ) 
+        fmarking = sem.remark(t_pb)
+        self.assertEqual( set([pf]), set(fmarking.mark.keys()) )
+        self.assertEqual( set(), sem.enabled() ) 
+        sem.mark = marking1
+        self.assertEqual( set([ta]), sem.enabled() ) 
+        with self.assertRaises(ValueError):
+            sem.remark(tb)
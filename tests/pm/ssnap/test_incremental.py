@@ -0,0 +1,147 @@
+import unittest
+
+from pmkoalas.models.petrinet import Place
+from pm.ssnap.incremental import *
+from pm.ssnap.ssnap import StateSnapshot, minePurePLPN, minePureRoleStateNet
+
+
+def node_key(node):
+    if isinstance(node,Place):
+        return node.name
+    return (node.tid, node.weight, getattr(node,'picky',False))
+
+def net_signature(net):
+    '''
+    Structure by place name and transition id, ignoring place ids.
+    '''
+    return ( sorted([place.name for place in net.places]),
+             sorted([node_key(tran) for tran in net.transitions]),
+             sorted([(str(node_key(arc.from_node)),str(node_key(arc.to_node)))
+                        for arc in net.arcs]) )
+
+def sample_log():
+    return {1: [ StateSnapshot(1,1700, set(['Student'])) ,
+                 StateSnapshot(1,1701, set(['Student','Sweep']) )],
+            2: [ StateSnapshot(2,1705, set(['Student']) ),
+                 StateSnapshot(2,1709, set(['Bludger']) )],
+            3: [ StateSnapshot(3,1706, set(['Student']) ),
+                 StateSnapshot(3,1709, set(['Student','Tutor']) ),
+                 StateSnapshot(3,1710, set(['Drone']) ) ] }
+
+
+class IncrementalMinerTest(unittest.TestCase):
+
+    def assertNetsMatch(self,expected,result):
+        self.assertEqual( net_signature(expected), net_signature(result) )
+
+    def test_rsnet_single_batch(self):
+        sslog = sample_log()
+        miner = IncrementalRoleStateNetMiner(label='inc')
+        miner.add_traces(sslog)
+        net = miner.net()
+        expected = minePureRoleStateNet(sslog,label='inc')
+        self.assertEqual( expected, net )
+        self.assertEqual( expected.arcs, net.arcs )
+        self.assertEqual( 15, len(net.transitions) )
+
+    def test_rsnet_no_final(self):
+        sslog = sample_log()
+        miner = IncrementalRoleStateNetMiner(final=False)
+        miner.add_traces(sslog)
+        self.assertNetsMatch( minePureRoleStateNet(sslog,final=False), 
+                              miner.net() )
+
+    def test_rsnet_deltas(self):
+        sslog = sample_log()
+        miner = IncrementalRoleStateNetMiner()
+        miner.add_traces({1: sslog[1]})
+        first = miner.net()
+        self.assertNetsMatch( minePureRoleStateNet({1: sslog[1]}), first )
+        miner.add_traces({2: sslog[2], 3: sslog[3]})
+        self.assertNetsMatch( minePureRoleStateNet(sslog), miner.net() )
+        self.assertEqual( 3, miner.case_count() )
+        # earlier nets are unaffected
+        self.assertNetsMatch( minePureRoleStateNet({1: sslog[1]}), first )
+
+    def test_rsnet_remove(self):
+        sslog = sample_log()
+        miner = IncrementalRoleStateNetMiner()
+        miner.add_traces(sslog)
+        miner.net()
+        miner.remove_traces([3,99])
+        del sslog[3]
+        self.assertNetsMatch( minePureRoleStateNet(sslog), miner.net() )
+        miner.remove_traces([1,2])
+        self.assertEqual( 0, miner.case_count() )
+        self.assertEqual( ['I','F'], [pl.name for pl in 
+                                       sorted(miner.net().places,
+                                              key=lambda p: p.pid)] )
+
+    def test_rsnet_remove_empty_snapshot(self):
+        sslog = {1: [ StateSnapshot(1,1700, set(['a']) ),
+                      StateSnapshot(1,1701, set() ),
+                      StateSnapshot(1,1702, set(['b']) ) ],
+                 2: [ StateSnapshot(2,1700, set(['a']) ),
+                      StateSnapshot(2,1701, set(['c']) ) ],
+                 3: [ StateSnapshot(3,1700, set(['d']) ) ] }
+        miner = IncrementalRoleStateNetMiner()
+        miner.add_traces(sslog)
+        self.assertNetsMatch( minePureRoleStateNet(sslog), miner.net() )
+        miner.remove_traces([3])
+        del sslog[3]
+        self.assertNetsMatch( minePureRoleStateNet(sslog), miner.net() )
+
+    def test_rsnet_replace(self):
+        sslog = sample_log()
+        miner = IncrementalRoleStateNetMiner()
+        miner.add_traces(sslog)
+        miner.add_traces({2: [ StateSnapshot(2,1705, set(['Student']) ) ]})
+        sslog[2] = [ StateSnapshot(2,1705, set(['Student']) ) ]
+        expected = minePureRoleStateNet(sslog)
+        self.assertEqual( sorted([t.weight for t in expected.transitions]),
+                          sorted([t.weight for t in miner.net().transitions]))
+
+    def test_rsnet_reuses_unchanged_transitions(self):
+        sslog = sample_log()
+        miner = IncrementalRoleStateNetMiner(final=False)
+        miner.add_traces({1: sslog[1], 3: sslog[3]})
+        first = { tran.tid: tran for tran in miner.net().transitions }
+        miner.add_traces({2: sslog[2]})
+        second = { tran.tid: tran for tran in miner.net().transitions }
+        # only I -> Student is counted again, plus the new Bludger step
+        changed = [tid for tid in first if second[tid] is not first[tid]]
+        self.assertEqual( [1], changed )
+        self.assertEqual( 3, second[1].weight )
+        fresh = IncrementalRoleStateNetMiner(final=False)
+        fresh.add_traces({1: sslog[1], 3: sslog[3]})
+        fresh.add_traces({2: sslog[2]})
+        self.assertNetsMatch( fresh.net(), miner.net() )
+
+    def test_reachable_incremental(self):
+        sslog = sample_log()
+        miner = IncrementalRoleStateNetMiner()
+        for caseId in sslog:
+            miner.add_traces({caseId: sslog[caseId]})
+            miner.reachable_markings()
+        full = IncrementalRoleStateNetMiner()
+        full.add_traces(sslog)
+        self.assertEqual( full.reachable_markings(), 
+                          miner.reachable_markings() )
+
+    def test_plpn(self):
+        sslog = sample_log()
+        for final in [True,False]:
+            miner = IncrementalPLPNMiner(label='inc',final=final)
+            miner.add_traces(sslog)
+            expected = minePurePLPN(sslog,label='inc',final=final)
+            self.assertEqual( expected, miner.net() )
+            self.assertEqual( expected.arcs, miner.net().arcs )
+
+    def test_plpn_remove(self):
+        sslog = sample_log()
+        miner = IncrementalPLPNMiner()
+        miner.add_traces(sslog)
+        miner.remove_traces([3])
+        del sslog[3]
+        self.assertNetsMatch( minePurePLPN(sslog), miner.net() )
+
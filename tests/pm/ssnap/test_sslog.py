@@ -4,7 +4,8 @@ import tempfile
 import unittest
 
 from pm.ssnap.ssnap import (StateSnapshot, sslogFromCSV, sslogToCSV, 
-                            sslogWithRanges)
+                            sslogWithRanges, sslogStreamFromCSV,
+                            externalSortEntries)
 from tests.pm import ssnap as tssnap
 
 
@@ -66,6 +67,23 @@ class StateSnapshotLogTest(unittest.TestCase):
                 types={'personid': int, 'yearStart':float, 'yearEnd':float })
         self.assertEqual( expected, sslog )
 
+    def test_sslog_from_csv_range_vectorised(self):
+        cf = os.path.join(mpath,'test_ssnap_log_range.csv')
+        types = {'personid': int, 'yearStart':float, 'yearEnd':float }
+        for keepSuccDupes in [True,False]:
+            for timeInc in [1,0.25]:
+                expected = sslogWithRanges(cf, 'personid','job',
+                                           'yearStart','yearEnd', 
+                                           timeInc=timeInc, types=types,
+                                           keepSuccDupes=keepSuccDupes)
+                sslog = sslogWithRanges(cf, 'personid','job',
+                                        'yearStart','yearEnd', 
+                                        timeInc=timeInc, types=types,
+                                        keepSuccDupes=keepSuccDupes,
+                                        vectorised=True)
+                self.assertEqual( expected, sslog )
+                self.assertEqual( list(expected), list(sslog) )
+
     def test_sslog_from_csv_rm_succ_dupes(self):
         expected = \
             {1: [ StateSnapshot(1,1801,
@@ -82,6 +100,41 @@ class StateSnapshotLogTest(unittest.TestCase):
                              keepSuccDupes=False)
         self.assertEqual( expected, sslog )
 
+    def test_sslog_stream(self):
+        cf = os.path.join(mpath,'test_ssnap_log1.csv')
+        types = {'personid': int, 'year':int }
+        expected = sslogFromCSV(cf, 'personid','job','year', types=types,
+                                keepSuccDupes=False)
+        stream = sslogFromCSV(cf, 'personid','job','year', types=types,
+                              keepSuccDupes=False, stream=True)
+        self.assertEqual( [1,2], [caseId for caseId, trace in stream] )
+        sslog = dict( sslogStreamFromCSV(cf, 'personid','job','year', 
+                                         types=types, keepSuccDupes=False) )
+        self.assertEqual( expected, sslog )
+
+    def test_sslog_stream_unsorted(self):
+        cf = os.path.join(mpath,'test_ssnap_log1.csv')
+        ucf = os.path.join(mpath,'test_ssnap_log_unsorted.csv')
+        types = {'personid': int, 'year':int }
+        expected = sslogFromCSV(cf, 'personid','job','year', types=types)
+        self.assertEqual( expected, 
+                          sslogFromCSV(ucf, 'personid','job','year', 
+                                       types=types) )
+        with self.assertRaises(ValueError):
+            dict( sslogStreamFromCSV(ucf, 'personid','job','year', 
+                                     types=types) )
+        sslog = dict( sslogStreamFromCSV(ucf, 'personid','job','year', 
+                                         types=types, presorted=False,
+                                         chunkSize=3) )
+        self.assertEqual( expected, sslog )
+
+    def test_external_sort(self):
+        entries = [(2,1801,'b'), (1,1803,'a'), (1,1801,'c'), (3,1700,'a'), 
+                   (1,1801,'a')]
+        for chunkSize in [1,2,5,10]:
+            self.assertEqual( sorted(entries), 
+                              list(externalSortEntries(entries,chunkSize)) )
+
     def test_export_to_csv(self):
         sslog = \
             {1: [ StateSnapshot(1,1801,
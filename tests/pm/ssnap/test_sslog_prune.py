@@ -43,6 +43,31 @@ class StateSnapshotLogTest(unittest.TestCase):
                                     set(['Sweep']) ) ] }
         self.assertEqual(expected,result)
 
+    def test_variant_index(self):
+        sslog = {1: [ StateSnapshot(1,1700, set(['Student'])) ],
+                 2: [ StateSnapshot(2,1701, set(['Sweep']) ) ] ,
+                 3: [ StateSnapshot(3,1705, set(['Sweep']) ) ],
+                 4: [ StateSnapshot(4,1701, set(['Sweep']) ),
+                      StateSnapshot(4,1702, set(['Drone']) ) ] }
+        vi = VariantIndex(sslog)
+        self.assertEqual( 4, vi.case_total() )
+        self.assertEqual( 3, vi.variant_count() )
+        self.assertEqual( 2, vi.count(sslog[2]) )
+        self.assertEqual( [2,3], vi.case_ids(sslog[3]) )
+        self.assertEqual( 3, vi.kept_variants(0.25) )
+        self.assertEqual( 1, vi.kept_variants(0.3) )
+        for noise in [0.0, 0.1, 0.25, 0.3, 0.6]:
+            self.assertEqual( noiseReduceByVariant(sslog,noise),
+                              vi.noise_reduce(noise) )
+            self.assertEqual( noiseReduceByVariant(sslog,noise),
+                              noiseReduceByVariant(sslog,noise,vi) )
+        self.assertEqual( [2,3], list(vi.noise_reduce(0.3)) )
+        self.assertEqual( {}, vi.noise_reduce(0.6) )
+        self.assertEqual( [], vi.case_ids([StateSnapshot(5,1701,
+                                                         set(['CEO']))]) )
+        with self.assertRaises(ValueError):
+            noiseReduceByVariant(dict(sslog),0.3,vi)
+
     def test_take_tails(self):
         sslog = {1: [ StateSnapshot(1,1700,
                                     set(['Student'])),
@@ -67,3 +92,8 @@ class StateSnapshotLogTest(unittest.TestCase):
                                     set(['CEO']))] } 
         self.assertEqual(elog,result)
 
+    def test_take_tails_repeated_role(self):
+        sslog = {1: [ StateSnapshot(1,1700, set(['Sweep'])),
+                      StateSnapshot(1,1701, set(['Sweep','CEO'])) ] }
+        self.assertEqual(sslog, take_tails(sslog,'Sweep'))
+
@@ -1,4 +1,4 @@
-
+import math
 
 from pm.pmmodels.plpn import *
 from pm.ssnap.ssmetrics import *
@@ -43,6 +43,28 @@ class MetricsTest(PetriNetTestCase):
         self.assertAlmostEqual(0.91829727578, 
                                entropic_relevance(log,rsnet,rsmark) )
 
+    def test_relevance_exact(self):
+        log = { (ss(['A']), ): 20,
+                (ss(['B']), ): 10,
+                (ss(['C']), ): 10 }
+        net = self.net("I -> {tau__1 20.0} -> A -> {tau__2 20.0} -> F")
+        self.add(net,  "I -> {tau__3 10.0} -> B -> {tau__4 10.0} -> F ")
+        rsnet = to_rsnet(net)
+        rsmark = singleton_marking(rsnet, [findPlace(net,"I")])
+        # selector_cost: rho == 30/40
+        # trace_compression_cost == 1/40 * 
+        #                               20 * -1 * log_2(2/3)   {A}
+        #                               10 * -1 * log_2(1/3)   {B} 
+        #                               10 * 4 * log_2(2**5+1) {I},{C},{F}
+        rho = 3/4
+        expected = -1 * (rho*math.log2(rho) + (1-rho)*math.log2(1-rho)) \
+                   + ( 20 * -1 * math.log2(2/3) + 10 * -1 * math.log2(1/3) 
+                       + 10 * 4 * math.log2(2**5+1) ) / 40
+        self.assertAlmostEqual(expected, 
+                    entropic_relevance_rsnet(log,rsnet,rsmark,exact=True) )
+        self.assertAlmostEqual(expected, 
+                    entropic_relevance(log,rsnet,rsmark,exact=True) )
+
     def test_relevance_multi_terminal(self):
         log = { (ss(['A']) ,): 20,
                 (ss(['A','B']) ,): 10,
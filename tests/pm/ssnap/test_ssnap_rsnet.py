@@ -9,6 +9,10 @@ import unittest
 from pm.ssnap.ssnap import (StateSnapshot, sslogFromCSV, sslogWithRanges, 
                          pruneForNoiseByTranWeight, arcsSpanningTran)
 from pm.ssnap import ssnap
+from pm.pmmodels.conform import ReachabilityBudget
+from pm.pmmodels.rsnet import with_unobserved_finals
+from pm.pmmodels.pnformatter import RoleStateNetFormatter
+from pm.loggen.wpn_loggen import generate_log
 from pmkoalas.models.petrinet import *
 from pmkoalas.models.pnfrag import *
 from tests.pm.pmmodels.pnfragutil import findTransitionById, findPlaces
@@ -266,6 +270,125 @@ class StateSnapshotMinerRoleStateNetTest(unittest.TestCase):
         self.assertEqual(len( result.transitions ), 5) 
         self.assertEqual(len( result.places ), 4) 
 
+    def test_parallel_matches_serial(self):
+        sslog = {1: [ StateSnapshot(1,1700, set(['Student'])) ,
+                      StateSnapshot(1,1701, set(['Student','Sweep']) )],
+                 2: [ StateSnapshot(2,1705, set(['Student']) ),
+                      StateSnapshot(2,1709, set(['Bludger']) )],
+                 3: [ StateSnapshot(3,1706, set(['Student']) ),
+                      StateSnapshot(3,1709, set(['Student','Tutor']) ),
+                      StateSnapshot(3,1710, set(['Drone']) ) ],
+                 4: [ StateSnapshot(4,1706, set(['Bludger']) ) ] }
+        expected = ssnap.mine(sslog,label="ssmtestrsn")
+        for workers in [2,3]:
+            result = ssnap.mine(sslog,label="ssmtestrsn",workers=workers)
+            self.assertNetEqual( expected, result )
+            self.assertEqual( expected.arcs, result.arcs )
+        result = ssnap.minePureRoleStateNetParallel(sslog,label="ssmtestrsn",
+                                                    workers=2,
+                                                    shardsPerWorker=1)
+        self.assertNetEqual( expected, result )
+
+    def test_budget_observed_finals_only(self):
+        sslog = {1: [ StateSnapshot(1,1700, set(['Student'])) ,
+                      StateSnapshot(1,1701, set(['Student','Sweep']) )],
+                 2: [ StateSnapshot(2,1705, set(['Student']) ),
+                      StateSnapshot(2,1709, set(['Bludger']) )],
+                 3: [ StateSnapshot(3,1706, set(['Student']) ),
+                      StateSnapshot(3,1709, set(['Student','Tutor']) ),
+                      StateSnapshot(3,1710, set(['Drone']) ) ] }
+        full = ssnap.mine(sslog,label="ssmtestrsn",
+                          budget=ReachabilityBudget(maxMarkings=100))
+        self.assertTrue( any( [not tran.observed for tran in full.transitions
+                                    if tran.picky] ) )
+        result = ssnap.mine(sslog,label="ssmtestrsn",
+                            budget=ReachabilityBudget(maxMarkings=2))
+        picky = [tran for tran in result.transitions if tran.picky]
+        self.assertEqual(3, len(picky))
+        self.assertTrue( all( [tran.observed for tran in picky] ) )
+        self.assertEqual( set([1]), set([tran.weight for tran in picky]) )
+        self.assertTrue( full.reachability.complete )
+        self.assertFalse( result.reachability.complete )
+        dotstr = RoleStateNetFormatter(result,sslog).transform_net()
+        self.assertIn( 'Reachability incomplete', dotstr )
+        self.assertNotIn( 'Reachability incomplete', 
+                          RoleStateNetFormatter(full,sslog).transform_net() )
+        observed = ssnap.mine(sslog,label="ssmtestrsn",observedOnly=True,
+                              budget=ReachabilityBudget(maxMarkings=2))
+        self.assertIsNone( observed.reachability )
+        observed.unobserved.count()
+        self.assertFalse( observed.unobserved.reachability.complete )
+        self.assertFalse( 
+            with_unobserved_finals(observed).reachability.complete )
+
+    def test_arcs_hash_consistently(self):
+        sslog = {1: [ StateSnapshot(1,1700, set(['Student'])) ,
+                      StateSnapshot(1,1701, set(['Student','Sweep']) )],
+                 2: [ StateSnapshot(2,1705, set(['Student']) ),
+                      StateSnapshot(2,1709, set(['Bludger']) )],
+                 3: [ StateSnapshot(3,1706, set(['Student']) ) ] }
+        for observedOnly in [False,True]:
+            net = ssnap.minePureRoleStateNet(sslog,observedOnly=observedOnly)
+            self.assertTrue( all( [arc in net.arcs for arc in net.arcs] ) )
+            self.assertTrue( all( [tran in net.transitions 
+                                    for tran in net.transitions] ) )
+            full = with_unobserved_finals(net)
+            self.assertTrue( all( [arc in full.arcs for arc in full.arcs] ) )
+
+    def test_observed_only(self):
+        sslog = {1: [ StateSnapshot(1,1700, set(['Student'])) ,
+                      StateSnapshot(1,1701, set(['Student','Sweep']) )],
+                 2: [ StateSnapshot(2,1705, set(['Student']) ),
+                      StateSnapshot(2,1709, set(['Bludger']) )],
+                 3: [ StateSnapshot(3,1706, set(['Student']) ),
+                      StateSnapshot(3,1709, set(['Student','Tutor']) ),
+                      StateSnapshot(3,1710, set(['Drone']) ) ] }
+        full = ssnap.mine(sslog,label="ssmtestrsn")
+        self.assertIsNone(full.unobserved)
+        fullUnobserved = [tran for tran in full.transitions 
+                            if tran.picky and not tran.observed]
+        for workers in [None,2]:
+            result = ssnap.mine(sslog,label="ssmtestrsn",workers=workers,
+                                observedOnly=True)
+            picky = [tran for tran in result.transitions if tran.picky]
+            self.assertEqual(3, len(picky))
+            self.assertTrue( all( [tran.observed for tran in picky] ) )
+            self.assertEqual(len(fullUnobserved), result.unobserved.count())
+            self.assertAlmostEqual(0.8*len(fullUnobserved), 
+                                   result.unobserved.mass())
+            materialised = with_unobserved_finals(result)
+            self.assertNetEqual( full, materialised )
+            self.assertEqual( full.arcs, materialised.arcs )
+            self.assertEqual( generate_log(full,100), 
+                              generate_log(result,100) )
+
+    def test_format_observed_only(self):
+        sslog = {1: [ StateSnapshot(1,1700, set(['Student'])) ,
+                      StateSnapshot(1,1701, set(['Student','Sweep']) )],
+                 2: [ StateSnapshot(2,1705, set(['Student']) ),
+                      StateSnapshot(2,1709, set(['Bludger']) )],
+                 3: [ StateSnapshot(3,1706, set(['Student']) ),
+                      StateSnapshot(3,1709, set(['Student','Tutor']) ),
+                      StateSnapshot(3,1710, set(['Drone']) ) ] }
+        result = ssnap.mine(sslog,label="ssmtestrsn",observedOnly=True)
+        dotstr = RoleStateNetFormatter(result,sslog).transform_net()
+        self.assertFalse( result.unobserved.computed() )
+        self.assertIn( 'not computed', dotstr )
+        count = result.unobserved.count()
+        self.assertTrue( result.unobserved.computed() )
+        dotstr = RoleStateNetFormatter(result,sslog).transform_net()
+        self.assertNotIn( 'not computed', dotstr )
+        self.assertIn( f'{count} unobserved combinations', dotstr )
+
+    def test_count_shard_transitions(self):
+        traces = [ [ StateSnapshot(1,1700, set(['Student'])) ,
+                     StateSnapshot(1,1701, set(['Sweep']) )],
+                   [ StateSnapshot(2,1705, set(['Student']) ) ] ]
+        table = ssnap.countShardTransitions(traces)
+        self.assertEqual( [(table.initial,0),(0,1)], table.keys )
+        self.assertEqual( [2,1], table.counts )
+        self.assertEqual( {1:1, 0:1}, table.finals )
+
     def test_prune_for_noise(self):
         hedge = self.net("I -> {tau__1 341.0} -> Sweep")
         self.add(hedge,  "I -> {tau__2 2.0} -> Student")
@@ -0,0 +1,87 @@
+
+import unittest
+
+from pm.ssnap.ssnap import StateSnapshot, mineRoleStateNet, minePLPN
+from pm.ssnap.sweep import *
+from pmkoalas.models.petrinet import verbosecmp
+
+
+def cut_log(sslog, years):
+    if years is None:
+        return sslog
+    result = {}
+    for caseId, trace in sslog.items():
+        head = trace[0]
+        ntrace = []
+        for ss in trace:
+            if ss.time > head.time + years:
+                break
+            ntrace.append(ss)
+        result[caseId] = ntrace
+    return result
+
+
+def trace(caseId, start, *rolesets):
+    return [ StateSnapshot(caseId,start+i,set(roles))
+                for i, roles in enumerate(rolesets) ]
+
+
+class SweepTest(unittest.TestCase):
+
+    def setUp(self):
+        self.sslog = {}
+        for caseId in range(1,11):
+            self.sslog[caseId] = trace(caseId,1700,['Student'],['Tutor'],
+                                       ['Tutor','Dean'])
+        for caseId in range(11,14):
+            self.sslog[caseId] = trace(caseId,1710,['Student'],['Sweep'])
+        self.sslog[14] = trace(14,1720,['Sweep'],['Student'],['Tutor'],
+                               ['Drone'])
+        self.sslog[15] = trace(15,1720,['Student'],['Tutor'],['Drone'])
+
+    def assertNetEqual(self,net1,net2):
+        self.assertEqual(net1,net2,verbosecmp(net1,net2))
+
+    def test_window_variants(self):
+        roles, variants = window_variants(self.sslog,[1,None])
+        self.assertEqual( 15, variants[None].total )
+        self.assertEqual( 4, len(variants[None].counts) )
+        self.assertEqual( 3, len(variants[1].counts) )
+        self.assertEqual( 11, variants[1].counts[(0,1)] )
+        self.assertEqual( 0, variants[1].firstRanks[(0,1)] )
+
+    def test_rsnet_sweep_matches_mine(self):
+        noises = [0.0, 0.1, 0.25, 0.5]
+        windows = [1, 2, None]
+        results = mineRoleStateNetSweep(self.sslog,noises,windows,
+                                        label='sweep')
+        self.assertEqual( len(noises)*len(windows), len(results) )
+        for result in results:
+            expected = mineRoleStateNet(cut_log(self.sslog,result.years),
+                                        label='sweep',
+                                        noiseThreshold=result.noiseThreshold)
+            self.assertNetEqual( expected, result.net )
+            self.assertTrue( result.complete )
+        self.assertEqual( (1,0.0), (results[0].years,
+                                    results[0].noiseThreshold) )
+
+    def test_plpn_sweep_matches_mine(self):
+        noises = [0.0, 0.1, 0.3]
+        windows = [1, None]
+        for result in minePLPNSweep(self.sslog,noises,windows,label='sweep'):
+            expected = minePLPN(cut_log(self.sslog,result.years),
+                                label='sweep',
+                                noiseThreshold=result.noiseThreshold)
+            self.assertNetEqual( expected, result.net )
+
+    def test_relevance(self):
+        results = mineRoleStateNetSweep(self.sslog,[0.0,0.25],[1,None],
+                                        relevance=True, exact=True)
+        presults = mineRoleStateNetSweep(self.sslog,[0.0,0.25],[1,None],
+                                         relevance=True, exact=True,
+                                         parallel=True, workers=2)
+        for result, presult in zip(results,presults):
+            self.assertIsNotNone( result.relevance )
+            self.assertAlmostEqual( result.relevance, presult.relevance )
+        self.assertLess( results[2].relevance, results[3].relevance )
+
@@ -0,0 +1,96 @@
+
+import unittest
+
+from pm.logs.statesnaplog import RoleSetTable, StateSnapshot, intern_trace
+from pm.ssnap.trantable import TransitionTable
+
+
+class TransitionTableTest(unittest.TestCase):
+
+    def test_add_trace(self):
+        table = TransitionTable()
+        trace1 = [ StateSnapshot(1,1700, ['Student']),
+                   StateSnapshot(1,1701, ['Sweep','Student']) ]
+        trace2 = [ StateSnapshot(2,1700, ['Student']) ]
+        self.assertEqual( 1, table.add_trace(trace1) )
+        self.assertEqual( 0, table.add_trace(trace2) )
+        self.assertEqual( [frozenset(['Student']),
+                           frozenset(['Student','Sweep'])],
+                          table.roles.rolesets() )
+        self.assertEqual( [(table.initial,0),(0,1)], table.keys )
+        self.assertEqual( [2,1], table.counts )
+        self.assertEqual( {1: 1, 0: 1}, table.finals )
+        self.assertEqual( {frozenset(['Student']): 1,
+                           frozenset(['Student','Sweep']): 1},
+                          table.roleset_finals() )
+
+    def test_final(self):
+        table = TransitionTable()
+        finalId = table.marker('F')
+        table.add_trace( [ StateSnapshot(1,1700, ['Student']) ], finalId )
+        table.add_trace( [ StateSnapshot(2,1700, ['Student']) ], finalId )
+        self.assertEqual( [(table.initial,0),(0,finalId)], table.keys )
+        self.assertEqual( frozenset(['F']), table.roleset(finalId) )
+        self.assertEqual( 1, len(table.roles) )
+        self.assertEqual( [2,2], table.counts )
+        self.assertEqual( 2, table.transition_count() )
+
+    def test_count(self):
+        table = TransitionTable()
+        a = table.intern( frozenset(['a']) )
+        self.assertEqual( 0, table.count(table.initial,a,3) )
+        self.assertEqual( 0, table.count(table.initial,a) )
+        self.assertEqual( [4], table.counts )
+        self.assertEqual( a, table.intern( frozenset(['a']) ) )
+
+
+    def test_merge(self):
+        traces = [ [ StateSnapshot(1,1700, ['Student']),
+                     StateSnapshot(1,1701, ['Sweep']) ],
+                   [ StateSnapshot(2,1700, ['Tutor']),
+                     StateSnapshot(2,1701, ['Sweep']) ],
+                   [ StateSnapshot(3,1700, ['Student']) ] ]
+        whole = TransitionTable()
+        for trace in traces:
+            whole.add_trace(trace)
+        first, second = TransitionTable(), TransitionTable()
+        first.add_trace(traces[0])
+        second.add_trace(traces[1])
+        second.add_trace(traces[2])
+        merged = TransitionTable()
+        merged.merge(first)
+        self.assertEqual( [2,1,0], merged.merge(second) )
+        self.assertEqual( whole.roles.rolesets(), merged.roles.rolesets() )
+        self.assertEqual( whole.keys, merged.keys )
+        self.assertEqual( whole.counts, merged.counts )
+        self.assertEqual( whole.finals, merged.finals )
+
+    def test_shared_roles(self):
+        roles = RoleSetTable()
+        trace = intern_trace( [ StateSnapshot(1,1700, ['Student']),
+                                StateSnapshot(1,1701, ['Sweep']) ], roles )
+        table = TransitionTable(roles)
+        self.assertIs( roles, table.roles )
+        self.assertEqual( frozenset(['I']), table.roleset(table.initial) )
+        self.assertEqual( trace[-1].rsid, table.add_trace(trace) )
+        self.assertEqual( [(table.initial,0),(0,1)], table.keys )
+        self.assertEqual( 2, len(roles) )
+        self.assertEqual( 2, roles.role_count() )
+
+    def test_marker_role_names(self):
+        table = TransitionTable()
+        role = table.intern( frozenset(['I']) )
+        self.assertNotEqual( table.initial, role )
+        self.assertEqual( table.roleset(table.initial), table.roleset(role) )
+        self.assertEqual( table.initial, table.marker('I') )
+
+    def test_ordered_tids(self):
+        table = TransitionTable()
+        a = table.intern( frozenset(['a']) )
+        b = table.intern( frozenset(['b']) )
+        self.assertEqual( b, table.add_variant( (b,), 3, rank=2 ) )
+        table.add_variant( (a,b), 1, rank=0 )
+        start = table.initial
+        self.assertEqual( [(start,b),(start,a),(a,b)], table.keys )
+        self.assertEqual( [1,2,0], table.ordered_tids() )
+        self.assertEqual( {b: 4}, table.finals )